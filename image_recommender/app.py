@@ -42,15 +42,24 @@ def _resolve_index_and_mapping():
     if env_idx and env_map and Path(env_idx).exists() and Path(env_map).exists():
         return str(Path(env_idx)), str(Path(env_map))
 
+    # Versioned builds (build_embedding_index --publish): the root serves
+    # both index and mapping and new versions are picked up while running
+    for out in (pkg_root / "data" / "out", repo_root / "data" / "out"):
+        if (out / "index" / "CURRENT").exists():
+            return str(out / "index"), str(out / "index")
+
+    # binary mapping first; index_to_id.json from older builds still works
     cand1 = pkg_root / "data" / "out"
-    idx1, map1 = cand1 / "clip_index.ann", cand1 / "index_to_id.json"
-    if idx1.exists() and map1.exists():
-        return str(idx1), str(map1)
+    idx1, map1 = cand1 / "clip_index.ann", cand1 / "index_to_id.idmap"
+    for name in ("index_to_id.idmap", "index_to_id.json"):
+        if idx1.exists() and (cand1 / name).exists():
+            return str(idx1), str(cand1 / name)
 
     cand2 = repo_root / "data" / "out"
-    idx2, map2 = cand2 / "clip_index.ann", cand2 / "index_to_id.json"
-    if idx2.exists() and map2.exists():
-        return str(idx2), str(map2)
+    idx2 = cand2 / "clip_index.ann"
+    for name in ("index_to_id.idmap", "index_to_id.json"):
+        if idx2.exists() and (cand2 / name).exists():
+            return str(idx2), str(cand2 / name)
 
     # fallback to package path even if missing (UI will warn)
     return str(idx1), str(map1)
@@ -736,9 +745,9 @@ class MainWindow(QMainWindow):
         )
         path, _ = QFileDialog.getOpenFileName(
             self,
-            "Select mapping (index_to_id.json)",
+            "Select mapping (index_to_id.idmap / .json)",
             start_dir,
-            "JSON files (*.json);;All files (*)",
+            "ID mappings (*.idmap *.json);;All files (*)",
         )
         if path:
             self.CLIP_MAPPING_PATH = path
@@ -22,6 +22,9 @@ def create_table():
         - id: unique image ID (primary key)
         - path: file path to the image
         - width, height: image dimensions in pixels
+        - phash: 64-bit perceptual hash as a signed integer (NULL if unknown)
+
+    Databases created before the phash column existed are migrated in place.
     """
     with connect_db() as conn:
         cursor = conn.cursor()
@@ -31,14 +34,20 @@ def create_table():
                 id TEXT PRIMARY KEY,
                 path TEXT NOT NULL,
                 width INTEGER,
-                height INTEGER
+                height INTEGER,
+                phash INTEGER
             );
         """
         )
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(images);")}
+        if "phash" not in columns:
+            cursor.execute("ALTER TABLE images ADD COLUMN phash INTEGER;")
         conn.commit()
 
 
-def insert_image_data(image_id: str, path: str, width: int, height: int):
+def insert_image_data(
+    image_id: str, path: str, width: int, height: int, phash: Optional[int] = None
+):
     """
     Inserts metadata for a single image into the database.
     Duplicate entries (by ID) are ignored.
@@ -48,15 +57,31 @@ def insert_image_data(image_id: str, path: str, width: int, height: int):
         path (str): Full file path to the image
         width (int): Image width in pixels
         height (int): Image height in pixels
+        phash (int): Perceptual hash as a signed 64-bit integer, optional
     """
     with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
-            INSERT OR IGNORE INTO images (id, path, width, height)
-            VALUES (?, ?, ?, ?);
+            INSERT OR IGNORE INTO images (id, path, width, height, phash)
+            VALUES (?, ?, ?, ?, ?);
         """,
-            (image_id, path, width, height),
+            (image_id, path, width, height, phash),
+        )
+        conn.commit()
+
+
+def update_phashes(rows):
+    """
+    Stores perceptual hashes of existing images.
+
+    Args:
+        rows (Iterable[Tuple[str, int]]): (image_id, phash) pairs
+    """
+    with connect_db() as conn:
+        conn.executemany(
+            "UPDATE images SET phash = ? WHERE id = ?;",
+            ((phash, image_id) for image_id, phash in rows),
         )
         conn.commit()
 
@@ -80,3 +105,167 @@ def get_image_by_id(image_id: str) -> Optional[Tuple[str, int, int]]:
             (image_id,),
         )
         return cursor.fetchone()
+
+
+# SQLite's default limit on host parameters per statement
+_MAX_SQL_PARAMS = 900
+
+
+def get_images_by_ids(image_ids) -> dict:
+    """
+    Retrieves metadata for many images with a few IN queries.
+
+    Args:
+        image_ids (Iterable[str]): Image IDs to look up (duplicates are fine)
+
+    Returns:
+        dict: {image_id: (path, width, height)} for the IDs that were found
+    """
+    ids = list(dict.fromkeys(image_ids))
+    found = {}
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(ids), _MAX_SQL_PARAMS):
+            chunk = ids[start : start + _MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT id, path, width, height FROM images WHERE id IN ({placeholders});",
+                chunk,
+            )
+            for image_id, path, width, height in cursor.fetchall():
+                found[image_id] = (path, width, height)
+    return found
+
+
+def get_phashes_by_ids(image_ids) -> dict:
+    """
+    Retrieves the stored perceptual hashes of many images.
+
+    Args:
+        image_ids (Iterable[str]): Image IDs to look up
+
+    Returns:
+        dict: {image_id: phash} for the IDs that have a hash
+    """
+    ids = list(dict.fromkeys(image_ids))
+    found = {}
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(ids), _MAX_SQL_PARAMS):
+            chunk = ids[start : start + _MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT id, phash FROM images WHERE id IN ({placeholders}) "
+                "AND phash IS NOT NULL;",
+                chunk,
+            )
+            found.update(cursor.fetchall())
+    return found
+
+
+def get_all_phashes():
+    """
+    Retrieves the pHash of every image that has one, in insertion order.
+
+    Returns:
+        Tuple of (list of image IDs, list of phashes)
+    """
+    with connect_db() as conn:
+        rows = conn.execute(
+            "SELECT id, phash FROM images WHERE phash IS NOT NULL ORDER BY rowid;"
+        ).fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+def create_duplicates_table():
+    """
+    Creates the 'duplicate_clusters' table if it doesn't already exist.
+    Columns:
+        - image_id: an image that belongs to a near-duplicate cluster
+        - cluster_id: cluster number, shared by all members of a cluster
+    Images without near-duplicates are not listed.
+    """
+    with connect_db() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS duplicate_clusters (
+                image_id TEXT PRIMARY KEY,
+                cluster_id INTEGER NOT NULL
+            );
+        """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_duplicate_cluster "
+            "ON duplicate_clusters (cluster_id);"
+        )
+        conn.commit()
+
+
+def replace_duplicate_clusters(clusters):
+    """
+    Replaces all stored clusters in one transaction.
+
+    Args:
+        clusters (Iterable[List[str]]): Image IDs of each cluster
+    """
+    create_duplicates_table()
+    with connect_db() as conn:
+        conn.execute("DELETE FROM duplicate_clusters;")
+        conn.executemany(
+            "INSERT INTO duplicate_clusters (image_id, cluster_id) VALUES (?, ?);",
+            (
+                (image_id, cluster_id)
+                for cluster_id, members in enumerate(clusters)
+                for image_id in members
+            ),
+        )
+        conn.commit()
+
+
+def get_duplicate_cluster(image_id: str) -> list:
+    """
+    Returns the image IDs of the cluster the image belongs to (including
+    itself), or an empty list if it has no stored near-duplicates.
+    """
+    create_duplicates_table()
+    with connect_db() as conn:
+        rows = conn.execute(
+            """
+            SELECT image_id FROM duplicate_clusters WHERE cluster_id = (
+                SELECT cluster_id FROM duplicate_clusters WHERE image_id = ?
+            ) ORDER BY image_id;
+        """,
+            (image_id,),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _iter_rows(where: str, batch_size: int):
+    # Pages by rowid with a fresh connection per batch, so the caller can
+    # write to the database between batches
+    last = 0
+    while True:
+        with connect_db() as conn:
+            rows = conn.execute(
+                f"SELECT rowid, id, path FROM images WHERE {where} AND rowid > ? "
+                "ORDER BY rowid LIMIT ?;",
+                (last, batch_size),
+            ).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [(image_id, path) for _, image_id, path in rows]
+
+
+def iter_missing_phashes(batch_size: int = 1000):
+    """
+    Yields lists of (image_id, path) of images without a stored pHash.
+    """
+    return _iter_rows("phash IS NULL", batch_size)
+
+
+def iter_images(batch_size: int = 1000):
+    """
+    Yields lists of (image_id, path) of all images, in insertion order.
+    """
+    return _iter_rows("1", batch_size)
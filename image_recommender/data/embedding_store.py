@@ -0,0 +1,290 @@
+import os
+import json
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+# On-disk layout of an embedding store at <path>:
+#   <path>.json     header (dim, dtype, count, id width, model)
+#   <path>.vectors  raw row-major matrix, count x dim
+#   <path>.ids      raw fixed-width ASCII image IDs, one per row
+# The header is rewritten atomically after the data files are flushed, so
+# "count" always describes rows that are fully on disk.
+
+# Default store of the corpus CLIP embeddings (written by build_embedding_index)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+embeddings_out = os.path.join(BASE_DIR, "data", "out", "clip_embeddings")
+
+FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float32", "float16")
+DEFAULT_ID_WIDTH = 64  # SHA256 hex digest, see loader.generate_image_id
+
+
+def _header_path(path: str) -> str:
+    return path + ".json"
+
+
+def _vectors_path(path: str) -> str:
+    return path + ".vectors"
+
+
+def _ids_path(path: str) -> str:
+    return path + ".ids"
+
+
+def store_exists(path: str) -> bool:
+    """
+    Returns True if an embedding store header exists at the given path.
+    """
+    return os.path.exists(_header_path(path))
+
+
+def read_header(path: str) -> dict:
+    """
+    Reads the JSON header of an embedding store.
+    """
+    with open(_header_path(path), "r") as f:
+        return json.load(f)
+
+
+def _write_header(path: str, header: dict):
+    tmp = _header_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(header, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _header_path(path))
+
+
+def copy_store(src: str, dst: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Copies the published rows of a store to a new store at dst. Unlike a
+    hardlink, the copy is unaffected when src is later truncated or
+    rewritten in place by EmbeddingStoreWriter.
+
+    Returns:
+        str: dst
+    """
+    header = read_header(src)
+    count = int(header["count"])
+    sizes = (
+        (
+            _vectors_path,
+            count * int(header["dim"]) * np.dtype(header["dtype"]).itemsize,
+        ),
+        (_ids_path, count * int(header["id_width"])),
+    )
+    for path_of, nbytes in sizes:
+        with open(path_of(src), "rb") as fin, open(path_of(dst), "wb") as fout:
+            while nbytes > 0:
+                chunk = fin.read(min(chunk_size, nbytes))
+                if not chunk:
+                    raise ValueError(f"Store {src} is shorter than its header says")
+                fout.write(chunk)
+                nbytes -= len(chunk)
+    _write_header(dst, header)
+    return dst
+
+
+class EmbeddingStore:
+    """
+    Read-only view of an embedding store.
+
+    `vectors` and `ids` are np.memmap arrays, so opening a store is cheap
+    and rows are only paged in when touched.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = read_header(path)
+        self.dim = int(self.header["dim"])
+        self.dtype = np.dtype(self.header["dtype"])
+        self.count = int(self.header["count"])
+        self.id_dtype = np.dtype(f"S{int(self.header['id_width'])}")
+        self.model = self.header.get("model")
+        self._sorted = None  # (order, sorted ids), built by rows_of
+
+        if self.count == 0:
+            # np.memmap cannot map an empty region
+            self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+            self.ids = np.empty((0,), dtype=self.id_dtype)
+        else:
+            self.vectors = np.memmap(
+                _vectors_path(path),
+                dtype=self.dtype,
+                mode="r",
+                shape=(self.count, self.dim),
+            )
+            self.ids = np.memmap(
+                _ids_path(path), dtype=self.id_dtype, mode="r", shape=(self.count,)
+            )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def image_id(self, row: int) -> str:
+        """Returns the image ID stored at the given row."""
+        return self.ids[row].decode("ascii")
+
+    def image_ids(self) -> List[str]:
+        """Returns all image IDs in row order."""
+        return [raw.decode("ascii") for raw in self.ids]
+
+    def rows_of(self, image_ids: Iterable[str]) -> np.ndarray:
+        """
+        Returns the row of each image ID, -1 where it is not in the store.
+        The IDs are sorted once on first use; lookups are one np.searchsorted.
+        """
+        if self._sorted is None:
+            order = np.argsort(self.ids, kind="stable")
+            self._sorted = (order, np.asarray(self.ids)[order])
+        order, sorted_ids = self._sorted
+        keys = np.array([i.encode("ascii") for i in image_ids], dtype=self.id_dtype)
+        if not len(sorted_ids) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_ids, keys), len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == keys, order[pos], -1).astype(np.int64)
+
+    def iter_chunks(self, chunk_rows: int = 65536, with_vectors: bool = True):
+        """
+        Yields (start row, vectors, image IDs) in row order, chunk by chunk.
+
+        Chunks are read with plain file reads rather than through the
+        memmap, so a full scan does not leave the whole store resident in
+        this process. `vectors` is None when with_vectors=False.
+        """
+        if self.count == 0:
+            return
+        row_bytes = self.dim * self.dtype.itemsize
+        with (
+            open(_ids_path(self.path), "rb") as id_file,
+            open(_vectors_path(self.path), "rb") as vec_file,
+        ):
+            for start in range(0, self.count, chunk_rows):
+                n = min(chunk_rows, self.count - start)
+                ids = np.fromfile(id_file, dtype=self.id_dtype, count=n)
+                vectors = None
+                if with_vectors:
+                    vec_file.seek(start * row_bytes)
+                    vectors = np.fromfile(
+                        vec_file, dtype=self.dtype, count=n * self.dim
+                    ).reshape(n, self.dim)
+                yield start, vectors, [raw.decode("ascii") for raw in ids]
+
+
+class EmbeddingStoreWriter:
+    """
+    Appends (image_id, vector) rows to an embedding store.
+
+    Rows are streamed straight to the data files; `flush()` makes them
+    durable and publishes the new row count in the header.
+    With append=True an existing store is continued; rows written after
+    its last flush are discarded. `keep_rows` further cuts the store back
+    to a known-good row count, e.g. the one recorded in a build checkpoint.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        dtype: str = "float32",
+        id_width: int = DEFAULT_ID_WIDTH,
+        model: Optional[str] = None,
+        append: bool = False,
+        keep_rows: Optional[int] = None,
+    ):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"Unsupported dtype {dtype!r}, use one of {SUPPORTED_DTYPES}"
+            )
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+
+        if append and store_exists(path):
+            header = read_header(path)
+            if int(header["dim"]) != dim:
+                raise ValueError(
+                    f"Store {path} has dim {header['dim']}, expected {dim}"
+                )
+            self.header = header
+            self.count = int(header["count"])
+            if keep_rows is not None:
+                if keep_rows > self.count:
+                    raise ValueError(
+                        f"Store {path} has {self.count} rows, cannot keep {keep_rows}"
+                    )
+                self.count = keep_rows
+            mode = "r+b"
+        else:
+            self.header = {
+                "format": FORMAT_VERSION,
+                "dim": dim,
+                "dtype": dtype,
+                "id_width": id_width,
+                "model": model,
+                "count": 0,
+            }
+            self.count = 0
+            mode = "w+b"
+
+        self.dtype = np.dtype(self.header["dtype"])
+        self.id_dtype = np.dtype(f"S{int(self.header['id_width'])}")
+        self._vec_file = open(_vectors_path(path), mode)
+        self._ids_file = open(_ids_path(path), mode)
+
+        # Drop any tail that was written but never published in the header
+        row_bytes = self.dtype.itemsize * dim
+        self._vec_file.truncate(self.count * row_bytes)
+        self._ids_file.truncate(self.count * self.id_dtype.itemsize)
+        self._vec_file.seek(0, os.SEEK_END)
+        self._ids_file.seek(0, os.SEEK_END)
+
+        if mode == "w+b" or self.count != int(self.header["count"]):
+            self.header["count"] = self.count
+            _write_header(path, self.header)
+
+    def append(self, ids: Iterable[str], vectors: np.ndarray):
+        """
+        Appends a batch of rows.
+
+        Args:
+            ids (Iterable[str]): Image IDs, one per row
+            vectors (np.ndarray): (N, dim) array of embeddings
+        """
+        ids = list(ids)
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if (
+            vectors.ndim != 2
+            or vectors.shape[0] != len(ids)
+            or vectors.shape[1] != self.header["dim"]
+        ):
+            raise ValueError(
+                f"Expected {len(ids)} rows of dim {self.header['dim']}, got {vectors.shape}"
+            )
+        raw_ids = np.array([i.encode("ascii") for i in ids], dtype=self.id_dtype)
+
+        self._vec_file.write(vectors.tobytes())
+        self._ids_file.write(raw_ids.tobytes())
+        self.count += len(ids)
+
+    def flush(self):
+        """Makes all appended rows durable and publishes the row count."""
+        for f in (self._vec_file, self._ids_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self.header["count"] = self.count
+        _write_header(self.path, self.header)
+
+    def close(self):
+        if self._vec_file.closed:
+            return
+        self.flush()
+        self._vec_file.close()
+        self._ids_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
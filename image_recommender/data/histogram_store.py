@@ -0,0 +1,77 @@
+import os
+from typing import Iterable
+
+import numpy as np
+
+from image_recommender.data.embedding_store import (
+    EmbeddingStore,
+    EmbeddingStoreWriter,
+    store_exists,
+)
+
+# Color histograms of the corpus, computed once at ingest and kept as an
+# embedding store (same on-disk format): an N x 3·bins float32 matrix of
+# compute_histogram() rows plus the row → image ID table.
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+histograms_out = os.path.join(BASE_DIR, "data", "out", "color_histograms")
+
+HISTOGRAM_BINS = 8
+HISTOGRAM_MODEL = f"rgb-hist-{HISTOGRAM_BINS}"
+
+# Rows written between durable flushes during ingest
+FLUSH_EVERY = 1000
+
+
+class HistogramStore:
+    """
+    Memory-mapped histogram matrix with vectorized lookup by image ID.
+
+    `lookup` finds the rows of many IDs with one np.searchsorted over the
+    sorted IDs (EmbeddingStore.rows_of) instead of a dict of the whole corpus.
+    """
+
+    def __init__(self, path: str = histograms_out):
+        self.store = EmbeddingStore(path)
+        self.path = path
+        self.bins = self.store.dim // 3
+        self.matrix = self.store.vectors
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def rows(self, image_ids: Iterable[str]) -> np.ndarray:
+        """Row of each image ID in the matrix, -1 where it has none."""
+        return self.store.rows_of(image_ids)
+
+    def lookup(self, image_ids: Iterable[str]) -> dict:
+        """
+        Returns {image_id: histogram row} for the IDs that have one.
+        """
+        image_ids = list(image_ids)
+        rows = self.rows(image_ids)
+        hit = rows >= 0
+        matrix = np.asarray(self.matrix[np.sort(rows[hit])])
+        by_row = dict(zip(np.sort(rows[hit]).tolist(), matrix))
+        return {i: by_row[r] for i, r in zip(image_ids, rows.tolist()) if r >= 0}
+
+
+def load_histogram_store(path: str = histograms_out):
+    """Opens the histogram store, or returns None if none was built yet."""
+    return HistogramStore(path) if store_exists(path) else None
+
+
+def open_histogram_writer(path: str = histograms_out) -> EmbeddingStoreWriter:
+    """Appends to the histogram store, creating it if needed."""
+    return EmbeddingStoreWriter(
+        path, 3 * HISTOGRAM_BINS, model=HISTOGRAM_MODEL, append=True
+    )
+
+
+def stored_histogram_ids(path: str = histograms_out) -> set:
+    """IDs that already have a stored histogram (to skip on re-ingest)."""
+    if not store_exists(path):
+        return set()
+    ids = set()
+    for _, _, chunk_ids in EmbeddingStore(path).iter_chunks(with_vectors=False):
+        ids.update(chunk_ids)
+    return ids
@@ -0,0 +1,237 @@
+import os
+import json
+import struct
+from typing import Iterable
+
+import numpy as np
+
+# Binary index → image ID mapping (<name>.idmap):
+#   32-byte header: magic, kind, width, count
+#   count fixed-width records; record i is the ID of index item i
+# Kind "digest" stores the 32 raw bytes of a SHA256 hex ID (see
+# loader.generate_image_id); kind "ascii" stores IDs as fixed-width ASCII.
+# The records are memory-mapped, so loading is O(1) and a lookup is one
+# array access, unlike index_to_id.json which builds a dict of all entries.
+
+IDMAP_EXTENSION = ".idmap"
+_MAGIC = b"IDMAP\x00v1"
+_HEADER = struct.Struct("<8sII Q 8x")  # magic, kind, width, count
+_KINDS = {"digest": 0, "ascii": 1}
+DIGEST_WIDTH = 32
+
+
+def is_binary_mapping(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() == IDMAP_EXTENSION
+
+
+class IdMapping:
+    """
+    Read-only, memory-mapped index → image ID mapping.
+
+    Supports `mapping[i]`, `mapping.get(i, default)` and `len(mapping)`
+    like the dict loaded from JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, kind, width, count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a binary ID mapping")
+        self.kind = {v: k for k, v in _KINDS.items()}[kind]
+        self.width = width
+        self.count = count
+        if count == 0:
+            self.records = np.empty((0,), dtype=f"S{width}")
+        else:
+            # raw void records: S-dtype would strip trailing zero bytes of digests
+            self.records = np.memmap(
+                path, dtype=f"V{width}", mode="r", offset=_HEADER.size, shape=(count,)
+            )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self.count:
+            raise KeyError(i)
+        raw = self.records[i].tobytes()
+        if self.kind == "digest":
+            return raw.hex()
+        return raw.rstrip(b"\0").decode("ascii")
+
+    def get(self, i: int, default=None):
+        try:
+            return self[i]
+        except KeyError:
+            return default
+
+    def __contains__(self, i) -> bool:
+        return isinstance(i, (int, np.integer)) and 0 <= i < self.count
+
+    def items(self):
+        return ((i, self[i]) for i in range(self.count))
+
+
+class IdMappingWriter:
+    """
+    Streams image IDs (in index order) into a binary mapping. The file
+    is written under a temporary name and published on close.
+
+    Args:
+        path (str): Output .idmap path
+        kind (str): "digest" for 64-char SHA256 hex IDs, else "ascii"
+        width (int): Record width for kind "ascii"
+    """
+
+    def __init__(self, path: str, kind: str = "digest", width: int = 64):
+        if kind not in _KINDS:
+            raise ValueError(f"Unknown mapping kind {kind!r}")
+        self.path = path
+        self.kind = kind
+        self.width = DIGEST_WIDTH if kind == "digest" else width
+        self.count = 0
+        self._tmp = path + ".tmp"
+        self._f = open(self._tmp, "wb")
+        self._f.write(b"\0" * _HEADER.size)  # patched on close
+
+    def _encode(self, image_id: str) -> bytes:
+        if self.kind == "digest":
+            raw = bytes.fromhex(image_id)
+            if len(raw) != DIGEST_WIDTH:
+                raise ValueError(f"Not a SHA256 hex ID: {image_id!r}")
+            return raw
+        raw = image_id.encode("ascii")
+        if len(raw) > self.width:
+            raise ValueError(f"ID longer than {self.width} bytes: {image_id!r}")
+        return raw.ljust(self.width, b"\0")
+
+    def add(self, image_ids: Iterable[str]):
+        records = [self._encode(i) for i in image_ids]
+        self._f.write(b"".join(records))
+        self.count += len(records)
+
+    def close(self):
+        self._f.seek(0)
+        self._f.write(_HEADER.pack(_MAGIC, _KINDS[self.kind], self.width, self.count))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+
+class JsonMappingWriter:
+    """
+    Streams the index → image_id JSON mapping to disk entry by entry, so
+    it is never held as a dict. The output is the same as json.dump of
+    {i: image_id}; the file is published atomically on close.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._tmp = path + ".tmp"
+        self._f = open(self._tmp, "w")
+        self._f.write("{")
+
+    def add(self, image_ids: Iterable[str]):
+        for image_id in image_ids:
+            sep = ", " if self.count else ""
+            self._f.write(f'{sep}"{self.count}": {json.dumps(image_id)}')
+            self.count += 1
+
+    def close(self):
+        self._f.write("}")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+
+def open_mapping_writer(path: str):
+    """Returns the streaming writer for the mapping format of the path."""
+    return IdMappingWriter(path) if is_binary_mapping(path) else JsonMappingWriter(path)
+
+
+def find_mapping(out_dir: str, stem: str = "index_to_id") -> str:
+    """
+    Path of the mapping in out_dir: <stem>.idmap if it exists, else the
+    <stem>.json of builds made before the binary format, else the .idmap
+    path (for the caller to report as missing).
+    """
+    binary = os.path.join(out_dir, stem + IDMAP_EXTENSION)
+    legacy = os.path.join(out_dir, stem + ".json")
+    if not os.path.exists(binary) and os.path.exists(legacy):
+        return legacy
+    return binary
+
+
+def load_id_mapping(path: str):
+    """
+    Loads an index → image ID mapping: memory-mapped for .idmap files,
+    a {int: str} dict for JSON files.
+    """
+    if is_binary_mapping(path):
+        return IdMapping(path)
+    with open(path, "r") as f:
+        raw = json.load(f)
+    return {int(k): v for k, v in raw.items()}
+
+
+def convert_json_mapping(json_path: str, out_path: str, kind: str = None) -> int:
+    """
+    Converts an index_to_id.json mapping to the binary format. Keys must be
+    0..n-1. The kind defaults to "digest" when all IDs are SHA256 hex.
+
+    Returns:
+        int: Number of entries written
+    """
+    with open(json_path, "r") as f:
+        raw = json.load(f)
+    ids = [raw[str(i)] for i in range(len(raw))]
+
+    if kind is None:
+        is_digest = all(len(i) == 64 and _is_hex(i) for i in ids)
+        kind = "digest" if is_digest else "ascii"
+    width = max((len(i) for i in ids), default=1)
+    with IdMappingWriter(out_path, kind=kind, width=width) as w:
+        w.add(ids)
+    return len(ids)
+
+
+def _is_hex(value: str) -> bool:
+    try:
+        bytes.fromhex(value)
+        return True
+    except ValueError:
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="Convert index_to_id.json into a binary .idmap mapping."
+    )
+    ap.add_argument("json_path")
+    ap.add_argument("out_path", nargs="?", help="Default: same name with .idmap")
+    args = ap.parse_args()
+    out = args.out_path or os.path.splitext(args.json_path)[0] + IDMAP_EXTENSION
+    n = convert_json_mapping(args.json_path, out)
+    print(f"✅ Wrote {n} IDs to {out}")
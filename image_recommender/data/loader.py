@@ -6,24 +6,64 @@ from PIL import Image
 # Ensure the parent directory is in the system path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from image_recommender.data.database import create_table, insert_image_data
+from image_recommender.data.database import (
+    create_table,
+    insert_image_data,
+    iter_images,
+    iter_missing_phashes,
+    update_phashes,
+)
+from image_recommender.data.histogram_store import (
+    FLUSH_EVERY,
+    HISTOGRAM_BINS,
+    histograms_out,
+    open_histogram_writer,
+    stored_histogram_ids,
+)
+from image_recommender.similarity.hist_similarity import (
+    compute_histogram,
+    compute_histograms_batch,
+)
+from image_recommender.similarity.similarity_phash import compute_phash_int
 
 MAX_IMAGES = None  # or e.g. 5000 for partial run
 
+# Input size of CLIP and of the stored color/pHash features
+PREPROCESS_SIZE = (224, 224)
 
-def load_image(path):
+
+def read_image_size(path):
+    """
+    Returns (width, height) of an image from its file header, without
+    decoding any pixels, or None if the file cannot be read.
+    """
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def load_image(path, target_size=None):
     """
     Loads an image from disk and returns a PIL Image object in RGB format.
+
+    With target_size (width, height), JPEGs are decoded at the smallest
+    DCT scale (1/2, 1/4 or 1/8) that still covers it (Pillow's draft mode),
+    which skips most of the decoding work for multi-megapixel photos.
+    Other formats are decoded fully.
     """
     try:
         with Image.open(path) as img:
+            if target_size is not None:
+                img.draft("RGB", tuple(target_size))
             return img.convert("RGB")
     except Exception as e:
         print(f"❌ Error loading image {path}: {e}")
         return None
 
 
-def preprocess_image(image, size=(224, 224)):
+def preprocess_image(image, size=PREPROCESS_SIZE):
     """
     Resize and normalize the image.
     Returns a resized PIL image.
@@ -31,6 +71,15 @@ def preprocess_image(image, size=(224, 224)):
     return image.resize(size)
 
 
+def load_preprocessed_image(path, size=PREPROCESS_SIZE):
+    """
+    load_image + preprocess_image, decoding only the resolution the
+    resize needs. Returns None if the image cannot be loaded.
+    """
+    img = load_image(path, target_size=size)
+    return None if img is None else preprocess_image(img, size)
+
+
 def load_images_generator(dataset_path, extensions={".jpg", ".jpeg", ".png"}):
     """
     Generator that yields valid image file paths from a directory (including subfolders).
@@ -49,26 +98,97 @@ def generate_image_id(path):
     return hashlib.sha256(path.encode("utf-8")).hexdigest()
 
 
+def backfill_phashes(batch_size: int = 1000) -> int:
+    """
+    Computes and stores the pHash of every image in the database that has
+    none yet (rows ingested before hashes were stored).
+
+    Returns:
+        int: Number of hashes stored
+    """
+    create_table()
+    stored = 0
+    for rows in iter_missing_phashes(batch_size):
+        hashes = []
+        for image_id, path in rows:
+            img = load_preprocessed_image(path)
+            if img is not None:
+                # same input as the query side: the preprocessed image
+                hashes.append((image_id, compute_phash_int(img)))
+        update_phashes(hashes)
+        stored += len(hashes)
+        print(f"🔁 Stored {stored} pHashes")
+    return stored
+
+
+def backfill_histograms(
+    batch_size: int = 1000, histogram_path: str = histograms_out
+) -> int:
+    """
+    Computes and stores the color histogram of every image in the database
+    that is not in the histogram store yet.
+
+    Returns:
+        int: Number of histograms stored
+    """
+    create_table()
+    done = stored_histogram_ids(histogram_path)
+    stored = 0
+    with open_histogram_writer(histogram_path) as hist_store:
+        for rows in iter_images(batch_size):
+            ids, images = [], []
+            for image_id, path in rows:
+                if image_id in done:
+                    continue
+                img = load_preprocessed_image(path)
+                if img is not None:
+                    ids.append(image_id)
+                    images.append(img)
+            if ids:
+                hist_store.append(ids, compute_histograms_batch(images, HISTOGRAM_BINS))
+                stored += len(ids)
+            hist_store.flush()
+            print(f"🔁 Stored {stored} histograms")
+    return stored
+
+
 if __name__ == "__main__":
     dataset_path = "/Volumes/BigData06/data"
 
+    if "--backfill-phash" in sys.argv or "--backfill-hist" in sys.argv:
+        if "--backfill-phash" in sys.argv:
+            backfill_phashes()
+        if "--backfill-hist" in sys.argv:
+            backfill_histograms()
+        sys.exit(0)
+
     # Ensure the database table exists
     create_table()
+    has_histogram = stored_histogram_ids()
 
     count = 0
-    for path in load_images_generator(dataset_path):
-        img = load_image(path)
-        if img:
-            resized = preprocess_image(img)
-            image_id = generate_image_id(path)
-            width, height = resized.size
-
-            # Insert into the database
-            insert_image_data(image_id, path, width, height)
-
-            print(f"[{count}] ✅ Stored {path} → ID: {image_id}")
-            count += 1
-
-            # Optional limit
-            if MAX_IMAGES is not None and count >= MAX_IMAGES:
-                break
+    with open_histogram_writer() as hist_store:
+        for path in load_images_generator(dataset_path):
+            resized = load_preprocessed_image(path)
+            if resized:
+                image_id = generate_image_id(path)
+                width, height = resized.size
+
+                # Insert into the database; pHash and color histogram are
+                # stored so re-ranking never has to decode the image for them
+                insert_image_data(
+                    image_id, path, width, height, phash=compute_phash_int(resized)
+                )
+                if image_id not in has_histogram:
+                    hist = compute_histogram(resized, HISTOGRAM_BINS)
+                    hist_store.append([image_id], hist[None, :])
+                    has_histogram.add(image_id)
+
+                print(f"[{count}] ✅ Stored {path} → ID: {image_id}")
+                count += 1
+                if count % FLUSH_EVERY == 0:
+                    hist_store.flush()
+
+                # Optional limit
+                if MAX_IMAGES is not None and count >= MAX_IMAGES:
+                    break
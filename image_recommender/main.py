@@ -1,26 +1,73 @@
 import argparse
-from image_recommender.pipeline.search_pipeline import combined_similarity_search
+from image_recommender.data.id_mapping import find_mapping
+from image_recommender.pipeline.search_pipeline import (
+    DUPLICATE_DISTANCE,
+    batch_similarity_search,
+    combined_similarity_search,
+    near_duplicate_search,
+)
 from image_recommender.pipeline.visualize_results import show_image_results
 
 
+def run_bulk(args):
+    """Runs every query set of --queries-file through one batched search."""
+    with open(args.queries_file, "r") as f:
+        query_sets = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+
+    all_results = batch_similarity_search(
+        query_sets,
+        clip_index_path=args.index,
+        clip_mapping_path=args.mapping,
+        k_clip=args.clipk,
+        top_k_result=args.topk,
+        search_k=args.search_k,
+    )
+    for query_set, results in zip(query_sets, all_results):
+        print(f"\n🔍 Top {args.topk} similar images for:", ", ".join(query_set))
+        for rank, (path, score) in enumerate(results, 1):
+            print(f"{rank}. {score:.4f} → {path}")
+
+
+def run_duplicates(args):
+    """Near-duplicate search by stored pHashes only (no CLIP)."""
+    results = near_duplicate_search(
+        args.input_image, max_distance=args.max_distance, top_k_result=args.topk
+    )
+    print(
+        f"\n🔍 Near-duplicates (pHash distance <= {args.max_distance}) of:",
+        ", ".join(args.input_image),
+        "\n",
+    )
+    for rank, (path, dist) in enumerate(results, 1):
+        print(f"{rank}. {dist:2d} bits → {path}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Find similar images using combined CLIP, color, and pHash similarity."
     )
     parser.add_argument(
-        "input_image", type=str, nargs="+", help="Path(s) to one or more input images"
+        "input_image", type=str, nargs="*", help="Path(s) to one or more input images"
+    )
+    parser.add_argument(
+        "--queries-file",
+        type=str,
+        default=None,
+        help="Bulk mode: file with one query set per line (tab-separated image paths)",
     )
     parser.add_argument(
         "--index",
         type=str,
         default="image_recommender/data/out/clip_index.ann",
-        help="Path to Annoy index file",
+        help="Path to index file (.ann = Annoy, .npy = exact, .ivfpq = IVF-PQ, "
+        ".shards = sharded Annoy manifest) or versioned index root",
     )
     parser.add_argument(
         "--mapping",
         type=str,
-        default="image_recommender/data/out/index_to_id.json",
-        help="Path to index-to-ID mapping file",
+        default=None,
+        help="Path to index-to-ID mapping file (.idmap or .json; default: "
+        "index_to_id.idmap in image_recommender/data/out, else index_to_id.json)",
     )
     parser.add_argument(
         "--topk", type=int, default=5, help="Number of results to return"
@@ -28,11 +75,40 @@ def main():
     parser.add_argument(
         "--clipk", type=int, default=20, help="How many CLIP neighbors to consider"
     )
+    parser.add_argument(
+        "--search-k",
+        type=int,
+        default=None,
+        help="Annoy nodes inspected per query (default: CLIP_SEARCH_K or -1)",
+    )
+    parser.add_argument(
+        "--duplicates",
+        action="store_true",
+        help="Near-duplicate search by pHash only (no CLIP index needed)",
+    )
+    parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=DUPLICATE_DISTANCE,
+        help="pHash Hamming radius of --duplicates (of 64 bits)",
+    )
     parser.add_argument(
         "--visualize", action="store_true", help="Visualize results with matplotlib"
     )
 
     args = parser.parse_args()
+    if args.mapping is None:
+        # data/out of builds made before .idmap only has index_to_id.json
+        args.mapping = find_mapping("image_recommender/data/out")
+
+    if args.queries_file:
+        run_bulk(args)
+        return
+    if not args.input_image:
+        parser.error("give input image(s) or --queries-file")
+    if args.duplicates:
+        run_duplicates(args)
+        return
 
     results = combined_similarity_search(
         input_path=args.input_image,
@@ -40,6 +116,7 @@ def main():
         clip_mapping_path=args.mapping,
         k_clip=args.clipk,
         top_k_result=args.topk,
+        search_k=args.search_k,
     )
 
     print(
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import platform
+from itertools import cycle, islice
+
+from image_recommender.pipeline.memory_usage import RssSampler
+from image_recommender.similarity.similarity_embedding import (
+    compute_clip_embeddings_batch,
+    get_encoder_device,
+    get_encoder_id,
+)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Tuned batch sizes, keyed by host + encoder + device
+TUNING_PATH = os.path.join(BASE_DIR, "data", "out", "batch_size.json")
+
+CANDIDATE_BATCH_SIZES = (8, 16, 32, 64, 128, 256)
+
+
+def tuning_key() -> str:
+    """
+    Identifies the setup a tuned batch size is valid for.
+    """
+    return f"{platform.node()}|{get_encoder_id()}|{get_encoder_device()}"
+
+
+def probe_batch_size(
+    images,
+    batch_size: int,
+    repeats: int = 2,
+    embed_fn=compute_clip_embeddings_batch,
+    clock=time.perf_counter,
+) -> dict:
+    """
+    Measures throughput and peak RSS of embedding batches of one size.
+
+    Args:
+        images (list): Sample PIL images, cycled to fill the batch
+        batch_size (int): Batch size to probe
+        repeats (int): Timed batches after one warmup batch
+        embed_fn: Batch embedding function
+        clock: Timer returning seconds (tests inject a deterministic one)
+
+    Returns:
+        dict with batch_size, images_per_sec and peak_rss_mb
+    """
+    batch = list(islice(cycle(images), batch_size))
+    with RssSampler() as rss:
+        embed_fn(batch)  # warmup: allocator and kernel selection
+        t0 = clock()
+        for _ in range(repeats):
+            embed_fn(batch)
+        elapsed = clock() - t0
+    return {
+        "batch_size": batch_size,
+        "images_per_sec": batch_size * repeats / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": rss.peak / 2**20,
+    }
+
+
+def autotune_batch_size(
+    images,
+    max_rss_mb: float = None,
+    candidates=CANDIDATE_BATCH_SIZES,
+    repeats: int = 2,
+    embed_fn=compute_clip_embeddings_batch,
+    clock=time.perf_counter,
+):
+    """
+    Probes candidate batch sizes in increasing order and picks the one with
+    the highest throughput whose peak RSS stays under `max_rss_mb`.
+    Probing stops at the first size that exceeds the ceiling.
+
+    Returns:
+        Tuple of (best batch size, list of probe results)
+    """
+    if not images:
+        raise ValueError("autotune needs at least one sample image")
+
+    results = []
+    for batch_size in sorted(candidates):
+        result = probe_batch_size(images, batch_size, repeats, embed_fn, clock)
+        result["fits"] = max_rss_mb is None or result["peak_rss_mb"] <= max_rss_mb
+        results.append(result)
+        print(
+            f"  batch {batch_size:>4}: {result['images_per_sec']:.1f} img/s, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB"
+        )
+        if not result["fits"]:
+            break
+
+    fitting = [r for r in results if r["fits"]]
+    if not fitting:
+        best = min(candidates)
+    else:
+        best = max(fitting, key=lambda r: r["images_per_sec"])["batch_size"]
+    return best, results
+
+
+def load_tuned_batch_size(path: str = TUNING_PATH, key: str = None):
+    """
+    Returns the persisted batch size for this setup, or None.
+    """
+    key = key or tuning_key()
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get(key, {}).get("batch_size")
+    except (OSError, ValueError):
+        return None
+
+
+def save_tuned_batch_size(
+    batch_size: int,
+    results=None,
+    max_rss_mb: float = None,
+    path: str = TUNING_PATH,
+    key: str = None,
+):
+    """
+    Persists a tuned batch size (and the probe results) for this setup.
+    """
+    key = key or tuning_key()
+    try:
+        with open(path, "r") as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        tuned = {}
+
+    tuned[key] = {
+        "batch_size": batch_size,
+        "max_rss_mb": max_rss_mb,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results or [],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(tuned, f, indent=2)
+    os.replace(tmp, path)
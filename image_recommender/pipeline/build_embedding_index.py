@@ -1,19 +1,60 @@
 import os
 import json
+import argparse
+import hashlib
+import shutil
+import time
 from tqdm import tqdm
 from PIL import Image
 import sys
 
 # Add project root to import path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from data.database import connect_db
-from data.loader import load_image, preprocess_image
-from similarity.similarity_embedding import (
+from image_recommender.data.database import connect_db
+from image_recommender.pipeline.decode_pool import (
+    DECODE_WORKERS,
+    PREFETCH_BATCHES,
+    StageStats,
+    decode_for_embedding,
+    iter_decoded_batches,
+)
+from image_recommender.pipeline.memory_usage import RssSampler
+from image_recommender.pipeline.index_versions import (
+    create_staging_dir,
+    new_version_name,
+    prune_versions,
+    publish_version,
+    write_manifest,
+)
+from image_recommender.pipeline.batch_tuning import (
+    autotune_batch_size,
+    load_tuned_batch_size,
+    save_tuned_batch_size,
+)
+from image_recommender.data.id_mapping import open_mapping_writer
+from image_recommender.data.embedding_store import (
+    EmbeddingStore,
+    EmbeddingStoreWriter,
+    copy_store,
+    embeddings_out,
+    store_exists,
+)
+from image_recommender.similarity.similarity_embedding import (
     compute_clip_embedding,
     compute_clip_embeddings_batch,
-    build_annoy_index,
-    EMBEDDING_DIM,
+    ENCODER_BACKENDS,
+    get_embedding_dim,
+    get_encoder_id,
+    set_encoder_backend,
+)
+from image_recommender.similarity.ivfpq_index import IVFPQVectorIndex
+from image_recommender.similarity.sharded_index import build_shards
+from image_recommender.similarity.vector_index import (
+    INDEX_BACKENDS,
+    AnnoyVectorIndex,
+    ExactVectorIndex,
+    detect_backend,
 )
 
 # Define base project directory (2 levels up from this file)
@@ -21,11 +62,36 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 # Paths for output files
 index_out = os.path.join(BASE_DIR, "data", "out", "clip_index.ann")
-mapping_out = os.path.join(BASE_DIR, "data", "out", "index_to_id.json")
+mapping_out = os.path.join(BASE_DIR, "data", "out", "index_to_id.idmap")
+
+# Root of versioned index builds (see pipeline/index_versions.py)
+versions_out = os.path.join(BASE_DIR, "data", "out", "index")
+KEEP_VERSIONS = 3
+# Copy of the embedding store an IVF-PQ version re-ranks from
+RERANK_STORE = "rerank_embeddings"
 
 # Batch size for embedding
 BATCH_SIZE = 64  # added
 
+# Distinct sample images used when auto-tuning the batch size
+AUTOTUNE_SAMPLE = 32
+
+# Batches between build checkpoints
+CHECKPOINT_EVERY = 20
+
+# Annoy forest size; see tools/tune_annoy.py for the recall/latency trade-off
+N_TREES = 10
+
+# Store rows read per chunk while building the index
+INDEX_CHUNK_ROWS = 4096
+
+# Fixed index seed (Annoy trees, IVF-PQ k-means) so that rebuilding from
+# the same store gives the same file
+ANNOY_SEED = 42
+
+# Per-run statistics, one JSON object per line, next to the embedding store
+BUILD_RUNS_FILE = "build_runs.jsonl"
+
 
 def get_all_images_from_db():
     """
@@ -33,74 +99,693 @@ def get_all_images_from_db():
     """
     with connect_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, path FROM images;")
+        cursor.execute("SELECT id, path FROM images ORDER BY rowid;")
         return cursor.fetchall()
 
 
-def build_and_save_embeddings(index_path: str, mapping_path: str, max_images=None):
+def default_embeddings_path(index_path: str) -> str:
+    """
+    Returns the embedding store path that lives next to the given index file.
+    """
+    return os.path.join(os.path.dirname(index_path), "clip_embeddings")
+
+
+def _stream_rows(store: EmbeddingStore, mapping, chunk_rows: int):
+    # Vectors one by one for Annoy; the mapping is written as rows are added
+    for _, vectors, image_ids in store.iter_chunks(chunk_rows):
+        mapping.add(image_ids)
+        yield from vectors
+
+
+def build_index_from_store(
+    embeddings_path: str,
+    index_path: str,
+    mapping_path: str,
+    n_trees: int = N_TREES,
+    backend: str = None,
+    low_memory: bool = False,
+    **index_params,
+) -> dict:
+    """
+    Builds the vector index and ID mapping from a persisted embedding store.
+    Index item i is row i of the store. No CLIP inference is involved.
+
+    The mapping is streamed to disk and, for Annoy, the store is read chunk
+    by chunk. With low_memory=True, Annoy builds directly into the index file
+    (on-disk build) instead of holding the forest in RAM, so peak RSS stays
+    roughly flat as the corpus grows. The RSS high-water mark is logged.
+
+    Args:
+        embeddings_path (str): Path of the embedding store
+        index_path (str): File path to save the index
+        mapping_path (str): File path to save ID mapping (index → image_id)
+        n_trees (int): Number of Annoy trees
+        backend (str): "annoy", "exact", "ivfpq" or "sharded" (default: from
+            the index extension)
+        low_memory (bool): Use Annoy's on-disk build
+        index_params: Backend build parameters: nlist / m / nprobe for
+            IVF-PQ (the index keeps a reference to the store for exact
+            re-ranking), shards / shard_workers for sharded Annoy
+
+    Returns:
+        dict with backend, seconds, peak_rss_mb, rss_growth_mb and
+        anon_growth_mb (growth not backed by a file, i.e. not reclaimable)
+    """
+    backend = backend or detect_backend(index_path)
+    store = EmbeddingStore(embeddings_path)
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    os.makedirs(os.path.dirname(mapping_path), exist_ok=True)
+
+    t0 = time.perf_counter()
+    with RssSampler() as rss, open_mapping_writer(mapping_path) as mapping:
+        if backend == "annoy":
+            index = AnnoyVectorIndex(store.dim)
+            rows = tqdm(
+                _stream_rows(store, mapping, INDEX_CHUNK_ROWS),
+                total=store.count,
+                desc="Indexing embeddings",
+            )
+            on_disk_path = index_path + ".tmp" if low_memory else None
+            # single build thread: multi-threaded builds interleave node allocation
+            index.build(
+                rows,
+                n_trees=n_trees,
+                seed=ANNOY_SEED,
+                n_jobs=1,
+                on_disk_path=on_disk_path,
+            )
+            if low_memory:
+                index.annoy.unload()
+                os.replace(on_disk_path, index_path)
+                index = None  # already written
+        else:
+            for _, _, image_ids in store.iter_chunks(
+                INDEX_CHUNK_ROWS, with_vectors=False
+            ):
+                mapping.add(image_ids)
+
+        if backend == "sharded":
+            ranges = build_shards(
+                embeddings_path,
+                index_path,
+                n_shards=index_params.get("shards"),
+                n_trees=n_trees,
+                workers=index_params.get("shard_workers"),
+                seed=ANNOY_SEED,
+            )
+            print(f"🧩 Built {len(ranges)} Annoy shards in parallel")
+            index = None  # shards and manifest are already on disk
+        elif backend == "ivfpq":
+            index = IVFPQVectorIndex(**_ivfpq_search_params(index_params))
+            index.build(
+                store.vectors,
+                seed=ANNOY_SEED,
+                store_path=embeddings_path,
+                **index_params,
+            )
+            print(
+                f"📦 IVF-PQ: {index.nlist} lists, m={index.m}, "
+                f"{index.memory_bytes() / 2**20:.1f} MB "
+                f"(raw vectors {store.vectors.nbytes / 2**20:.1f} MB)"
+            )
+        elif backend == "exact":
+            index = ExactVectorIndex(store.vectors)
+        if index is not None:
+            index.save(index_path)
+
+    print(f"✅ Saved {backend} index to {index_path}")
+    print(f"✅ Saved index-to-ID mapping to {mapping_path}")
+    print(
+        f"📈 Index build peak RSS: {rss.peak / 2**20:.0f} MB "
+        f"(+{rss.growth / 2**20:.0f} MB, of which +{rss.anon_growth / 2**20:.0f} MB "
+        f"not file-backed)"
+    )
+    return {
+        "backend": backend,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "rss_growth_mb": round(rss.growth / 2**20, 1),
+        "anon_growth_mb": round(rss.anon_growth / 2**20, 1),
+    }
+
+
+def build_index_version(
+    embeddings_path: str,
+    versions_root: str,
+    index_file: str = "clip_index.ann",
+    mapping_file: str = "index_to_id.idmap",
+    n_trees: int = N_TREES,
+    backend: str = None,
+    low_memory: bool = False,
+    keep_versions: int = KEEP_VERSIONS,
+    **index_params,
+) -> dict:
+    """
+    Builds the index and mapping into a new version directory under
+    versions_root, writes its manifest (model, dimension, count, checksums,
+    build parameters) and atomically makes it the current version.
+    Readers of the previous version are not affected.
+
+    An IVF-PQ index re-ranks with full vectors, so the version gets its own
+    copy of the store (covered by the manifest checksums) instead of a
+    reference to embeddings_path, which the next build rewrites.
+
+    Returns:
+        dict: Index build statistics plus "version"
+    """
+    version = new_version_name()
+    staging = create_staging_dir(versions_root, version)
+    try:
+        index_store = embeddings_path
+        if (backend or detect_backend(index_file)) == "ivfpq":
+            index_store = copy_store(
+                embeddings_path, os.path.join(staging, RERANK_STORE)
+            )
+        stats = build_index_from_store(
+            index_store,
+            os.path.join(staging, index_file),
+            os.path.join(staging, mapping_file),
+            n_trees=n_trees,
+            backend=backend,
+            low_memory=low_memory,
+            **dict(index_params),
+        )
+        store = EmbeddingStore(index_store)
+        write_manifest(
+            staging,
+            version,
+            index_file,
+            mapping_file,
+            model=store.model,
+            dim=store.dim,
+            count=store.count,
+            backend=stats["backend"],
+            build_params={
+                "n_trees": n_trees,
+                "low_memory": low_memory,
+                "seed": ANNOY_SEED,
+                "embeddings": os.path.abspath(embeddings_path),
+                **index_params,
+            },
+        )
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    publish_version(versions_root, staging, version)
+    prune_versions(versions_root, keep_versions)
+    print(f"🚀 Published index version {version} in {versions_root}")
+    return {**stats, "version": version}
+
+
+def _ivfpq_search_params(index_params: dict) -> dict:
+    # Search-time settings are saved with the index, not used by the build
+    return {
+        key: index_params.pop(key)
+        for key in ("nprobe", "rerank")
+        if index_params.get(key) is not None
+    }
+
+
+def record_build_run(out_dir: str, run: dict):
     """
-    Loads images from DB, computes CLIP embeddings, builds Annoy index.
+    Appends the statistics of one build run to <out_dir>/build_runs.jsonl.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, BUILD_RUNS_FILE), "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def _autotune(rows, max_rss_mb: float = None) -> int:
+    """
+    Auto-tunes the embedding batch size on a sample of the input rows
+    and persists the result for later runs.
+    """
+    sample = []
+    for _, path in rows:
+        img = decode_for_embedding(path)
+        if img is not None:
+            sample.append(img)
+        if len(sample) >= AUTOTUNE_SAMPLE:
+            break
+
+    if not sample:
+        best = load_tuned_batch_size() or BATCH_SIZE
+        print(f"⚠️ No sample image could be decoded, using batch size {best}")
+        return best
+
+    print(f"⚙️  Auto-tuning batch size on {len(sample)} sample images...")
+    best, results = autotune_batch_size(sample, max_rss_mb=max_rss_mb)
+    save_tuned_batch_size(best, results, max_rss_mb)
+    print(f"⚙️  Using batch size {best}")
+    return best
+
+
+def checkpoint_path(embeddings_path: str) -> str:
+    """
+    Returns the path of the build checkpoint belonging to an embedding store.
+    """
+    return embeddings_path + ".checkpoint.json"
+
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _source_digest(data) -> str:
+    # Identifies the exact input list, so a resume cannot silently mix sources
+    h = hashlib.sha256()
+    for image_id, _ in data:
+        h.update(image_id.encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_and_save_embeddings(
+    index_path: str,
+    mapping_path: str,
+    max_images=None,
+    embeddings_path: str = None,
+    dtype: str = "float32",
+    workers: int = DECODE_WORKERS,
+    use_processes: bool = False,
+    prefetch_batches: int = PREFETCH_BATCHES,
+    incremental: bool = False,
+    resume: bool = False,
+    checkpoint_every: int = CHECKPOINT_EVERY,
+    batch_size=None,
+    max_rss_mb: float = None,
+    index_backend: str = None,
+    index_params: dict = None,
+    n_trees: int = N_TREES,
+    low_memory: bool = False,
+    versions_root: str = None,
+):
+    """
+    Loads images from DB, computes CLIP embeddings, builds the vector index.
+    The embeddings are also persisted as a memory-mappable store, so the
+    index can later be rebuilt without re-running CLIP.
+
+    Images are decoded by a pool of workers that prefetches ready batches
+    while the model encodes the previous one.
+
+    Every `checkpoint_every` batches (and on Ctrl-C or an error) the store
+    is flushed and a checkpoint records how far the input list has been
+    consumed. With resume=True a build continues after the last completed
+    batch; since batches are re-formed from the same position, the result
+    is identical to an uninterrupted run.
 
     Args:
-        index_path (str): File path to save Annoy index
+        index_path (str): File path to save the index (.ann or .npy)
         mapping_path (str): File path to save ID mapping (index → image_id)
         max_images (int): Maximum number of images to process
+        embeddings_path (str): Embedding store path (default: next to the index)
+        dtype (str): Storage dtype of the embedding matrix ("float32" or "float16")
+        workers (int): Number of decode workers
+        use_processes (bool): Decode in processes instead of threads
+        prefetch_batches (int): Ready batches buffered ahead of the encoder
+        incremental (bool): Keep the existing embedding store and only embed
+            images whose IDs it does not contain yet
+        resume (bool): Continue from the checkpoint of an interrupted build;
+            raises FileNotFoundError if there is none
+        checkpoint_every (int): Batches between checkpoints
+        batch_size (int or "auto"): Embedding batch size. None uses the
+            size persisted by an earlier auto-tune, else BATCH_SIZE; "auto"
+            probes candidate sizes on a sample of the input and persists
+            the best one
+        max_rss_mb (float): Memory ceiling for auto-tuning
+        index_backend (str): "annoy", "exact", "ivfpq" or "sharded"
+            (default: from the index file extension)
+        index_params (dict): Extra build parameters of the index backend
+        n_trees (int): Number of Annoy trees
+        low_memory (bool): Build the Annoy index on disk instead of in RAM
+        versions_root (str): Publish the index as a new version under this
+            directory (index_path only names the index file) instead of
+            overwriting index_path and mapping_path
+
+    Returns:
+        dict: Statistics of this run (also appended to build_runs.jsonl)
     """
+    if embeddings_path is None:
+        embeddings_path = default_embeddings_path(index_path)
+    ckpt_path = checkpoint_path(embeddings_path)
+
+    checkpoint = None
+    if resume and not os.path.exists(ckpt_path):
+        # falling through to a full build would rewrite a finished store
+        raise FileNotFoundError(
+            f"No checkpoint at {ckpt_path} to resume from (the last build "
+            "finished or never started); run without --resume, or with "
+            "--incremental to embed only new images"
+        )
+    if resume:
+        with open(ckpt_path, "r") as f:
+            checkpoint = json.load(f)
+        incremental = checkpoint["mode"] == "incremental"
+    elif os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+
+    started = time.time()
     data = get_all_images_from_db()
     if max_images:
         data = data[:max_images]
 
-    print(f"🧠 Processing {len(data)} images (CLIP Embeddings)...")
-
-    from annoy import AnnoyIndex
-
-    index = AnnoyIndex(EMBEDDING_DIM, metric="angular")
-    mapping = {}
-
-    # batch accumulation + flush
-    batch_imgs = []
-    batch_ids = []
-    i = 0  # running Annoy item index
-
-    def _flush_batch():
-        nonlocal i, batch_imgs, batch_ids
-        if not batch_imgs:
-            return
-        embs = compute_clip_embeddings_batch(batch_imgs).numpy()
-        for j in range(embs.shape[0]):
-            index.add_item(i, embs[j].tolist())
-            mapping[i] = batch_ids[j]
-            i += 1
-        batch_imgs.clear()
-        batch_ids.clear()
-
-    for image_id, path in tqdm(data, desc="Embedding images"):
-        img = load_image(path)
-        if img is None:
-            continue
-        img = preprocess_image(img)
-
-        # use batch instead of per-image encode
-        batch_imgs.append(img)
-        batch_ids.append(image_id)
-        if len(batch_imgs) >= BATCH_SIZE:
-            _flush_batch()
-
-    # flush leftovers
-    _flush_batch()
+    run = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "mode": "incremental" if incremental else "full",
+        "total": len(data),
+        "skipped": 0,
+        "resumed_at": checkpoint["cursor"] if checkpoint else None,
+    }
 
-    os.makedirs(os.path.dirname(index_path), exist_ok=True)
-    os.makedirs(os.path.dirname(mapping_path), exist_ok=True)
+    # Rows already in the store when the (possibly interrupted) run began
+    if checkpoint:
+        base_rows = checkpoint["base_rows"]
+    elif incremental and store_exists(embeddings_path):
+        base_rows = EmbeddingStore(embeddings_path).count
+    else:
+        base_rows = 0
 
-    index.build(10)
-    index.save(index_path)
+    encoder_id = get_encoder_id()
+    if base_rows:
+        existing = EmbeddingStore(embeddings_path)
+        if existing.model not in (None, encoder_id):
+            raise ValueError(
+                f"Store {embeddings_path} was built with {existing.model}, "
+                f"not {encoder_id}; run a full build instead"
+            )
+        embedded = {raw.decode("ascii") for raw in existing.ids[:base_rows]}
+        data = [row for row in data if row[0] not in embedded]
+        run["skipped"] = run["total"] - len(data)
+        del existing, embedded
 
-    with open(mapping_path, "w") as f:
-        json.dump(mapping, f)
+    digest = _source_digest(data)
+    if checkpoint and checkpoint["source"] != digest:
+        raise ValueError(
+            "The image list changed since the checkpoint was written; "
+            "start a new build without --resume"
+        )
+    cursor = checkpoint["cursor"] if checkpoint else 0
 
-    print(f"✅ Saved Annoy index to {index_path}")
-    print(f"✅ Saved index-to-ID mapping to {mapping_path}")
+    if checkpoint:
+        # batch boundaries must match the interrupted run
+        batch_size = checkpoint.get("batch_size", BATCH_SIZE)
+    elif batch_size == "auto":
+        batch_size = _autotune(data[: AUTOTUNE_SAMPLE * 2], max_rss_mb)
+    elif batch_size is None:
+        batch_size = load_tuned_batch_size() or BATCH_SIZE
+    run["batch_size"] = batch_size
+
+    print(
+        f"🧠 Processing {len(data) - cursor} images (CLIP Embeddings), "
+        f"{run['skipped']} already embedded..."
+    )
+
+    # resolved here, after the encoder backend was selected (--encoder
+    # torchscript may load an artifact of another dimension)
+    writer = EmbeddingStoreWriter(
+        embeddings_path,
+        get_embedding_dim(),
+        dtype=dtype,
+        model=encoder_id,
+        append=bool(base_rows or checkpoint),
+        keep_rows=checkpoint["rows"] if checkpoint else None,
+    )
+    rows_before = writer.count
+    stats = StageStats()
+    batches = iter_decoded_batches(
+        data[cursor:],
+        batch_size,
+        workers=workers,
+        use_processes=use_processes,
+        prefetch_batches=prefetch_batches,
+        stats=stats,
+    )
+
+    def _checkpoint(consumed: int, rows: int):
+        writer.flush()
+        _save_checkpoint(
+            ckpt_path,
+            {
+                "mode": run["mode"],
+                "source": digest,
+                "base_rows": base_rows,
+                "cursor": cursor + consumed,
+                "rows": rows,
+                "batch_size": batch_size,
+            },
+        )
+
+    with (
+        writer,
+        tqdm(total=len(data), initial=cursor, desc="Embedding images") as progress,
+    ):
+        # (input consumed, store rows) of the last whole batch: set in one
+        # assignment, so an interrupt right after writer.append() leaves it
+        # at the previous batch and resume cuts the store back to match
+        committed = (0, writer.count)
+        since_checkpoint = 0
+        wait_start = time.perf_counter()
+        try:
+            for batch_ids, batch_imgs, consumed in batches:
+                # time the encoder sat idle waiting for decoded images
+                stats.add(
+                    "wait for decode",
+                    len(batch_imgs),
+                    time.perf_counter() - wait_start,
+                )
+
+                t0 = time.perf_counter()
+                embs = compute_clip_embeddings_batch(batch_imgs).numpy()
+                stats.add("encode", len(batch_imgs), time.perf_counter() - t0)
+                writer.append(batch_ids, embs)
+                progress.update(consumed - committed[0])
+                committed = (consumed, writer.count)
+
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    _checkpoint(*committed)
+                    since_checkpoint = 0
+                wait_start = time.perf_counter()
+        finally:
+            # Also on Ctrl-C / errors: only rows matching the cursor count
+            _checkpoint(*committed)
+
+    print(f"✅ Saved {writer.count} embeddings to {embeddings_path}")
+    print(stats.report())
+
+    if versions_root:
+        run["index"] = build_index_version(
+            embeddings_path,
+            versions_root,
+            index_file=os.path.basename(index_path),
+            n_trees=n_trees,
+            backend=index_backend,
+            low_memory=low_memory,
+            **(index_params or {}),
+        )
+    else:
+        run["index"] = build_index_from_store(
+            embeddings_path,
+            index_path,
+            mapping_path,
+            n_trees=n_trees,
+            backend=index_backend,
+            low_memory=low_memory,
+            **(index_params or {}),
+        )
+    os.remove(ckpt_path)
+
+    run.update(
+        embedded=writer.count - rows_before,
+        failed=stats.failed,
+        store_rows=writer.count,
+        seconds=round(time.time() - started, 3),
+    )
+    record_build_run(os.path.dirname(os.path.abspath(embeddings_path)), run)
+    print(
+        f"📊 Run: {run['embedded']} embedded, {run['skipped']} skipped, "
+        f"{run['failed']} failed"
+    )
+    return run
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(
+        description="Compute CLIP embeddings and build the vector index."
+    )
+    ap.add_argument("--index", default=index_out, help="Output index path")
+    ap.add_argument(
+        "--index-backend",
+        choices=list(INDEX_BACKENDS),
+        default=None,
+        help="annoy (approximate), exact (brute force), ivfpq (compressed) or "
+        "sharded (parallel Annoy shards); default from the --index extension "
+        "(.ann / .npy / .ivfpq / .shards)",
+    )
+    ap.add_argument(
+        "--shards", type=int, default=None, help="Annoy shards (default: CPU count)"
+    )
+    ap.add_argument(
+        "--shard-workers",
+        type=int,
+        default=None,
+        help="Processes building shards (default: one per shard)",
+    )
+    ap.add_argument(
+        "--n-trees", type=int, default=N_TREES, help="Annoy trees (see tune_annoy)"
+    )
+    ap.add_argument(
+        "--publish",
+        nargs="?",
+        const=versions_out,
+        default=None,
+        metavar="ROOT",
+        help="Publish a new index version under ROOT (default %(const)s) and "
+        "switch CURRENT to it, instead of overwriting --index/--mapping",
+    )
+    ap.add_argument("--keep-versions", type=int, default=KEEP_VERSIONS)
+    ap.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Build the Annoy index on disk (bounded RSS for large corpora)",
+    )
+    ap.add_argument("--nlist", type=int, default=None, help="IVF-PQ inverted lists")
+    ap.add_argument(
+        "--pq-m", type=int, default=None, help="IVF-PQ sub-quantizers (bytes/vector)"
+    )
+    ap.add_argument(
+        "--nprobe", type=int, default=None, help="IVF-PQ lists scanned per query"
+    )
+    ap.add_argument("--mapping", default=mapping_out, help="Output mapping path")
+    ap.add_argument("--embeddings", default=embeddings_out, help="Embedding store path")
+    ap.add_argument("--max-images", type=int, default=None)
+    ap.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    ap.add_argument(
+        "--batch-size",
+        default=None,
+        help="Embedding batch size, or 'auto' to probe and persist the best size "
+        "(default: last tuned size, else %d)" % BATCH_SIZE,
+    )
+    ap.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        help="Memory ceiling for --batch-size auto",
+    )
+    ap.add_argument(
+        "--encoder",
+        choices=ENCODER_BACKENDS,
+        default=None,
+        help="CLIP encoder backend (int8 = dynamically quantized, CPU only)",
+    )
+    ap.add_argument(
+        "--workers", type=int, default=DECODE_WORKERS, help="Decode workers"
+    )
+    ap.add_argument(
+        "--processes",
+        action="store_true",
+        help="Decode in a process pool instead of threads",
+    )
+    ap.add_argument(
+        "--prefetch",
+        type=int,
+        default=PREFETCH_BATCHES,
+        help="Decoded batches buffered ahead of the encoder",
+    )
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed images that are not in the embedding store yet",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted build from its last checkpoint",
+    )
+    ap.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=CHECKPOINT_EVERY,
+        help="Batches between checkpoints",
+    )
+    ap.add_argument(
+        "--from-store",
+        action="store_true",
+        help="Rebuild the index from the stored embeddings without running CLIP",
+    )
+    return ap.parse_args()
+
+
+def _parse_batch_size(value):
+    if value is None or value == "auto":
+        return value
+    return int(value)
+
+
+def _index_params(args) -> dict:
+    params = {
+        "nlist": args.nlist,
+        "m": args.pq_m,
+        "nprobe": args.nprobe,
+        "shards": args.shards,
+        "shard_workers": args.shard_workers,
+    }
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def main():
+    args = parse_args()
+    if args.encoder:
+        set_encoder_backend(args.encoder)
+    if args.from_store and args.publish:
+        build_index_version(
+            args.embeddings,
+            args.publish,
+            index_file=os.path.basename(args.index),
+            n_trees=args.n_trees,
+            backend=args.index_backend,
+            low_memory=args.low_memory,
+            keep_versions=args.keep_versions,
+            **_index_params(args),
+        )
+    elif args.from_store:
+        build_index_from_store(
+            args.embeddings,
+            args.index,
+            args.mapping,
+            n_trees=args.n_trees,
+            backend=args.index_backend,
+            low_memory=args.low_memory,
+            **_index_params(args),
+        )
+    else:
+        build_and_save_embeddings(
+            args.index,
+            args.mapping,
+            max_images=args.max_images,
+            embeddings_path=args.embeddings,
+            dtype=args.dtype,
+            workers=args.workers,
+            use_processes=args.processes,
+            prefetch_batches=args.prefetch,
+            incremental=args.incremental,
+            resume=args.resume,
+            checkpoint_every=args.checkpoint_every,
+            batch_size=_parse_batch_size(args.batch_size),
+            max_rss_mb=args.max_rss_mb,
+            index_backend=args.index_backend,
+            index_params=_index_params(args),
+            n_trees=args.n_trees,
+            low_memory=args.low_memory,
+            versions_root=args.publish,
+        )
 
 
 if __name__ == "__main__":
-    build_and_save_embeddings(index_out, mapping_out)
+    main()
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from image_recommender.data.loader import load_preprocessed_image
+
+# Default number of decode workers and of ready batches kept in the queue
+DECODE_WORKERS = 4
+PREFETCH_BATCHES = 2
+
+_SENTINEL = object()
+
+
+def decode_for_embedding(path):
+    """
+    Loads and preprocesses one image for CLIP. Top-level so that it can be
+    shipped to a process pool. Returns None if the image cannot be loaded.
+    """
+    return load_preprocessed_image(path)
+
+
+class StageStats:
+    """
+    Accumulates per-stage item counts and busy time, e.g. for "decode"
+    and "encode", and reports images/sec for each stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = {}
+        self.seconds = {}
+        self.failed = 0
+
+    def add(self, stage: str, n: int, seconds: float):
+        with self._lock:
+            self.items[stage] = self.items.get(stage, 0) + n
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def rate(self, stage: str) -> float:
+        secs = self.seconds.get(stage, 0.0)
+        return self.items.get(stage, 0) / secs if secs > 0 else 0.0
+
+    def report(self) -> str:
+        lines = []
+        for stage in self.items:
+            lines.append(
+                f"{stage}: {self.items[stage]} images in {self.seconds[stage]:.2f} s"
+                f" → {self.rate(stage):.1f} img/s"
+            )
+        if self.failed:
+            lines.append(f"failed to decode: {self.failed}")
+        return "\n".join(lines)
+
+
+def iter_decoded_batches(
+    rows,
+    batch_size: int,
+    workers: int = DECODE_WORKERS,
+    use_processes: bool = False,
+    prefetch_batches: int = PREFETCH_BATCHES,
+    stats: StageStats = None,
+    decode_fn=decode_for_embedding,
+):
+    """
+    Decodes images in a background worker pool and yields ready batches.
+
+    A producer thread keeps a bounded window of decode jobs in flight and
+    packs results, in input order, into batches of `batch_size`. At most
+    `prefetch_batches` ready batches wait in the queue, so decoding runs
+    ahead of the consumer (the CLIP encoder) without unbounded memory.
+
+    Args:
+        rows: Iterable of (image_id, path)
+        batch_size (int): Images per yielded batch
+        workers (int): Number of decode workers
+        use_processes (bool): Use a process pool instead of threads
+        prefetch_batches (int): Maximum number of ready batches in the queue
+        stats (StageStats): Optional; receives "decode" time and failures
+        decode_fn: Callable path -> PIL image or None
+
+    Yields:
+        Tuple of (list of image_id, list of PIL images, rows consumed),
+        where rows consumed counts input rows up to the end of this batch,
+        including images that failed to decode
+    """
+    ready = queue.Queue(maxsize=max(1, prefetch_batches))
+    stop = threading.Event()
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    max_in_flight = max(batch_size, workers * 4)
+
+    def _put(item):
+        # Give up if the consumer went away, otherwise block on a full queue
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        batch_ids, batch_imgs = [], []
+        consumed = 0
+        busy_start = time.perf_counter()
+        try:
+            with executor_cls(max_workers=workers) as ex:
+                pending = deque()
+                it = iter(rows)
+                exhausted = False
+                while not stop.is_set():
+                    while not exhausted and len(pending) < max_in_flight:
+                        try:
+                            image_id, path = next(it)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        pending.append((image_id, ex.submit(decode_fn, path)))
+                    if not pending:
+                        break
+
+                    image_id, fut = pending.popleft()
+                    img = fut.result()
+                    consumed += 1
+                    if img is None:
+                        if stats is not None:
+                            stats.failed += 1
+                    else:
+                        batch_ids.append(image_id)
+                        batch_imgs.append(img)
+
+                    if len(batch_imgs) >= batch_size:
+                        if stats is not None:
+                            stats.add(
+                                "decode",
+                                len(batch_imgs),
+                                time.perf_counter() - busy_start,
+                            )
+                        if not _put((batch_ids, batch_imgs, consumed)):
+                            break
+                        batch_ids, batch_imgs = [], []
+                        busy_start = time.perf_counter()
+
+                for _, fut in pending:
+                    fut.cancel()
+
+            if batch_imgs and not stop.is_set():
+                if stats is not None:
+                    stats.add(
+                        "decode", len(batch_imgs), time.perf_counter() - busy_start
+                    )
+                _put((batch_ids, batch_imgs, consumed))
+            _put(_SENTINEL)
+        except BaseException as e:  # surface worker errors in the consumer
+            _put(e)
+
+    producer = threading.Thread(target=_produce, name="decode-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is _SENTINEL:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -0,0 +1,311 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Allow running as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from image_recommender.data.database import get_all_phashes, replace_duplicate_clusters
+from image_recommender.data.embedding_store import EmbeddingStore, embeddings_out
+from image_recommender.similarity.phash_index import flip_masks, split_hashes
+from image_recommender.similarity.similarity_phash import paired_hamming_distances
+
+# Two images are near-duplicates if their pHashes differ in at most
+# MAX_DISTANCE bits (and, optionally, their CLIP cosine is high enough)
+MAX_DISTANCE = 6
+
+# Banded LSH: the 64-bit hash is cut into N_BANDS bands. Candidate pairs
+# share a band value up to max_distance // N_BANDS flipped bits, so by the
+# pigeonhole principle no pair within max_distance is missed.
+N_BANDS = 4
+SUPPORTED_BANDS = (4, 8)
+
+# Candidate pairs expanded and verified per step, bounds worker memory
+PAIR_CHUNK = 1 << 20
+
+# Embedding rows multiplied per block in the CLIP check of two hash groups
+COSINE_BLOCK = 1024
+
+
+class UnionFind:
+    """Disjoint sets over rows 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def union_edges(self, edges):
+        for a, b in edges:
+            self.union(a, b)
+
+    def groups(self):
+        """Sets with at least two members, as sorted row lists."""
+        members = {}
+        for x in range(len(self.parent)):
+            members.setdefault(self.find(x), []).append(x)
+        return sorted((g for g in members.values() if len(g) > 1), key=lambda g: g[0])
+
+
+def _unit_rows(vectors, rows) -> np.ndarray:
+    v = np.asarray(vectors[rows], dtype=np.float32)
+    return v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+
+
+def cosine_pairs(vectors, rows_a, rows_b, threshold: float, same: bool = False):
+    """
+    Every pair (i, j) of rows_a[i] and rows_b[j] whose embeddings have a
+    cosine similarity of at least threshold, checked block by block.
+    Rows < 0 (image without embedding) never match. With same=True the
+    two row lists are one group, and only pairs i < j are returned.
+
+    Returns:
+        np.ndarray: (k, 2) positions into rows_a and rows_b
+    """
+    rows_a, rows_b = np.asarray(rows_a), np.asarray(rows_b)
+    ok_a, ok_b = np.flatnonzero(rows_a >= 0), np.flatnonzero(rows_b >= 0)
+    out = []
+    if len(ok_a) and len(ok_b):
+        vb = _unit_rows(vectors, rows_b[ok_b])
+        for start in range(0, len(ok_a), COSINE_BLOCK):
+            block = ok_a[start : start + COSINE_BLOCK]
+            i, j = np.nonzero(_unit_rows(vectors, rows_a[block]) @ vb.T >= threshold)
+            i, j = block[i], ok_b[j]
+            if same:
+                i, j = i[i < j], j[i < j]
+            out.append(np.stack([i, j], axis=1))
+    return np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
+
+
+# Per-process state of the LSH workers, set once by _init_worker
+_state = {}
+
+
+def _init_worker(hashes, n_bands, max_distance):
+    _state.clear()
+    _state.update(
+        hashes=hashes,
+        bands=split_hashes(hashes, n_bands),
+        bits=64 // n_bands,
+        max_distance=max_distance,
+        tables={},
+    )
+
+
+def _band_table(band: int):
+    # rows sorted by band value, plus the start of every possible value
+    tables = _state["tables"]
+    if band not in tables:
+        values = _state["bands"][:, band]
+        order = np.argsort(values, kind="stable")
+        counts = np.bincount(values, minlength=1 << _state["bits"])
+        tables[band] = (order, values[order], np.concatenate([[0], np.cumsum(counts)]))
+    return tables[band]
+
+
+def _band_edges(band: int, mask: int) -> np.ndarray:
+    """
+    Pairs of hashes within max_distance among rows whose value in `band`
+    differs exactly by `mask` (mask 0: rows in the same bucket).
+
+    Returns:
+        np.ndarray: (k, 2) row pairs
+    """
+    hashes = _state["hashes"]
+    order, values, offsets = _band_table(band)
+    n = len(order)
+    pos = np.arange(n)
+    if mask == 0:
+        lo, hi = pos + 1, offsets[values + 1]
+    else:
+        other = values ^ mask
+        lo = offsets[other]
+        # each pair of buckets once, from the smaller value
+        hi = np.where(values < other, offsets[other + 1], lo)
+    counts = hi - lo
+    cum = np.cumsum(counts)
+
+    edges = []
+    start = 0
+    while start < n:
+        base = cum[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(cum, base + PAIR_CHUNK, "right")))
+        c = counts[start:end]
+        total = int(c.sum())
+        if total:
+            src = np.repeat(pos[start:end], c)
+            dst = np.repeat(lo[start:end] - (np.cumsum(c) - c), c) + np.arange(total)
+            a, b = order[src], order[dst]
+            keep = (
+                paired_hamming_distances(hashes[a], hashes[b]) <= _state["max_distance"]
+            )
+            a, b = a[keep], b[keep]
+            edges.append(np.stack([a, b], axis=1))
+        start = end
+    return np.concatenate(edges) if edges else np.empty((0, 2), dtype=np.int64)
+
+
+def find_duplicate_clusters(
+    max_distance: int = MAX_DISTANCE,
+    n_bands: int = N_BANDS,
+    workers: int = None,
+    clip_threshold: float = None,
+    embeddings_path: str = embeddings_out,
+    write: bool = True,
+) -> dict:
+    """
+    Groups all images with a stored pHash into near-duplicate clusters
+    and (with write=True) replaces the duplicate_clusters table with them.
+
+    Images are first grouped by identical hash. The distinct hashes then
+    go through banded LSH: each (band, flip mask) combination is one task
+    for the process pool, which expands the candidate pairs of its buckets
+    and keeps those within max_distance bits. Every image pair of two such
+    hash groups, and of one group, is a near-duplicate pair.
+
+    With clip_threshold, each of those image pairs must also have a CLIP
+    cosine similarity of at least that (from the embedding store); images
+    without an embedding are left out of all pairs. Clusters are the
+    connected components of the kept pairs (union-find).
+
+    Args:
+        max_distance (int): pHash Hamming distance of a near-duplicate pair
+        n_bands (int): LSH bands, 4 (16-bit) or 8 (8-bit)
+        workers (int): Worker processes (default: CPU count; 1 = in-process)
+        clip_threshold (float): Optional minimum CLIP cosine similarity
+        embeddings_path (str): Embedding store used with clip_threshold
+        write (bool): Store the clusters in SQLite
+
+    Returns:
+        dict: images, distinct hashes, near-duplicate image pairs, clusters,
+        clustered images and seconds
+    """
+    if n_bands not in SUPPORTED_BANDS:
+        raise ValueError(f"n_bands must be one of {SUPPORTED_BANDS}")
+    t0 = time.perf_counter()
+    ids, hashes = get_all_phashes()
+    hashes = np.asarray(hashes, dtype=np.int64)
+
+    # images grouped by hash: group g is order[starts[g]:starts[g + 1]]
+    unique, inverse = np.unique(hashes, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    sizes = np.bincount(inverse, minlength=len(unique))
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+
+    # distinct hashes: banded LSH, one task per (band, flip mask)
+    tasks = [
+        (band, int(mask))
+        for band in range(n_bands)
+        for mask in flip_masks(64 // n_bands, max_distance // n_bands)
+    ]
+    init_args = (unique, n_bands, max_distance)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(unique) < 2:
+        _init_worker(*init_args)
+        results = [_band_edges(*t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=init_args
+        ) as ex:
+            results = list(ex.map(_band_edges, *zip(*tasks)))
+
+    # a pair of hashes can be found in several bands; keep it once
+    hash_edges = np.unique(
+        np.sort(np.concatenate([np.empty((0, 2), dtype=np.int64), *results]), axis=1),
+        axis=0,
+    )
+    hu, hv = hash_edges[:, 0], hash_edges[:, 1]
+
+    uf = UnionFind(len(ids))
+    if clip_threshold is None:
+        # all image pairs qualify: chain each group, join groups by one image
+        same = inverse[order][1:] == inverse[order][:-1]
+        uf.union_edges(zip(order[:-1][same].tolist(), order[1:][same].tolist()))
+        uf.union_edges(zip(order[starts[hu]].tolist(), order[starts[hv]].tolist()))
+        n_pairs = int((sizes * (sizes - 1) // 2).sum() + (sizes[hu] * sizes[hv]).sum())
+    else:
+        # every image pair is checked on its own, within each group of
+        # identical hashes and between the groups of each hash pair
+        store = EmbeddingStore(embeddings_path)
+        store_rows = store.rows_of(ids)
+        group_pairs = [(g, g) for g in np.flatnonzero(sizes > 1).tolist()]
+        group_pairs += list(zip(hu.tolist(), hv.tolist()))
+        n_pairs = 0
+        for gu, gv in group_pairs:
+            a = order[starts[gu] : starts[gu + 1]]
+            b = order[starts[gv] : starts[gv + 1]]
+            pairs = cosine_pairs(
+                store.vectors, store_rows[a], store_rows[b], clip_threshold, gu == gv
+            )
+            uf.union_edges(zip(a[pairs[:, 0]].tolist(), b[pairs[:, 1]].tolist()))
+            n_pairs += len(pairs)
+
+    clusters = [[ids[r] for r in group] for group in uf.groups()]
+    if write:
+        replace_duplicate_clusters(clusters)
+
+    return {
+        "images": len(ids),
+        "distinct_hashes": len(unique),
+        "pairs": n_pairs,
+        "clusters": len(clusters),
+        "clustered_images": sum(len(c) for c in clusters),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate clusters over all stored pHashes."
+    )
+    parser.add_argument("--max-distance", type=int, default=MAX_DISTANCE)
+    parser.add_argument("--bands", type=int, default=N_BANDS, choices=SUPPORTED_BANDS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--clip-threshold",
+        type=float,
+        default=None,
+        help="Also require this CLIP cosine similarity (e.g. 0.95)",
+    )
+    parser.add_argument("--embeddings", default=embeddings_out)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Do not write clusters to SQLite"
+    )
+    args = parser.parse_args()
+
+    stats = find_duplicate_clusters(
+        max_distance=args.max_distance,
+        n_bands=args.bands,
+        workers=args.workers,
+        clip_threshold=args.clip_threshold,
+        embeddings_path=args.embeddings,
+        write=not args.dry_run,
+    )
+    print(
+        f"✅ {stats['images']} images ({stats['distinct_hashes']} distinct hashes): "
+        f"{stats['pairs']} near-duplicate pairs, {stats['clusters']} clusters "
+        f"covering {stats['clustered_images']} images in {stats['seconds']:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Callable, Optional
+
+# Versioned index layout under a root directory:
+#   <root>/CURRENT              name of the published version (atomic switch)
+#   <root>/<version>/manifest.json
+#   <root>/<version>/<index file(s)>, <mapping file>
+# A version directory is complete before CURRENT points to it and is never
+# modified afterwards, so readers always see a matching index and mapping.
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = "index-version-v1"
+STAGING_PREFIX = ".staging-"
+
+# Seconds between checks of CURRENT by long-running readers
+POLL_INTERVAL = 2.0
+
+
+def is_version_root(path: str) -> bool:
+    """Returns True if path is a versioned index root (has a CURRENT pointer)."""
+    return os.path.isfile(os.path.join(path, CURRENT_FILE))
+
+
+def new_version_name() -> str:
+    """Version name that sorts by build time: UTC timestamp with microseconds."""
+    now = time.time()
+    return (
+        time.strftime("v%Y%m%d-%H%M%S", time.gmtime(now)) + f"-{int(now % 1 * 1e6):06d}"
+    )
+
+
+def create_staging_dir(root: str, version: str) -> str:
+    """
+    Creates the directory a new version is built in. It only becomes
+    visible under its version name once published.
+    """
+    path = os.path.join(root, STAGING_PREFIX + version)
+    os.makedirs(path)
+    return path
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_manifest(
+    version_dir: str,
+    version: str,
+    index_file: str,
+    mapping_file: str,
+    model: str = None,
+    dim: int = None,
+    count: int = None,
+    backend: str = None,
+    build_params: dict = None,
+) -> dict:
+    """
+    Writes manifest.json describing every file of a version directory,
+    with sizes and SHA-256 checksums.
+    """
+    files = {}
+    for name in sorted(os.listdir(version_dir)):
+        path = os.path.join(version_dir, name)
+        if name != MANIFEST_FILE and os.path.isfile(path):
+            files[name] = {"bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "model": model,
+        "dim": dim,
+        "count": count,
+        "backend": backend,
+        "index": index_file,
+        "mapping": mapping_file,
+        "build": build_params or {},
+        "files": files,
+    }
+    with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(version_dir: str) -> dict:
+    with open(os.path.join(version_dir, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def verify_version(version_dir: str) -> bool:
+    """Returns True if every file listed in the manifest matches its checksum."""
+    manifest = read_manifest(version_dir)
+    for name, info in manifest["files"].items():
+        path = os.path.join(version_dir, name)
+        if not os.path.isfile(path) or file_sha256(path) != info["sha256"]:
+            return False
+    return True
+
+
+def publish_version(root: str, staging_dir: str, version: str) -> str:
+    """
+    Moves a finished staging directory to <root>/<version> and atomically
+    points CURRENT at it.
+
+    Returns:
+        str: The version directory
+    """
+    version_dir = os.path.join(root, version)
+    os.replace(staging_dir, version_dir)
+
+    tmp = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+    return version_dir
+
+
+def current_version(root: str) -> Optional[str]:
+    """Returns the published version name, or None."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def resolve_version(root: str, version: str = None):
+    """
+    Returns (index path, mapping path, manifest) of a version
+    (default: the current one).
+    """
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No published index version in {root}")
+    version_dir = os.path.join(root, version)
+    manifest = read_manifest(version_dir)
+    return (
+        os.path.join(version_dir, manifest["index"]),
+        os.path.join(version_dir, manifest["mapping"]),
+        manifest,
+    )
+
+
+def prune_versions(root: str, keep: int = 3):
+    """
+    Deletes all but the newest `keep` versions; never the current one.
+    Processes still using a deleted version keep their open mappings.
+    """
+    current = current_version(root)
+    versions = sorted(
+        name
+        for name in os.listdir(root)
+        if name.startswith("v") and os.path.isdir(os.path.join(root, name))
+    )
+    for name in versions[:-keep] if keep else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _warm_files(version_dir: str, chunk_size: int = 1 << 20):
+    # Sequential read pulls memory-mapped index files into the page cache,
+    # so the first queries after a swap do not fault them in one by one
+    for name in os.listdir(version_dir):
+        path = os.path.join(version_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                while f.read(chunk_size):
+                    pass
+
+
+class VersionedIndex:
+    """
+    The published (index, mapping) pair of a version root, for
+    long-running processes.
+
+    `get()` returns the loaded version as one snapshot, so an index is
+    never paired with another version's mapping. At most every
+    `poll_interval` seconds it checks CURRENT; when a new version is
+    published, that version is loaded and its files are warmed in a
+    background thread while queries keep using the old one, and the swap
+    is a single reference assignment; the old index is then close()d.
+    Nothing restarts and no query waits for a load, except the very
+    first one.
+
+    Args:
+        root (str): Version root directory
+        load_fn: Callable (index_path, mapping_path, manifest) -> (index, mapping)
+        poll_interval (float): Seconds between checks of CURRENT
+        warm_fn: Optional callable run on a freshly loaded index before the swap
+    """
+
+    def __init__(
+        self,
+        root: str,
+        load_fn: Callable,
+        poll_interval: float = POLL_INTERVAL,
+        warm_fn: Callable = None,
+    ):
+        self.root = root
+        self.load_fn = load_fn
+        self.warm_fn = warm_fn
+        self.poll_interval = poll_interval
+        self._snapshot = None  # (version, index, mapping, manifest)
+        self._lock = threading.Lock()
+        self._loading = None  # version being preloaded
+        self._next_check = 0.0
+
+    def _load(self, version: str):
+        index_path, mapping_path, manifest = resolve_version(self.root, version)
+        index, mapping = self.load_fn(index_path, mapping_path, manifest)
+        return version, index, mapping, manifest
+
+    def _preload(self, version: str):
+        try:
+            snapshot = self._load(version)
+            _warm_files(os.path.join(self.root, version))
+            if self.warm_fn is not None:
+                self.warm_fn(snapshot[1])
+            old, self._snapshot = self._snapshot, snapshot
+            print(f"🔄 Switched to index version {version}")
+            if old is not None and hasattr(old[1], "close"):
+                old[1].close()  # e.g. the query threads of a sharded index
+        except Exception as e:  # keep serving the old version
+            print(f"⚠️ Could not load index version {version}: {e}")
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def check(self, wait: bool = False):
+        """
+        Starts loading a newly published version, if any. With wait=True
+        the load happens in the calling thread.
+        """
+        version = current_version(self.root)
+        with self._lock:
+            loaded = self._snapshot[0] if self._snapshot else None
+            if version is None or version == loaded or self._loading == version:
+                return
+            self._loading = version
+        if wait:
+            self._preload(version)
+        else:
+            threading.Thread(target=self._preload, args=(version,), daemon=True).start()
+
+    def get(self):
+        """
+        Returns (version, index, mapping, manifest) of the loaded version.
+        """
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load(current_version(self.root))
+                    self._next_check = time.monotonic() + self.poll_interval
+            return self._snapshot
+
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.poll_interval
+            self.check()
+        return self._snapshot
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._snapshot[0] if self._snapshot else None
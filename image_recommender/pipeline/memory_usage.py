@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the current resident set size of this process in bytes,
+    or 0 if it cannot be determined on this platform.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    return peak_rss_bytes()
+
+
+def current_anon_rss_bytes() -> int:
+    """
+    Returns the resident memory of this process that is not backed by a
+    file (heap, not mmapped files), in bytes; 0 if unknown. Pages of
+    memory-mapped files count towards RSS but can be dropped by the kernel
+    under pressure, so this is the part that actually risks an OOM.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            fields = f.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """
+    Returns the lifetime peak RSS of this process in bytes (0 if unknown).
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """
+    Samples RSS in a background thread and keeps the high-water mark.
+    Unlike the lifetime peak, this measures one region of code:
+
+        with RssSampler() as s:
+            work()
+        print(s.peak)
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self.anon_start = 0
+        self.anon_peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        self.peak = max(self.peak, current_rss_bytes())
+        self.anon_peak = max(self.anon_peak, current_anon_rss_bytes())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss_bytes()
+        self.anon_start = self.anon_peak = current_anon_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def growth(self) -> int:
+        """Peak RSS above the RSS at entry, in bytes."""
+        return max(0, self.peak - self.start)
+
+    @property
+    def anon_growth(self) -> int:
+        """Peak anonymous (non file-backed) RSS above the value at entry, in bytes."""
+        return max(0, self.anon_peak - self.anon_start)
@@ -1,30 +1,26 @@
 import os
-import json
 import sys
 from PIL import Image
 
 # Allow local imports
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from similarity.similarity_embedding import (
+from image_recommender.similarity.similarity_embedding import (
     compute_clip_embedding,
-    load_annoy_index,
+    load_index,
     EMBEDDING_DIM,
 )
-from data.database import get_image_by_id
-from data.loader import load_image, preprocess_image
+from image_recommender.data.database import get_image_by_id
+from image_recommender.data.id_mapping import load_id_mapping
+from image_recommender.data.loader import load_preprocessed_image
 
 
 def load_index_and_mapping(index_path: str, mapping_path: str):
     """
-    Loads the Annoy index and mapping file.
-    Returns (annoy_index, dict[int → image_id])
+    Loads the vector index (Annoy or exact) and mapping file.
+    Returns (VectorIndex, index → image_id mapping)
     """
-    index = load_annoy_index(index_path)
-    with open(mapping_path, "r") as f:
-        raw_map = json.load(f)
-    mapping = {int(k): v for k, v in raw_map.items()}
-    return index, mapping
+    return load_index(index_path), load_id_mapping(mapping_path)
 
 
 def find_top_k_similar(image_path: str, index_path: str, mapping_path: str, k: int = 5):
@@ -32,19 +28,16 @@ def find_top_k_similar(image_path: str, index_path: str, mapping_path: str, k: i
     Computes CLIP embedding for input image and finds k most similar images.
     Prints image IDs and paths.
     """
-    image = load_image(image_path)
+    image = load_preprocessed_image(image_path)
     if image is None:
         print("❌ Could not load input image.")
         return
 
-    image = preprocess_image(image)
     embedding = compute_clip_embedding(image)
 
     index, id_map = load_index_and_mapping(index_path, mapping_path)
 
-    nearest_idxs, distances = index.get_nns_by_vector(
-        embedding.tolist(), k, include_distances=True
-    )
+    nearest_idxs, distances = index.search(embedding.numpy(), k)
 
     print(f"\n🔍 Top-{k} similar images to {image_path}:\n")
     for rank, (i, dist) in enumerate(zip(nearest_idxs, distances), 1):
@@ -0,0 +1,94 @@
+import os
+import glob
+import threading
+from typing import Callable, Hashable, Iterable
+
+
+def file_signature(path: str):
+    """
+    (path, mtime_ns, size) of a file, or of every file `<path>.*` when the
+    path is a prefix (e.g. an embedding store); None if nothing exists.
+    """
+    paths = (
+        [path] if os.path.isfile(path) else sorted(glob.glob(glob.escape(path) + ".*"))
+    )
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        sig.append((p, st.st_mtime_ns, st.st_size))
+    return tuple(sig) or None
+
+
+class ResourceCache:
+    """
+    Thread-safe, process-wide cache of loaded resources (indices, mappings)
+    that are expensive to open but cheap to keep.
+
+    An entry is stored with the signature (mtime, size) of the files it
+    was loaded from. Every `get` re-checks those files with one stat each,
+    so a rebuilt index is reloaded on the next call, while an unchanged one
+    is returned as is. Loads of different keys run concurrently; concurrent
+    requests for the same key wait for a single load.
+
+        index, mapping = cache.get(key, [index_path, mapping_path], load)
+    """
+
+    def __init__(self):
+        self._entries = {}  # key -> (signature, value)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, paths: Iterable[str], load_fn: Callable):
+        """
+        Returns the cached value of key, calling load_fn() if it is missing
+        or any of `paths` changed since it was loaded.
+        """
+        paths = list(paths)
+        signature = tuple(file_signature(p) for p in paths)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+
+        with self._key_lock(key):
+            # another thread may have loaded it while we waited
+            signature = tuple(file_signature(p) for p in paths)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+
+            value = load_fn()
+            with self._lock:
+                self._entries[key] = (signature, value)
+                self.misses += 1
+            return value
+
+    def invalidate(self, key: Hashable = None):
+        """Drops one entry, or all entries when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by all searches of this process (GUI SearchThread, scripts, CLI)
+resource_cache = ResourceCache()
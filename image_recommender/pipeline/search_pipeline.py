@@ -1,5 +1,5 @@
-import json
 import os
+import threading
 from collections import defaultdict
 
 from PIL import Image
@@ -8,14 +8,38 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import multiprocessing
 from heapq import heappush, heappushpop, nlargest
 
-from image_recommender.data.loader import load_image, preprocess_image
-from image_recommender.similarity.similarity_embedding import (
-    compute_clip_embedding,
-    load_annoy_index,
+from image_recommender.data.loader import load_preprocessed_image
+from image_recommender.similarity.similarity_embedding import load_index
+from image_recommender.similarity.embedding_cache import (
+    cached_clip_embedding,
+    cached_clip_embeddings_batch,
 )
-from image_recommender.similarity.hist_similarity import image_color_similarity
-from image_recommender.similarity.similarity_phash import phash_similarity
-from image_recommender.data.database import get_image_by_id
+from image_recommender.similarity.features import (
+    bundle_similarities,
+    compute_features,
+    compute_features_batch,
+)
+from image_recommender.similarity.hist_similarity import histogram_distances
+from image_recommender.similarity.phash_index import PHashIndex
+from image_recommender.similarity.similarity_phash import (
+    compute_phash_int,
+    hamming_distances,
+)
+from image_recommender.data import database
+from image_recommender.data.database import (
+    get_all_phashes,
+    get_image_by_id,
+    get_images_by_ids,
+    get_phashes_by_ids,
+)
+from image_recommender.data.id_mapping import load_id_mapping
+from image_recommender.data.histogram_store import (
+    HISTOGRAM_BINS,
+    histograms_out,
+    load_histogram_store,
+)
+from image_recommender.pipeline.index_versions import VersionedIndex, is_version_root
+from image_recommender.pipeline.resource_cache import resource_cache
 
 # Weights for combining scores (adjust as needed)
 WEIGHTS = {"clip": 0.5, "color": 0.3, "phash": 0.2}
@@ -24,11 +48,150 @@ WEIGHTS = {"clip": 0.5, "color": 0.3, "phash": 0.2}
 _EARLY_TERMINATION = True
 _CHUNK_MULTIPLIER = 4  # submit work in chunks so we can prune between chunks
 
+# Annoy nodes inspected per query (-1 = Annoy default of n_trees * k);
+# pick it with tools/tune_annoy.py
+SEARCH_K = int(os.environ.get("CLIP_SEARCH_K", "-1"))
+
+# Color histograms computed at ingest (data/histogram_store.py)
+HISTOGRAM_PATH = histograms_out
+
+# Default pHash Hamming radius of the near-duplicate search (of 64 bits)
+DUPLICATE_DISTANCE = 8
+
 
 def load_mapping(mapping_path):
-    with open(mapping_path, "r") as f:
-        raw = json.load(f)
-    return {int(k): v for k, v in raw.items()}
+    # .idmap files are memory-mapped; index_to_id.json is still accepted
+    return load_id_mapping(mapping_path)
+
+
+# One hot-swapping handle per version root, shared by all searches
+_versioned_indexes = {}
+_versioned_lock = threading.Lock()
+
+
+def _load_index_and_mapping(index_path: str, mapping_path: str, manifest=None):
+    dim = manifest.get("dim") if manifest else None
+    return load_index(index_path, dim=dim), load_mapping(mapping_path)
+
+
+def _load_clip_index(index_path: str, mapping_path: str):
+    """
+    Returns (index, index_to_id). index_path may be a versioned index root
+    (see pipeline/index_versions.py); the published version is then used,
+    mapping_path is ignored, and newly published versions are picked up in
+    the background. Plain index files are kept loaded in the process-wide
+    resource cache and reloaded when they change on disk.
+
+    The index is shared by all searches of the process, so per-search
+    settings (search_k) are passed to its search calls, never set on it.
+    """
+    if is_version_root(index_path):
+        root = os.path.abspath(index_path)
+        with _versioned_lock:
+            handle = _versioned_indexes.get(root)
+            if handle is None:
+                handle = VersionedIndex(root, _load_index_and_mapping)
+                _versioned_indexes[root] = handle
+        _, index, index_to_id, _ = handle.get()
+    else:
+        index, index_to_id = resource_cache.get(
+            ("clip_index", os.path.abspath(index_path), os.path.abspath(mapping_path)),
+            [index_path, mapping_path],
+            lambda: _load_index_and_mapping(index_path, mapping_path),
+        )
+    return index, index_to_id
+
+
+def _search_k(search_k: int = None) -> int:
+    # Annoy search effort of one search: the caller's, else SEARCH_K
+    return SEARCH_K if search_k is None else search_k
+
+
+def _stored_phash_sims(query_hashes, candidate_hashes: dict) -> dict:
+    """
+    Average pHash similarity 1 / (1 + Hamming distance) of each candidate
+    against all query hashes, from hashes stored at ingest, in one
+    vectorized pass.
+
+    Args:
+        query_hashes (list): pHashes of the query images (signed 64-bit ints)
+        candidate_hashes (dict): {key: stored pHash} of the candidates
+
+    Returns:
+        dict: {key: similarity}
+    """
+    if not query_hashes or not candidate_hashes:
+        return {}
+    keys = list(candidate_hashes)
+    dist = hamming_distances(query_hashes, [candidate_hashes[k] for k in keys])
+    return dict(zip(keys, (1.0 / (1.0 + dist)).mean(axis=0).tolist()))
+
+
+def _histogram_store():
+    return resource_cache.get(
+        ("histograms", os.path.abspath(HISTOGRAM_PATH)),
+        [HISTOGRAM_PATH],
+        lambda: load_histogram_store(HISTOGRAM_PATH),
+    )
+
+
+def _stored_histograms(image_ids) -> dict:
+    """{image_id: histogram} of the images in the ingest-time histogram matrix."""
+    store = _histogram_store()
+    if store is None or store.bins != HISTOGRAM_BINS:
+        return {}
+    return store.lookup(image_ids)
+
+
+def _stored_color_sims(query_hists, candidate_hists: dict) -> dict:
+    """
+    Average color similarity 1 / (1 + L2 distance) of each candidate
+    against all query histograms, in one vectorized pass.
+
+    Args:
+        query_hists (list): compute_histogram() of the query images
+        candidate_hists (dict): {key: stored histogram} of the candidates
+
+    Returns:
+        dict: {key: similarity}
+    """
+    if not query_hists or not candidate_hists:
+        return {}
+    keys = list(candidate_hists)
+    dist = histogram_distances(
+        np.stack(query_hists), np.stack([candidate_hists[k] for k in keys])
+    )
+    return dict(zip(keys, (1.0 / (1.0 + dist)).mean(axis=0).tolist()))
+
+
+def _combined_score(
+    clip_dist: float,
+    candidate_features,
+    query_features,
+    phash_sim: float = None,
+    color_sim: float = None,
+) -> float:
+    """
+    Weighted CLIP + color + pHash score of one candidate against the query images.
+    phash_sim and color_sim are the precomputed average similarities from
+    stored features; missing ones are compared from the feature bundles
+    (candidate_features may be None when both are given).
+    """
+    # CLIP similarity
+    clip_sim = 1.0 - (clip_dist / 2.0)  # angular [0,2] → similarity [1,0]
+
+    # Average color and pHash similarity across all query images
+    if phash_sim is None or color_sim is None:
+        colors, phashes, _ = bundle_similarities(query_features, [candidate_features])
+    avg_color_sim = color_sim if color_sim is not None else float(colors[0])
+    avg_phash_sim = phash_sim if phash_sim is not None else float(phashes[0])
+
+    # Combined score
+    return (
+        WEIGHTS["clip"] * clip_sim
+        + WEIGHTS["color"] * avg_color_sim
+        + WEIGHTS["phash"] * avg_phash_sim
+    )
 
 
 def combined_similarity_search(
@@ -37,11 +200,16 @@ def combined_similarity_search(
     clip_mapping_path: str,
     k_clip: int = 20,
     top_k_result: int = 5,
+    search_k: int = None,
 ):
     """
     Combines CLIP, histogram, and pHash similarities to find the best matches.
     Supports one or multiple input images.
 
+    search_k overrides the Annoy search effort (default: SEARCH_K).
+    clip_index_path may also be a versioned index root, which is followed
+    across newly published versions.
+
     Returns: List of (path, combined_score)
     """
     # Handle single or multiple input images
@@ -52,12 +220,12 @@ def combined_similarity_search(
     embeddings = []
 
     for path in input_path:
-        img = load_image(path)
+        img = load_preprocessed_image(path)
         if img is None:
             continue
-        img = preprocess_image(img)
         input_images.append(img)
-        embeddings.append(compute_clip_embedding(img))
+        # Served from the query cache when this file was embedded before
+        embeddings.append(cached_clip_embedding(path, img))
 
     if not embeddings:
         print("❌ Could not load any input image.")
@@ -67,63 +235,59 @@ def combined_similarity_search(
     input_embedding = sum(embeddings) / len(embeddings)
 
     # Load CLIP index and mapping
-    clip_index = load_annoy_index(clip_index_path)
-    index_to_id = load_mapping(clip_mapping_path)
+    clip_index, index_to_id = _load_clip_index(clip_index_path, clip_mapping_path)
 
-    # Get top-k CLIP neighbors with distances
-    clip_results, distances = clip_index.get_nns_by_vector(
-        input_embedding.tolist(), k_clip, include_distances=True
+    # Get top-k CLIP neighbors with (angular) distances
+    clip_results, distances = clip_index.search(
+        input_embedding.numpy(), k_clip, search_k=_search_k(search_k)
     )
 
+    # Query features are computed once, however many candidates there are
+    query_features = compute_features_batch(input_images, embeddings, HISTOGRAM_BINS)
+
+    # pHash and color similarity from features stored at ingest; candidates
+    # that have both are never decoded
+    candidate_ids = [index_to_id[idx] for idx in clip_results]
+    query_hashes = [f.phash for f in query_features]
+    phash_sims = _stored_phash_sims(query_hashes, get_phashes_by_ids(candidate_ids))
+    query_hists = [f.histogram for f in query_features]
+    color_sims = _stored_color_sims(query_hists, _stored_histograms(candidate_ids))
+
     # Prefetch candidate paths on main thread (avoid DB access in worker threads)
     candidates = []
-    for idx, clip_dist in zip(clip_results, distances):
-        candidate_id = index_to_id[idx]
+    for candidate_id, clip_dist in zip(candidate_ids, distances):
         db_entry = get_image_by_id(candidate_id)
         if not db_entry:
             continue
         path, width, height = db_entry
-        # Map Annoy angular distance to similarity (kept your existing mapping)
+        # Map angular distance to similarity (kept your existing mapping)
         clip_sim = 1.0 - (clip_dist / 2.0)
-        candidates.append((path, clip_dist, clip_sim))
+        candidates.append(
+            (
+                path,
+                clip_dist,
+                clip_sim,
+                phash_sims.get(candidate_id),
+                color_sims.get(candidate_id),
+            )
+        )
 
     # Sort by CLIP similarity desc so our upper bound shrinks monotonically
     candidates.sort(key=lambda x: x[2], reverse=True)
 
     # Parallel re-ranking (color + pHash) per candidate
-    def _score_candidate(path: str, clip_dist: float):
-        candidate_img = load_image(path)
-        if candidate_img is None:
-            return None
-        candidate_img = preprocess_image(candidate_img)
-
-        # CLIP similarity
-        clip_sim_local = 1.0 - (clip_dist / 2.0)  # angular [0,2] → similarity [1,0]
-
-        # Average color and pHash similarity across all query images
-        color_sims = []
-        phash_sims = []
-
-        for input_img in input_images:
-            color_dist = image_color_similarity(input_img, candidate_img)
-            color_sim = 1.0 / (1.0 + color_dist)
-
-            phash_dist = phash_similarity(input_img, candidate_img)
-            phash_sim = 1.0 / (1.0 + phash_dist)
-
-            color_sims.append(color_sim)
-            phash_sims.append(phash_sim)
-
-        avg_color_sim = sum(color_sims) / len(color_sims)
-        avg_phash_sim = sum(phash_sims) / len(phash_sims)
-
-        # Combined score
-        combined = (
-            WEIGHTS["clip"] * clip_sim_local
-            + WEIGHTS["color"] * avg_color_sim
-            + WEIGHTS["phash"] * avg_phash_sim
+    def _score_candidate(path: str, clip_dist: float, phash_sim, color_sim):
+        candidate_features = None
+        if phash_sim is None or color_sim is None:
+            candidate_features = _load_candidate_features(path)
+            if candidate_features is None:
+                return None
+        return (
+            path,
+            _combined_score(
+                clip_dist, candidate_features, query_features, phash_sim, color_sim
+            ),
         )
-        return (path, combined)
 
     scores_heap = []  # min-heap of (combined, path)
     if candidates:
@@ -136,8 +300,8 @@ def combined_similarity_search(
 
             with ThreadPoolExecutor(max_workers=max_workers) as ex:
                 futs = [
-                    ex.submit(_score_candidate, path, dist)
-                    for (path, dist, _sim) in chunk
+                    ex.submit(_score_candidate, path, dist, phash_sim, color_sim)
+                    for (path, dist, _sim, phash_sim, color_sim) in chunk
                 ]
                 for fut in as_completed(futs):
                     res = fut.result()
@@ -172,3 +336,170 @@ def combined_similarity_search(
     # Convert heap to sorted list desc
     top = nlargest(top_k_result, scores_heap)
     return [(path, combined) for (combined, path) in top]
+
+
+def _load_query_image(path):
+    return load_preprocessed_image(path)
+
+
+def _load_candidate_features(path):
+    # decoded only for candidates missing a stored pHash or histogram
+    img = _load_query_image(path)
+    return None if img is None else compute_features(img, bins=HISTOGRAM_BINS)
+
+
+def batch_similarity_search(
+    query_sets,  # list of (str or list of str)
+    clip_index_path: str,
+    clip_mapping_path: str,
+    k_clip: int = 20,
+    top_k_result: int = 5,
+    search_k: int = None,
+):
+    """
+    Runs combined_similarity_search for many independent query sets at once.
+
+    All distinct query images are embedded in one CLIP batch (cached ones
+    are skipped), the index and mapping are loaded once, and candidates
+    shared between query sets are looked up in the DB and decoded only once
+    (and only if their pHash or color histogram was not stored at ingest).
+
+    Returns: List with one result list of (path, combined_score) per query set
+    """
+    query_sets = [[q] if isinstance(q, str) else list(q) for q in query_sets]
+    if not query_sets:
+        return []
+    workers = multiprocessing.cpu_count() or 1
+
+    # Load every distinct query image once
+    unique_paths = list(dict.fromkeys(p for qs in query_sets for p in qs))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        loaded = dict(zip(unique_paths, ex.map(_load_query_image, unique_paths)))
+    ok_paths = [p for p in unique_paths if loaded[p] is not None]
+
+    # One CLIP forward pass for all query images
+    embs = cached_clip_embeddings_batch(ok_paths, [loaded[p] for p in ok_paths])
+    emb_by_path = dict(zip(ok_paths, embs))
+
+    clip_index, index_to_id = _load_clip_index(clip_index_path, clip_mapping_path)
+
+    # One index lookup for all query sets that have an embedding
+    query_embs = {}
+    for i, qs in enumerate(query_sets):
+        set_embs = [emb_by_path[p] for p in qs if p in emb_by_path]
+        if set_embs:
+            query_embs[i] = (sum(set_embs) / len(set_embs)).numpy()
+
+    neighbors = [None] * len(query_sets)  # per set: list of (idx, dist) or None
+    if query_embs:
+        all_idxs, all_dists = clip_index.batch_search(
+            np.stack(list(query_embs.values())), k_clip, search_k=_search_k(search_k)
+        )
+        for i, idxs, dists in zip(query_embs, all_idxs, all_dists):
+            neighbors[i] = list(zip(idxs, dists))
+
+    # Shared DB lookups and candidate decoding
+    candidate_ids = {index_to_id[idx] for nn in neighbors if nn for idx, _ in nn}
+    db_rows = get_images_by_ids(candidate_ids)
+    stored_hashes = get_phashes_by_ids(candidate_ids)
+    stored_hists = _stored_histograms(candidate_ids)
+    query_features = dict(
+        zip(
+            ok_paths,
+            compute_features_batch([loaded[p] for p in ok_paths], embs, HISTOGRAM_BINS),
+        )
+    )
+    # only candidates missing a stored feature are decoded
+    candidate_paths = list(
+        dict.fromkeys(
+            row[0]
+            for image_id, row in db_rows.items()
+            if image_id not in stored_hashes or image_id not in stored_hists
+        )
+    )
+    # their features are computed once, however many query sets share them
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        decoded = dict(
+            zip(candidate_paths, ex.map(_load_candidate_features, candidate_paths))
+        )
+
+    def _rank(qs, nn):
+        set_features = [query_features[p] for p in qs if p in query_features]
+        ids = [index_to_id[idx] for idx, _ in nn]
+        phash_sims = _stored_phash_sims(
+            [f.phash for f in set_features],
+            {i: stored_hashes[i] for i in ids if i in stored_hashes},
+        )
+        color_sims = _stored_color_sims(
+            [f.histogram for f in set_features],
+            {i: stored_hists[i] for i in ids if i in stored_hists},
+        )
+        scored = []
+        for image_id, (_, clip_dist) in zip(ids, nn):
+            db_entry = db_rows.get(image_id)
+            if not db_entry:
+                continue
+            phash_sim, color_sim = phash_sims.get(image_id), color_sims.get(image_id)
+            candidate_features = decoded.get(db_entry[0])
+            if candidate_features is None and (phash_sim is None or color_sim is None):
+                continue
+            score = _combined_score(
+                clip_dist, candidate_features, set_features, phash_sim, color_sim
+            )
+            scored.append((score, db_entry[0]))
+        return [(path, score) for score, path in nlargest(top_k_result, scored)]
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = [
+            ex.submit(_rank, qs, nn) if nn else None
+            for qs, nn in zip(query_sets, neighbors)
+        ]
+        return [fut.result() if fut else [] for fut in futs]
+
+
+def _build_phash_index() -> PHashIndex:
+    ids, hashes = get_all_phashes()
+    return PHashIndex(hashes, ids)
+
+
+def _phash_index() -> PHashIndex:
+    # rebuilt from the DB when it changes (new images or backfilled hashes)
+    return resource_cache.get(
+        ("phash_index", os.path.abspath(database.DB_PATH)),
+        [database.DB_PATH],
+        _build_phash_index,
+    )
+
+
+def near_duplicate_search(
+    input_path,  # str or list of str
+    max_distance: int = DUPLICATE_DISTANCE,
+    top_k_result: int = None,
+):
+    """
+    Finds near-duplicates of the input image(s) by pHash alone: every
+    stored image whose hash is within max_distance bits of an input's
+    hash, via the multi-index pHash index. No CLIP model or vector index
+    is needed.
+
+    Returns: List of (path, hamming_distance), closest first
+    """
+    if isinstance(input_path, str):
+        input_path = [input_path]
+
+    index = _phash_index()
+    best = {}  # image_id -> smallest distance to any input
+    for path in input_path:
+        img = _load_query_image(path)
+        if img is None:
+            continue
+        for image_id, dist in index.search(compute_phash_int(img), max_distance):
+            if dist < best.get(image_id, max_distance + 1):
+                best[image_id] = dist
+
+    rows = get_images_by_ids(best)
+    results = sorted(
+        ((rows[i][0], d) for i, d in best.items() if i in rows),
+        key=lambda r: (r[1], r[0]),
+    )
+    return results[:top_k_result] if top_k_result else results
@@ -0,0 +1,194 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+from PIL import Image
+
+from image_recommender.similarity.similarity_embedding import (
+    compute_clip_embedding,
+    compute_clip_embeddings_batch,
+    get_encoder_id,
+)
+
+# Defaults for the process-wide cache; both can be set via environment
+DEFAULT_MAX_ENTRIES = int(os.getenv("CLIP_QUERY_CACHE_SIZE", "256"))
+DEFAULT_DISK_DIR = os.getenv("CLIP_QUERY_CACHE_DIR") or None
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA256 hex digest of a file's content.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Content-addressed cache for query embeddings.
+
+    Keys combine the SHA256 of the image file and the encoder identifier,
+    so renamed copies hit and a different model never does. Entries live in
+    an in-process LRU bounded by `max_entries`, optionally backed by one
+    .npy file per key under `disk_dir`.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, disk_dir: str = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(path: str, encoder_id: str) -> str:
+        content = file_digest(path)
+        return hashlib.sha256(f"{encoder_id}\0{content}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + ".npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Looks a key up in memory, then on disk. Returns None on a miss."""
+        with self._lock:
+            emb = self._entries.get(key)
+            if emb is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return emb
+
+        if self.disk_dir:
+            try:
+                emb = np.load(self._disk_path(key))
+            except (OSError, ValueError):
+                emb = None
+            if emb is not None:
+                self._remember(key, emb)
+                with self._lock:
+                    self.disk_hits += 1
+                return emb
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, embedding):
+        """Stores an embedding in memory and, if configured, on disk."""
+        emb = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, emb)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, emb)
+            os.replace(tmp, path)
+
+    def _remember(self, key: str, emb: np.ndarray):
+        with self._lock:
+            self._entries[key] = emb
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self, path: str, compute: Callable[[], object], encoder_id: str
+    ) -> torch.Tensor:
+        """
+        Returns the cached embedding for the file at `path`, or calls
+        `compute()` (which returns a tensor or array) and caches the result.
+        """
+        key = self.make_key(path, encoder_id)
+        emb = self.get(key)
+        if emb is None:
+            result = compute()
+            if isinstance(result, torch.Tensor):
+                result = result.detach().cpu().numpy()
+            emb = np.asarray(result, dtype=np.float32)
+            self.put(key, emb)
+        return torch.from_numpy(emb.copy())
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current number of entries."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """Drops all in-memory entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+# Process-wide cache used by the search pipeline
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=DEFAULT_MAX_ENTRIES, disk_dir=DEFAULT_DISK_DIR
+)
+
+
+def cached_clip_embedding(
+    path: str, image: Image.Image, cache: QueryEmbeddingCache = None
+) -> torch.Tensor:
+    """
+    CLIP embedding of the image loaded from `path`, served from the query
+    cache when the same file content was embedded before by the same encoder.
+
+    Args:
+        path (str): File the image was loaded from (used for the content hash)
+        image (PIL.Image): The loaded, preprocessed image
+        cache (QueryEmbeddingCache): Defaults to the process-wide cache
+
+    Returns:
+        torch.Tensor: Embedding vector
+    """
+    if cache is None:
+        cache = query_embedding_cache
+    return cache.get_or_compute(
+        path, lambda: compute_clip_embedding(image), get_encoder_id()
+    )
+
+
+def cached_clip_embeddings_batch(
+    paths, images, cache: QueryEmbeddingCache = None
+) -> list:
+    """
+    Batched variant of cached_clip_embedding: all cache misses are embedded
+    together in a single compute_clip_embeddings_batch call.
+
+    Args:
+        paths (list of str): Files the images were loaded from
+        images (list of PIL.Image): The loaded, preprocessed images
+        cache (QueryEmbeddingCache): Defaults to the process-wide cache
+
+    Returns:
+        list of torch.Tensor: One embedding per input, in order
+    """
+    if cache is None:
+        cache = query_embedding_cache
+    encoder_id = get_encoder_id()
+
+    keys = [cache.make_key(p, encoder_id) for p in paths]
+    found = [cache.get(k) for k in keys]
+    missing = [i for i, emb in enumerate(found) if emb is None]
+    if missing:
+        embs = compute_clip_embeddings_batch([images[i] for i in missing]).numpy()
+        for i, emb in zip(missing, embs):
+            cache.put(keys[i], emb)
+            found[i] = emb
+    return [torch.from_numpy(np.array(emb, dtype=np.float32)) for emb in found]
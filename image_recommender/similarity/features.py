@@ -0,0 +1,139 @@
+import numpy as np
+from PIL import Image
+
+from image_recommender.data.histogram_store import HISTOGRAM_BINS
+from image_recommender.similarity.hist_similarity import (
+    compute_histogram,
+    compute_histograms_batch,
+    histogram_distances,
+)
+from image_recommender.similarity.similarity_phash import (
+    compute_phash_int,
+    hamming_distances,
+)
+
+
+class FeatureBundle:
+    """
+    Color histogram, packed pHash and (optionally) CLIP embedding of one
+    image, computed once so the image can be compared with any number of
+    others without touching its pixels again.
+
+    Args:
+        histogram: (3 * bins,) compute_histogram() vector
+        phash (int): pHash as a signed 64-bit int (see phash_to_int)
+        embedding: Optional CLIP embedding (tensor or array)
+    """
+
+    __slots__ = ("histogram", "phash", "embedding")
+
+    def __init__(self, histogram, phash: int, embedding=None):
+        self.histogram = np.asarray(histogram, dtype=np.float32)
+        self.phash = int(phash)
+        self.embedding = (
+            None
+            if embedding is None
+            else np.asarray(embedding, dtype=np.float32).reshape(-1)
+        )
+
+    def compare(self, other: "FeatureBundle") -> dict:
+        """
+        Similarities to another bundle: "color" and "phash" as
+        1 / (1 + distance), "clip" as 1 - angular distance / 2 (None unless
+        both bundles have an embedding).
+        """
+        color, phash, clip = bundle_similarities([self], [other])
+        return {
+            "color": float(color[0]),
+            "phash": float(phash[0]),
+            "clip": None if clip is None else float(clip[0]),
+        }
+
+
+def compute_features(
+    image: Image.Image, embedding=None, bins: int = HISTOGRAM_BINS, with_clip=False
+) -> FeatureBundle:
+    """
+    Computes the feature bundle of one (preprocessed) image.
+
+    Args:
+        image (PIL.Image): RGB input image
+        embedding: Already computed CLIP embedding, if any
+        bins (int): Histogram bins per channel
+        with_clip (bool): Compute the CLIP embedding when none is given
+
+    Returns:
+        FeatureBundle
+    """
+    if embedding is None and with_clip:
+        # imported lazily: histogram/pHash-only callers never load torch
+        from image_recommender.similarity.similarity_embedding import (
+            compute_clip_embedding,
+        )
+
+        embedding = compute_clip_embedding(image)
+    return FeatureBundle(
+        compute_histogram(image, bins), compute_phash_int(image), embedding
+    )
+
+
+def compute_features_batch(images, embeddings=None, bins: int = HISTOGRAM_BINS) -> list:
+    """
+    Feature bundles of many images, with all histograms computed in one
+    compute_histograms_batch pass.
+
+    Args:
+        images (list of PIL.Image): RGB input images
+        embeddings (list): Optional CLIP embedding per image
+        bins (int): Histogram bins per channel
+
+    Returns:
+        list of FeatureBundle, in order
+    """
+    images = list(images)
+    if embeddings is None:
+        embeddings = [None] * len(images)
+    hists = compute_histograms_batch(images, bins)
+    return [
+        FeatureBundle(hist, compute_phash_int(img), emb)
+        for img, hist, emb in zip(images, hists, embeddings)
+    ]
+
+
+def bundle_similarities(queries, candidates):
+    """
+    Average similarity of each candidate bundle to all query bundles, for
+    every feature in one vectorized pass.
+
+    Args:
+        queries (list of FeatureBundle): Query images
+        candidates (list of FeatureBundle): Images to score
+
+    Returns:
+        tuple: (color, phash, clip) arrays of shape (n,); clip is None
+        unless every bundle has an embedding
+    """
+    if not queries or not candidates:
+        empty = np.zeros(len(candidates), dtype=np.float64)
+        return empty, empty.copy(), None
+
+    color_dist = histogram_distances(
+        np.stack([q.histogram for q in queries]),
+        np.stack([c.histogram for c in candidates]),
+    )
+    phash_dist = hamming_distances(
+        [q.phash for q in queries], [c.phash for c in candidates]
+    )
+    color = (1.0 / (1.0 + color_dist)).mean(axis=0)
+    phash = (1.0 / (1.0 + phash_dist)).mean(axis=0)
+
+    clip = None
+    if all(b.embedding is not None for b in (*queries, *candidates)):
+        q = np.stack([b.embedding for b in queries])
+        c = np.stack([b.embedding for b in candidates])
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        c /= np.maximum(np.linalg.norm(c, axis=1, keepdims=True), 1e-12)
+        # angular distance as in the Annoy index: sqrt(2 - 2 cos)
+        angular = np.sqrt(np.clip(2.0 - 2.0 * (q @ c.T), 0.0, 4.0))
+        clip = (1.0 - angular / 2.0).mean(axis=0)
+    return color, phash, clip
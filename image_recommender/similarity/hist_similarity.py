@@ -28,6 +28,81 @@ def compute_histogram(image: Image.Image, bins=8) -> np.ndarray:
     return np.array(histogram, dtype=np.float32)
 
 
+# Up to this many bins per channel, pixels are counted by their joint
+# (R, G, B) bin in one bincount of bins³ values per image; above it, each
+# channel value is counted separately
+MAX_JOINT_BINS = 16
+
+
+def _bin_lut(bins: int):
+    # Bin of every uint8 value and the bin widths, exactly as np.histogram
+    # with range=(0, 256) assigns them
+    edges = np.linspace(0, 256, bins + 1)
+    lut = np.searchsorted(edges, np.arange(256), side="right") - 1
+    return np.minimum(lut, bins - 1).astype(np.int32), np.diff(edges)
+
+
+def _count_chunk(chunk, lut, bins: int) -> np.ndarray:
+    # (k, 3, bins) pixel counts of k images of equal size
+    k = len(chunk)
+    binned = lut[chunk].reshape(k, -1, 3)
+    if bins <= MAX_JOINT_BINS:
+        code = (binned[..., 0] * bins + binned[..., 1]) * bins + binned[..., 2]
+        code += (np.arange(k, dtype=np.int32) * bins**3)[:, None]
+        joint = np.bincount(code.ravel(), minlength=k * bins**3)
+        joint = joint.reshape(k, bins, bins, bins)
+        return np.stack(
+            [joint.sum(axis=(2, 3)), joint.sum(axis=(1, 3)), joint.sum(axis=(1, 2))],
+            axis=1,
+        )
+    offsets = (np.arange(k, dtype=np.int32)[:, None] * 3 + np.arange(3)) * bins
+    idx = binned + offsets[:, None, :]
+    return np.bincount(idx.ravel(), minlength=k * 3 * bins).reshape(k, 3, bins)
+
+
+def compute_histograms_batch(images, bins=8, chunk_images: int = 64) -> np.ndarray:
+    """
+    Computes compute_histogram() for many images in one vectorized pass:
+    pixel values are quantized through a 256-entry bin table, offset by
+    image, and counted with np.bincount, instead of three np.histogram
+    calls per image.
+
+    Args:
+        images: (N, H, W, 3) uint8 array, or a sequence of RGB PIL images /
+            (H, W, 3) uint8 arrays (sizes may differ)
+        bins (int): Number of bins per channel
+        chunk_images (int): Images counted per np.bincount call (bounds memory)
+
+    Returns:
+        np.ndarray: (N, 3 * bins) float32, row i equal to compute_histogram(images[i])
+    """
+    lut, widths = _bin_lut(bins)
+    if isinstance(images, np.ndarray) and images.ndim == 4:
+        groups = [(np.arange(len(images)), images)]
+    else:
+        # images of equal size are counted together
+        arrays = [np.asarray(img) for img in images]
+        by_shape = {}
+        for i, a in enumerate(arrays):
+            by_shape.setdefault(a.shape, []).append(i)
+        groups = [
+            (np.array(rows), np.stack([arrays[i] for i in rows]))
+            for rows in by_shape.values()
+        ]
+
+    n = sum(len(rows) for rows, _ in groups)
+    out = np.empty((n, 3 * bins), dtype=np.float32)
+    for rows, stack in groups:
+        pixels = stack.shape[1] * stack.shape[2]
+        for start in range(0, len(stack), chunk_images):
+            chunk = stack[start : start + chunk_images]
+            counts = _count_chunk(chunk, lut, bins)
+            # density=True: count / bin width / pixels, in np.histogram's order
+            density = counts / widths / pixels
+            out[rows[start : start + len(chunk)]] = density.reshape(len(chunk), -1)
+    return out
+
+
 def image_color_similarity(img1: Image.Image, img2: Image.Image, bins=8) -> float:
     """
     Compares two images based on their color histograms using L2 distance.
@@ -45,3 +120,20 @@ def image_color_similarity(img1: Image.Image, img2: Image.Image, bins=8) -> floa
     # Euclidean (L2) distance
     distance = np.linalg.norm(hist1 - hist2)
     return distance
+
+
+def histogram_distances(query_hists, hists) -> np.ndarray:
+    """
+    L2 distances between query histograms and many (e.g. precomputed
+    corpus) histograms in one vectorized pass.
+
+    Args:
+        query_hists: (3 * bins,) histogram or (q, 3 * bins) array
+        hists: (n, 3 * bins) array of histograms
+
+    Returns:
+        np.ndarray: (q, n) distances, same values as image_color_similarity
+    """
+    q = np.atleast_2d(np.asarray(query_hists, dtype=np.float32))
+    h = np.asarray(hists, dtype=np.float32).reshape(-1, q.shape[1])
+    return np.sqrt(((q[:, None, :] - h[None, :, :]) ** 2).sum(axis=2))
@@ -0,0 +1,318 @@
+import os
+import json
+
+import numpy as np
+
+from image_recommender.similarity.vector_index import (
+    VectorIndex,
+    _angular_from_cosine,
+    _normalize_rows,
+)
+
+# Defaults for a 512-dim CLIP corpus of ~500k images:
+# 1024 lists of ~500 vectors, 64 sub-quantizers of 8 dims → 64 bytes per image
+DEFAULT_NLIST = 1024
+DEFAULT_M = 64
+DEFAULT_NPROBE = 16
+
+# Shortlist of rerank * k ADC candidates is re-scored with the full vectors
+DEFAULT_RERANK = 4
+
+KMEANS_ITERATIONS = 20
+MAX_TRAINING_VECTORS = 100_000
+
+# Centroids per sub-quantizer (one uint8 code each)
+_KSUB = 256
+
+
+def _squared_distances(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # ||x - c||² without the ||x||² term, which does not change the argmin
+    return (centroids**2).sum(axis=1)[None, :] - 2.0 * (x @ centroids.T)
+
+
+def _nearest_centroid(x, centroids, block_rows: int = 16384) -> np.ndarray:
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), block_rows):
+        block = np.asarray(x[start : start + block_rows], dtype=np.float32)
+        out[start : start + len(block)] = _squared_distances(block, centroids).argmin(
+            axis=1
+        )
+    return out
+
+
+def kmeans(
+    x: np.ndarray, k: int, n_iter: int = KMEANS_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """
+    Lloyd's k-means on the rows of x.
+
+    Args:
+        x (np.ndarray): (n, d) float32 training vectors, n >= k
+        k (int): Number of centroids
+        n_iter (int): Iterations
+        seed (int): Seed for the initial centroids and empty-cluster reseeding
+
+    Returns:
+        np.ndarray: (k, d) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest_centroid(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        used = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[used]
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[used] = sums / counts[used, None]
+
+        # Empty clusters restart from random training points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQVectorIndex(VectorIndex):
+    """
+    Inverted-file index with product-quantized residuals (IVF-PQ).
+
+    A k-means coarse quantizer splits the corpus into `nlist` lists. Each
+    vector is stored as its list plus `m` one-byte codes of its residual
+    (vector - list centroid), so a 512-dim float32 vector takes m bytes.
+    A query scans the `nprobe` closest lists with asymmetric distance
+    computation (ADC): per list, one (m, 256) lookup table of distances
+    from the query residual to every codebook entry, summed over the codes.
+
+    The best `rerank * k` candidates are then re-scored exactly against
+    the full vectors of the embedding store (memory-mapped, so only the
+    shortlist rows are read), which restores near-exact ordering.
+
+    Args:
+        nprobe (int): Lists scanned per query (recall vs latency)
+        rerank (int): Shortlist size as a multiple of k; 0 = ADC order only
+        rerank_vectors (np.ndarray): Full (n, dim) vectors for re-ranking
+    """
+
+    backend = "ivfpq"
+
+    def __init__(
+        self,
+        nprobe: int = DEFAULT_NPROBE,
+        rerank: int = DEFAULT_RERANK,
+        rerank_vectors: np.ndarray = None,
+    ):
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.rerank_vectors = rerank_vectors
+        self.store_path = None
+        self.centroids = None  # (nlist, dim)
+        self.codebooks = None  # (m, ksub, dsub)
+        self.codes = None  # (n, m) uint8, grouped by list
+        self.ids = None  # (n,) row id of each code
+        self.offsets = None  # (nlist + 1,) start of each list in codes
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    def build(
+        self,
+        vectors,
+        nlist: int = DEFAULT_NLIST,
+        m: int = DEFAULT_M,
+        seed: int = 0,
+        store_path: str = None,
+        block_rows: int = 16384,
+        **params,
+    ):
+        """
+        Trains the coarse quantizer and PQ codebooks on a sample of the
+        vectors, then encodes all of them block by block.
+
+        Args:
+            vectors: (n, dim) vectors, e.g. the memmap of an embedding store
+            nlist (int): Number of inverted lists
+            m (int): Number of sub-quantizers; must divide dim
+            seed (int): Seed for sampling and k-means
+            store_path (str): Embedding store used for re-ranking after load
+        """
+        n, dim = vectors.shape
+        if n == 0:
+            raise ValueError("cannot train IVF-PQ on an empty set of vectors")
+        if dim % m:
+            raise ValueError(f"m={m} does not divide the dimension {dim}")
+        dsub = dim // m
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.default_rng(seed)
+        n_train = min(n, MAX_TRAINING_VECTORS)
+        sample = np.sort(rng.choice(n, n_train, replace=False))
+        train = _normalize_rows(vectors[sample])
+
+        self.centroids = kmeans(train, nlist, seed=seed)
+        residuals = train - self.centroids[_nearest_centroid(train, self.centroids)]
+        ksub = min(_KSUB, n_train)
+        self.codebooks = np.stack(
+            [
+                kmeans(residuals[:, j * dsub : (j + 1) * dsub], ksub, seed=seed + j)
+                for j in range(m)
+            ]
+        )
+
+        lists = np.empty(n, dtype=np.int64)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for start in range(0, n, block_rows):
+            block = _normalize_rows(vectors[start : start + block_rows])
+            assign = _nearest_centroid(block, self.centroids)
+            lists[start : start + len(block)] = assign
+            codes[start : start + len(block)] = self._encode(
+                block - self.centroids[assign]
+            )
+
+        order = np.argsort(lists, kind="stable")
+        self.codes = codes[order]
+        self.ids = order.astype(np.int64)
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(lists, minlength=nlist))]
+        ).astype(np.int64)
+
+        self.store_path = store_path
+        if store_path is not None and self.rerank_vectors is None:
+            self.rerank_vectors = vectors
+        return self
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        m, _, dsub = self.codebooks.shape
+        codes = np.empty((len(residuals), m), dtype=np.uint8)
+        for j in range(m):
+            sub = residuals[:, j * dsub : (j + 1) * dsub]
+            codes[:, j] = _nearest_centroid(sub, self.codebooks[j])
+        return codes
+
+    def save(self, path: str):
+        meta = {
+            "format": "ivfpq-v1",
+            "nprobe": self.nprobe,
+            "rerank": self.rerank,
+            # relative, so the index and store can be moved together
+            "store": (
+                os.path.relpath(
+                    os.path.abspath(self.store_path),
+                    os.path.dirname(os.path.abspath(path)),
+                )
+                if self.store_path
+                else None
+            ),
+        }
+        # np.savez appends ".npz" to names, not to open files
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                centroids=self.centroids,
+                codebooks=self.codebooks,
+                codes=self.codes,
+                ids=self.ids,
+                offsets=self.offsets,
+            )
+
+    @classmethod
+    def load(
+        cls, path: str, nprobe: int = None, rerank: int = None, store_path: str = None
+    ):
+        """
+        Loads a saved index. The re-ranking store recorded at build time is
+        opened unless `store_path` overrides it; if it is missing, results
+        are ordered by ADC distance.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(
+                nprobe=meta["nprobe"] if nprobe is None else nprobe,
+                rerank=meta["rerank"] if rerank is None else rerank,
+            )
+            index.centroids = data["centroids"]
+            index.codebooks = data["codebooks"]
+            index.codes = data["codes"]
+            index.ids = data["ids"]
+            index.offsets = data["offsets"]
+
+        if store_path is None and meta.get("store"):
+            store_path = os.path.join(
+                os.path.dirname(os.path.abspath(path)), meta["store"]
+            )
+        if store_path is not None:
+            from image_recommender.data.embedding_store import (
+                EmbeddingStore,
+                store_exists,
+            )
+
+            if store_exists(store_path):
+                index.store_path = store_path
+                index.rerank_vectors = EmbeddingStore(store_path).vectors
+        return index
+
+    def _search_one(self, query: np.ndarray, probe: np.ndarray, k: int):
+        m, _, dsub = self.codebooks.shape
+        cand_ids, cand_dists = [], []
+        for lst in probe:
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            # ADC lookup table: distance of each residual slice to each codeword
+            residual = (query - self.centroids[lst]).reshape(m, 1, dsub)
+            table = ((residual - self.codebooks) ** 2).sum(axis=2)
+            codes = self.codes[start:end]
+            cand_dists.append(table[np.arange(m), codes].sum(axis=1))
+            cand_ids.append(self.ids[start:end])
+        if not cand_ids:
+            return [], []
+        ids = np.concatenate(cand_ids)
+        dists = np.concatenate(cand_dists)
+
+        shortlist = k * self.rerank if self.rerank_vectors is not None else k
+        shortlist = min(max(shortlist, k), len(ids))
+        if shortlist < len(ids):
+            keep = np.argpartition(dists, shortlist - 1)[:shortlist]
+            ids, dists = ids[keep], dists[keep]
+
+        if self.rerank and self.rerank_vectors is not None:
+            ids = np.sort(ids)  # sequential reads from the memmap
+            full = _normalize_rows(self.rerank_vectors[ids])
+            angular = _angular_from_cosine(full @ query)
+        else:
+            # residual PQ approximates ||q - x||², which is angular² for unit vectors
+            angular = np.sqrt(np.clip(dists, 0.0, None))
+
+        order = np.argsort(angular, kind="stable")[:k]
+        return ids[order].tolist(), angular[order].tolist()
+
+    def batch_search(self, vectors, k: int, search_k: int = None):
+        queries = _normalize_rows(np.atleast_2d(vectors))
+        nprobe = max(1, min(self.nprobe, self.nlist))
+        coarse = _squared_distances(queries, self.centroids)
+        probes = np.argsort(coarse, axis=1)[:, :nprobe]
+
+        results = [self._search_one(q, p, k) for q, p in zip(queries, probes)]
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def memory_bytes(self) -> int:
+        """Resident size of the compressed index (excluding the re-rank store)."""
+        return sum(
+            a.nbytes
+            for a in (
+                self.centroids,
+                self.codebooks,
+                self.codes,
+                self.ids,
+                self.offsets,
+            )
+        )
@@ -0,0 +1,112 @@
+from itertools import combinations
+
+import numpy as np
+
+from image_recommender.similarity.similarity_phash import hamming_distances
+
+# Multi-index hashing: each 64-bit hash is split into 4 substrings of 16
+# bits, with one table per substring. Two hashes within distance d differ
+# in at most d // 4 bits of at least one substring (pigeonhole), so a range
+# query only probes substring values within that radius and verifies the
+# few candidates it finds with the full Hamming distance.
+N_CHUNKS = 4
+CHUNK_BITS = 16
+
+# Above this substring radius, probing enumerates more values than a
+# linear scan of a 500k corpus costs, so the index scans instead
+MAX_PROBE_RADIUS = 3
+
+
+def split_hashes(hashes, n_chunks: int = N_CHUNKS) -> np.ndarray:
+    """
+    (n, n_chunks) array of the equal-width substrings of packed 64-bit
+    hashes, each as a non-negative integer.
+    """
+    bits = 64 // n_chunks
+    u = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+    shifts = np.arange(n_chunks, dtype=np.uint64) * np.uint64(bits)
+    mask = np.uint64((1 << bits) - 1)
+    return ((u[:, None] >> shifts[None, :]) & mask).astype(np.int64)
+
+
+def flip_masks(bits: int, radius: int) -> np.ndarray:
+    """
+    XOR masks of all bit patterns of width `bits` with at most `radius`
+    bits set (0 first); value ^ mask enumerates the values within radius.
+    """
+    out = [0]
+    for r in range(1, radius + 1):
+        for positions in combinations(range(bits), r):
+            flip = 0
+            for b in positions:
+                flip |= 1 << b
+            out.append(flip)
+    return np.array(out, dtype=np.int64)
+
+
+class PHashIndex:
+    """
+    Hamming-space index over 64-bit perceptual hashes for range queries:
+    "all images within distance d of this hash".
+
+    Each substring table is a sort order of the corpus by that substring
+    plus bucket offsets for all 65536 values, so a probe is a slice.
+
+    Args:
+        hashes: (n,) packed pHashes (signed 64-bit ints, see phash_to_int)
+        ids: (n,) image IDs, one per hash
+    """
+
+    def __init__(self, hashes, ids):
+        self.hashes = np.asarray(hashes, dtype=np.int64)
+        self.ids = list(ids)
+        if len(self.ids) != len(self.hashes):
+            raise ValueError("hashes and ids differ in length")
+
+        chunks = split_hashes(self.hashes)
+        self._orders = []
+        self._offsets = []
+        for c in range(N_CHUNKS):
+            order = np.argsort(chunks[:, c], kind="stable")
+            counts = np.bincount(chunks[:, c], minlength=1 << CHUNK_BITS)
+            self._orders.append(order)
+            self._offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _candidates(self, query: int, max_distance: int) -> np.ndarray:
+        radius = max_distance // N_CHUNKS
+        if radius > MAX_PROBE_RADIUS:
+            return np.arange(len(self.hashes))
+        q_chunks = split_hashes(np.array([query]))[0]
+        masks = flip_masks(CHUNK_BITS, radius)
+        found = []
+        for c in range(N_CHUNKS):
+            offsets, order = self._offsets[c], self._orders[c]
+            for value in q_chunks[c] ^ masks:
+                start, end = offsets[value], offsets[value + 1]
+                if start != end:
+                    found.append(order[start:end])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def range_search(self, query: int, max_distance: int):
+        """
+        Returns (rows, distances) of all hashes within max_distance of the
+        query hash, sorted by distance.
+        """
+        rows = self._candidates(query, max_distance)
+        if not len(rows):
+            return [], []
+        dist = hamming_distances(query, self.hashes[rows])
+        keep = dist <= max_distance
+        rows, dist = rows[keep], dist[keep]
+        order = np.lexsort((rows, dist))
+        return rows[order].tolist(), dist[order].tolist()
+
+    def search(self, query: int, max_distance: int):
+        """Like range_search, but returns (image_id, distance) pairs."""
+        rows, dist = self.range_search(query, max_distance)
+        return [(self.ids[r], d) for r, d in zip(rows, dist)]
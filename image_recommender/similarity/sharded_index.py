@@ -0,0 +1,225 @@
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from heapq import nsmallest
+
+import numpy as np
+
+from image_recommender.similarity.vector_index import AnnoyVectorIndex, VectorIndex
+
+SHARDS_FORMAT = "annoy-shards-v1"
+
+
+def shard_ranges(count: int, n_shards: int):
+    """
+    Splits rows 0..count-1 into n_shards contiguous (start, end) ranges
+    of near-equal size.
+    """
+    n_shards = max(1, min(n_shards, count)) if count else 1
+    bounds = np.linspace(0, count, n_shards + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def shard_file(manifest_path: str, shard: int) -> str:
+    """File name of one shard, next to the manifest."""
+    stem = os.path.splitext(os.path.basename(manifest_path))[0]
+    return f"{stem}_shard{shard:03d}.ann"
+
+
+def _build_shard(store_path, start, end, out_path, n_trees, seed):
+    # Runs in a worker process: reads only its rows from the memmapped store
+    from image_recommender.data.embedding_store import EmbeddingStore
+
+    store = EmbeddingStore(store_path)
+    index = AnnoyVectorIndex(store.dim)
+    index.build(store.vectors[start:end], n_trees=n_trees, seed=seed, n_jobs=1)
+    index.save(out_path)
+    return out_path
+
+
+def _write_manifest(path: str, dim: int, n_trees: int, ranges):
+    manifest = {
+        "format": SHARDS_FORMAT,
+        "dim": dim,
+        "n_trees": n_trees,
+        "count": ranges[-1][1] if ranges else 0,
+        "shards": [
+            {"path": shard_file(path, i), "start": start, "count": end - start}
+            for i, (start, end) in enumerate(ranges)
+        ],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def build_shards(
+    store_path: str,
+    manifest_path: str,
+    n_shards: int = None,
+    n_trees: int = 10,
+    workers: int = None,
+    seed: int = None,
+):
+    """
+    Builds one Annoy index per contiguous row range of an embedding store,
+    each in its own process, then writes the shard manifest.
+
+    Args:
+        store_path (str): Embedding store path
+        manifest_path (str): Output manifest (.shards); shard files go next to it
+        n_shards (int): Number of shards (default: CPU count)
+        n_trees (int): Annoy trees per shard
+        workers (int): Build processes (default: n_shards)
+        seed (int): Annoy seed of every shard
+
+    Returns:
+        list of (start, end) row ranges, one per shard
+    """
+    from image_recommender.data.embedding_store import EmbeddingStore
+
+    store = EmbeddingStore(store_path)
+    ranges = shard_ranges(store.count, n_shards or os.cpu_count() or 1)
+    out_dir = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers or len(ranges)) as ex:
+        futs = [
+            ex.submit(
+                _build_shard,
+                store_path,
+                start,
+                end,
+                os.path.join(out_dir, shard_file(manifest_path, i)),
+                n_trees,
+                seed,
+            )
+            for i, (start, end) in enumerate(ranges)
+        ]
+        for fut in futs:
+            fut.result()
+
+    # published last, so readers never see a manifest with missing shards
+    _write_manifest(manifest_path, store.dim, n_trees, ranges)
+    return ranges
+
+
+class ShardedVectorIndex(VectorIndex):
+    """
+    Several Annoy indices over contiguous row ranges, described by a
+    manifest. Queries fan out to all shards concurrently (Annoy releases
+    the GIL while searching) and the per-shard top-k lists are merged.
+
+    Args:
+        shards (list): (row offset, AnnoyVectorIndex) per shard
+        workers (int): Threads used to query shards (default: one per shard)
+    """
+
+    backend = "sharded"
+
+    def __init__(self, shards=None, workers: int = None):
+        self.shards = shards or []
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def search_k(self) -> int:
+        return self.shards[0][1].search_k if self.shards else -1
+
+    @search_k.setter
+    def search_k(self, value: int):
+        for _, shard in self.shards:
+            shard.search_k = value
+
+    def build(self, vectors, n_shards: int = 2, n_trees: int = 10, seed: int = None):
+        """In-process build from an array; see build_shards for the parallel one."""
+        self.shards = []
+        for start, end in shard_ranges(len(vectors), n_shards):
+            shard = AnnoyVectorIndex(vectors.shape[1])
+            shard.build(vectors[start:end], n_trees=n_trees, seed=seed, n_jobs=1)
+            self.shards.append((start, shard))
+        self._n_trees = n_trees
+        return self
+
+    def save(self, path: str):
+        out_dir = os.path.dirname(os.path.abspath(path))
+        ranges = []
+        for i, (start, shard) in enumerate(self.shards):
+            shard.save(os.path.join(out_dir, shard_file(path, i)))
+            ranges.append((start, start + len(shard)))
+        dim = self.shards[0][1].dim if self.shards else 0
+        _write_manifest(path, dim, getattr(self, "_n_trees", None), ranges)
+
+    @classmethod
+    def load(cls, path: str, search_k: int = -1, workers: int = None, **params):
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SHARDS_FORMAT:
+            raise ValueError(f"{path} is not a shard manifest")
+        base = os.path.dirname(os.path.abspath(path))
+        shards = [
+            (
+                s["start"],
+                AnnoyVectorIndex.load(
+                    os.path.join(base, s["path"]),
+                    dim=manifest["dim"],
+                    search_k=search_k,
+                ),
+            )
+            for s in manifest["shards"]
+        ]
+        return cls(shards, workers=workers)
+
+    def _map(self, fn):
+        futures = None
+        with self._pool_lock:
+            # created once even when the first queries arrive concurrently;
+            # submitting under the lock keeps close() from racing with it
+            if self._pool is None and not self._closed and len(self.shards) > 1:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers or len(self.shards)
+                )
+            if self._pool is not None:
+                futures = [self._pool.submit(fn, s) for s in self.shards]
+        if futures is None:
+            return [fn(s) for s in self.shards]
+        return [f.result() for f in futures]
+
+    def close(self):
+        """
+        Shuts down the query threads. Searches already running finish;
+        later ones (e.g. from a reader still holding a swapped-out version)
+        query the shards one after another.
+        """
+        with self._pool_lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def batch_search(self, vectors, k: int, search_k: int = None):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+
+        def _query_shard(entry):
+            offset, shard = entry
+            ids, dists = shard.batch_search(vectors, k, search_k)
+            return [[i + offset for i in row] for row in ids], dists
+
+        per_shard = self._map(_query_shard)
+
+        all_ids, all_dists = [], []
+        for q in range(len(vectors)):
+            merged = nsmallest(
+                k,
+                ((d, i) for ids, dists in per_shard for i, d in zip(ids[q], dists[q])),
+            )
+            all_ids.append([i for _, i in merged])
+            all_dists.append([d for d, _ in merged])
+        return all_ids, all_dists
+
+    def __len__(self) -> int:
+        return sum(len(shard) for _, shard in self.shards)
@@ -1,30 +1,302 @@
 import os
+import json
+import threading
+import zipfile
 import torch
-import clip
 from PIL import Image
 from annoy import AnnoyIndex
 from typing import List
 
+from image_recommender.similarity.vector_index import (
+    AnnoyVectorIndex,
+    VectorIndex,
+    build_vector_index,
+    load_vector_index,
+)
+
 
 # Set device: use GPU if available
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
-# Load CLIP model
-model, preprocess = clip.load("ViT-B/32", device=device)
-EMBEDDING_DIM = model.visual.output_dim
+# CLIP model used throughout the project
+MODEL_NAME = "ViT-B/32"
+
+# Output dimension of the CLIP image encoders, so that EMBEDDING_DIM
+# can be answered without loading any weights
+_KNOWN_EMBEDDING_DIMS = {
+    "RN50": 1024,
+    "RN101": 512,
+    "RN50x4": 640,
+    "RN50x16": 768,
+    "RN50x64": 1024,
+    "ViT-B/32": 512,
+    "ViT-B/16": 512,
+    "ViT-L/14": 768,
+    "ViT-L/14@336px": 768,
+}
+
+# Encoder backends:
+#   "eager"       - the model as returned by clip.load
+#   "int8"        - CPU only; image encoder Linear layers dynamically quantized to int8
+#   "torchscript" - frozen, traced image encoder exported by tools/export_torchscript.py
+ENCODER_BACKENDS = ("eager", "int8", "torchscript")
+
+# Backend used when callers do not ask for one; CLIP_BACKEND overrides it
+_default_backend = os.getenv("CLIP_BACKEND", "eager")
+
+# Location of the TorchScript artifact; CLIP_TORCHSCRIPT_PATH overrides it
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TORCHSCRIPT_PATH = os.getenv(
+    "CLIP_TORCHSCRIPT_PATH",
+    os.path.join(BASE_DIR, "data", "out", "clip_image_encoder.ts"),
+)
+# Name of the metadata entry stored inside the TorchScript archive
+TORCHSCRIPT_META = "clip_meta.json"
+
+# Registry of loaded CLIP models: (model_name, device, backend) -> (model, preprocess).
+# Filled lazily on first use; the lock makes sure concurrent callers
+# (GUI search thread, worker pools) share a single clip.load.
+_model_cache = {}
+_model_lock = threading.Lock()
+
+
+def set_encoder_backend(backend: str, torchscript_path: str = None):
+    """
+    Selects the encoder backend used by default for all embeddings.
+
+    Args:
+        backend (str): One of ENCODER_BACKENDS
+        torchscript_path (str): Artifact to load for the "torchscript" backend
+    """
+    global _default_backend, TORCHSCRIPT_PATH
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, use one of {ENCODER_BACKENDS}")
+    _default_backend = backend
+    if torchscript_path:
+        TORCHSCRIPT_PATH = torchscript_path
+
 
+def get_encoder_backend() -> str:
+    """Returns the default encoder backend."""
+    return _default_backend
 
-def compute_clip_embedding(image: Image.Image) -> torch.Tensor:
+
+def get_encoder_id(model_name: str = MODEL_NAME, backend: str = None) -> str:
+    """
+    Returns an identifier for the embeddings an encoder produces, e.g.
+    "ViT-B/32" or "ViT-B/32:int8". Stored with persisted embeddings so
+    vectors from different encoders are never mixed. For the torchscript
+    backend the model is the one recorded in the artifact.
+    """
+    backend = backend or _default_backend
+    if backend == "torchscript":
+        meta = _torchscript_artifact_meta(model_name)
+        if meta and meta.get("model"):
+            model_name = meta["model"]
+    return model_name if backend == "eager" else f"{model_name}:{backend}"
+
+
+def _quantize_int8(model):
+    # Dynamic quantization: int8 weights, activations quantized on the fly.
+    # Only the image encoder is touched; attention out-projections are
+    # skipped by PyTorch (NonDynamicallyQuantizableLinear).
+    model.visual = torch.ao.quantization.quantize_dynamic(
+        model.visual, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    return model
+
+
+class TorchScriptEncoder:
+    """
+    Frozen TorchScript image encoder with the encode_image() interface of
+    a CLIP model. The artifact normalizes its input and its output itself,
+    so it is fed [0, 1] tensors (see torchscript_preprocess).
+    """
+
+    def __init__(self, path: str, device: str):
+        extra_files = {TORCHSCRIPT_META: ""}
+        self.module = torch.jit.load(
+            path, map_location=device, _extra_files=extra_files
+        )
+        self.meta = json.loads(extra_files[TORCHSCRIPT_META])
+        self.device = torch.device(device)
+        self.output_dim = int(self.meta["dim"])
+
+    def encode_image(self, images: torch.Tensor) -> torch.Tensor:
+        return self.module(images)
+
+    def eval(self):
+        return self
+
+
+def torchscript_preprocess(resolution: int):
+    """
+    CLIP preprocessing without the final Normalize, which lives inside the
+    TorchScript artifact.
+    """
+    from torchvision.transforms import (
+        CenterCrop,
+        Compose,
+        InterpolationMode,
+        Resize,
+        ToTensor,
+    )
+
+    return Compose(
+        [
+            Resize(resolution, interpolation=InterpolationMode.BICUBIC),
+            CenterCrop(resolution),
+            lambda img: img.convert("RGB"),
+            ToTensor(),
+        ]
+    )
+
+
+def get_encoder_device(device: str = device, backend: str = None) -> str:
+    """
+    Returns the device an encoder backend actually runs on when `device`
+    is requested: the int8 backend always runs on the CPU.
+    """
+    backend = backend or _default_backend
+    return "cpu" if backend == "int8" else device  # quantized kernels are CPU only
+
+
+def _registry_key(model_name, device, backend):
+    device = get_encoder_device(device, backend)
+    if backend == "torchscript":
+        model_name = TORCHSCRIPT_PATH
+    return (model_name, device, backend)
+
+
+def get_clip_model(
+    model_name: str = MODEL_NAME, device: str = device, backend: str = None
+):
+    """
+    Returns the shared (model, preprocess) pair, loading it on first use.
+
+    Args:
+        model_name (str): CLIP model name as understood by clip.load
+        device (str): Torch device the model is placed on
+        backend (str): Encoder backend (default: see set_encoder_backend)
+
+    Returns:
+        Tuple of (model, preprocess)
+    """
+    backend = backend or _default_backend
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, use one of {ENCODER_BACKENDS}")
+
+    key = _registry_key(model_name, device, backend)
+    entry = _model_cache.get(key)
+    if entry is None:
+        with _model_lock:
+            entry = _model_cache.get(key)
+            if entry is None:
+                entry = _model_cache[key] = _load_encoder(*key)
+    return entry
+
+
+def _load_encoder(model_name: str, device: str, backend: str):
+    if backend == "torchscript":
+        model = TorchScriptEncoder(model_name, device)
+        return model, torchscript_preprocess(int(model.meta["resolution"]))
+
+    import clip  # deferred: pulls in torchvision and the weights
+
+    model, preprocess = clip.load(model_name, device=device)
+    model.eval()
+    if backend == "int8":
+        model = _quantize_int8(model)
+    return model, preprocess
+
+
+def _model_device(model) -> torch.device:
+    # Frozen TorchScript modules have no parameters left to ask
+    dev = getattr(model, "device", None)
+    return dev if dev is not None else next(model.parameters()).device
+
+
+def is_clip_model_loaded(
+    model_name: str = MODEL_NAME, device: str = device, backend: str = None
+) -> bool:
+    """Returns True if the given model is already resident in the registry."""
+    backend = backend or _default_backend
+    return _registry_key(model_name, device, backend) in _model_cache
+
+
+# (path, mtime_ns) -> metadata of a TorchScript artifact read from disk
+_torchscript_meta_cache = {}
+
+
+def _torchscript_meta(path: str) -> dict:
+    # The metadata is a plain file inside the archive (a zip), so it is
+    # read without loading the module
+    key = (path, os.stat(path).st_mtime_ns)
+    if key not in _torchscript_meta_cache:
+        with zipfile.ZipFile(path) as archive:
+            name = next(
+                n
+                for n in archive.namelist()
+                if n.endswith("/extra/" + TORCHSCRIPT_META)
+            )
+            _torchscript_meta_cache[key] = json.loads(archive.read(name))
+    return _torchscript_meta_cache[key]
+
+
+def _torchscript_artifact_meta(model_name: str = MODEL_NAME):
+    """
+    Metadata of the active TorchScript artifact: from the loaded encoder,
+    else from the archive on disk; None if it cannot be read.
+    """
+    entry = _model_cache.get(_registry_key(model_name, device, "torchscript"))
+    if entry is not None:
+        return entry[0].meta
+    try:
+        return _torchscript_meta(TORCHSCRIPT_PATH)
+    except (OSError, StopIteration, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def get_embedding_dim(model_name: str = MODEL_NAME, backend: str = None) -> int:
+    """
+    Returns the embedding dimension of the given CLIP model.
+    With the torchscript backend it is the exported artifact's own
+    dimension (its metadata); known models are answered from a table;
+    others load the model once.
+    """
+    backend = backend or _default_backend
+    if backend == "torchscript":
+        meta = _torchscript_artifact_meta(model_name)
+        if meta and "dim" in meta:
+            return int(meta["dim"])
+        return get_clip_model(model_name, backend=backend)[0].output_dim
+    if model_name in _KNOWN_EMBEDDING_DIMS:
+        return _KNOWN_EMBEDDING_DIMS[model_name]
+    model, _ = get_clip_model(model_name, backend=backend)
+    return model.visual.output_dim
+
+
+def __getattr__(name):
+    # EMBEDDING_DIM is resolved through the registry instead of at import time
+    if name == "EMBEDDING_DIM":
+        return get_embedding_dim()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def compute_clip_embedding(image: Image.Image, backend: str = None) -> torch.Tensor:
     """
     Computes the CLIP embedding for a given PIL image.
 
     Args:
         image (PIL.Image): RGB image
+        backend (str): Encoder backend (default: see set_encoder_backend)
 
     Returns:
         torch.Tensor: Embedding vector (e.g., shape (512,))
     """
-    image_input = preprocess(image).unsqueeze(0).to(device)
+    model, preprocess = get_clip_model(backend=backend)
+    dev = _model_device(model)
+    image_input = preprocess(image).unsqueeze(0).to(dev)
     with torch.no_grad():
         embedding = model.encode_image(image_input)
         embedding /= embedding.norm(dim=-1, keepdim=True)
@@ -40,11 +312,7 @@ def build_annoy_index(embeddings: dict, index_path: str, n_trees: int = 10):
         index_path (str): Path to save the Annoy index
         n_trees (int): Number of trees (higher = better accuracy, slower build)
     """
-    index = AnnoyIndex(EMBEDDING_DIM, metric="angular")
-    for i, (image_id, vector) in enumerate(embeddings.items()):
-        index.add_item(i, vector)
-    index.build(n_trees)
-    index.save(index_path)
+    build_index(list(embeddings.values()), index_path, "annoy", n_trees=n_trees)
 
 
 def load_annoy_index(index_path: str) -> AnnoyIndex:
@@ -54,47 +322,63 @@ def load_annoy_index(index_path: str) -> AnnoyIndex:
     Returns:
         AnnoyIndex: Loaded index
     """
-    index = AnnoyIndex(EMBEDDING_DIM, metric="angular")
-    index.load(index_path)
-    return index
+    return AnnoyVectorIndex.load(index_path, dim=get_embedding_dim()).annoy
 
 
-def query_similar(image: Image.Image, index: AnnoyIndex, top_k=5) -> list:
+def build_index(
+    embeddings, index_path: str, backend: str = "annoy", **params
+) -> VectorIndex:
     """
-    Finds the top_k most similar items to the input image using CLIP + Annoy.
+    Builds and saves a vector index of the chosen backend.
 
-    Returns:
-        List of (index, distance)
+    Args:
+        embeddings: (n, dim) array or list of vectors; item i is row i
+        index_path (str): Path to save the index
+        backend (str): "annoy" (approximate), "exact" (brute force) or
+            "ivfpq" (compressed inverted file)
+        params: Backend build parameters, e.g. n_trees for Annoy or
+            nlist / m for IVF-PQ
     """
-    embedding = compute_clip_embedding(image)
-    return index.get_nns_by_vector(embedding.tolist(), top_k, include_distances=True)
+    return build_vector_index(embeddings, index_path, backend, **params)
 
 
-# Cache for CLIP model
-_model_cache = {}
-_preprocess_cache = {}
+def load_index(
+    index_path: str, backend: str = None, dim: int = None, **params
+) -> VectorIndex:
+    """
+    Loads a vector index; the backend is inferred from the file extension
+    (.ann → Annoy, .npy → exact, .ivfpq → IVF-PQ) unless given. `params`
+    are backend search settings, e.g. search_k for Annoy or nprobe for IVF-PQ.
+    """
+    return load_vector_index(index_path, backend, dim, **params)
 
 
-def get_clip_model():
-    """Singleton pattern for the CLIP model"""
-    if "model" not in _model_cache:
-        _model_cache["model"], _model_cache["preprocess"] = clip.load(
-            "ViT-B/32", device=device
-        )
-        _model_cache["model"].eval()
-    return _model_cache["model"], _model_cache["preprocess"]
+def query_similar(image: Image.Image, index, top_k=5) -> list:
+    """
+    Finds the top_k most similar items to the input image using CLIP and
+    a VectorIndex (or a raw AnnoyIndex).
+
+    Returns:
+        Tuple of (indices, distances)
+    """
+    embedding = compute_clip_embedding(image)
+    if isinstance(index, VectorIndex):
+        return index.search(embedding.numpy(), top_k)
+    return index.get_nns_by_vector(embedding.tolist(), top_k, include_distances=True)
 
 
-def compute_clip_embeddings_batch(images: List[Image.Image]) -> torch.Tensor:
+def compute_clip_embeddings_batch(
+    images: List[Image.Image], backend: str = None
+) -> torch.Tensor:
     """
     Compute normalized CLIP embeddings for a list of PIL images.
     Returns a (N, EMBEDDING_DIM) float32 tensor on CPU.
     """
     if not images:
-        return torch.empty(0, EMBEDDING_DIM, dtype=torch.float32)
+        return torch.empty(0, get_embedding_dim(), dtype=torch.float32)
 
-    model, preprocess = get_clip_model()
-    dev = next(model.parameters()).device
+    model, preprocess = get_clip_model(backend=backend)
+    dev = _model_device(model)
     batch_inputs = torch.stack([preprocess(img) for img in images]).to(dev)
 
     with torch.inference_mode():
@@ -1,5 +1,9 @@
 from PIL import Image
 import imagehash
+import numpy as np
+
+# Set bits per byte value, for vectorized Hamming distances of packed hashes
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
 
 
 def compute_phash(image: Image.Image) -> imagehash.ImageHash:
@@ -29,3 +33,48 @@ def phash_similarity(img1: Image.Image, img2: Image.Image) -> int:
     hash2 = compute_phash(img2)
 
     return hash1 - hash2  # built-in Hamming distance
+
+
+def phash_to_int(phash: imagehash.ImageHash) -> int:
+    """
+    Packs a 64-bit pHash into a signed 64-bit integer, the range of an
+    SQLite INTEGER column and of np.int64.
+    """
+    value = int(str(phash), 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def compute_phash_int(image: Image.Image) -> int:
+    """pHash of an image as a signed 64-bit integer (see phash_to_int)."""
+    return phash_to_int(compute_phash(image))
+
+
+def hamming_distances(queries, hashes) -> np.ndarray:
+    """
+    Hamming distances between packed 64-bit hashes, vectorized: XOR, then
+    a popcount through a 256-entry byte table.
+
+    Args:
+        queries: One hash (int) or a sequence of q hashes
+        hashes: Sequence of n hashes (ints or an int64/uint64 array)
+
+    Returns:
+        np.ndarray: (n,) int distances for one query, else (q, n)
+    """
+    q = np.atleast_1d(np.asarray(queries, dtype=np.int64)).view(np.uint64)
+    h = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+    x = np.ascontiguousarray(q[:, None] ^ h[None, :])
+    dist = _POPCOUNT8[x.view(np.uint8)].reshape(*x.shape, 8).sum(axis=2, dtype=np.int64)
+    return dist[0] if np.ndim(queries) == 0 else dist
+
+
+def paired_hamming_distances(a, b) -> np.ndarray:
+    """
+    Elementwise Hamming distances a[i] vs b[i] of two equally long
+    sequences of packed 64-bit hashes.
+    """
+    x = np.asarray(a, dtype=np.int64).view(np.uint64) ^ np.asarray(
+        b, dtype=np.int64
+    ).view(np.uint64)
+    x = np.ascontiguousarray(x)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
@@ -0,0 +1,302 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import numpy as np
+from annoy import AnnoyIndex
+
+# All backends report Annoy's angular distance, sqrt(2 - 2 * cos), so callers
+# can map distances to similarities the same way whichever engine is used.
+
+
+def _angular_from_cosine(cos: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.clip(2.0 - 2.0 * cos, 0.0, None))
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex(ABC):
+    """
+    Interface of a nearest-neighbor index over embedding vectors.
+
+    Items are addressed by their row position (0..n-1), which is also
+    the key of the index-to-ID mapping. Backends implement batch_search;
+    search is a single-query convenience on top of it.
+    """
+
+    backend = None
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray, **params):
+        """Indexes the given (n, dim) vectors; item i is row i."""
+
+    @abstractmethod
+    def save(self, path: str):
+        """Writes the index to path."""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str, **params) -> "VectorIndex":
+        """Opens an index written by save."""
+
+    def search(
+        self, vector, k: int, search_k: int = None
+    ) -> Tuple[List[int], List[float]]:
+        """Returns (item ids, angular distances) of the k nearest items."""
+        ids, dists = self.batch_search(np.asarray(vector)[None, :], k, search_k)
+        return ids[0], dists[0]
+
+    @abstractmethod
+    def batch_search(self, vectors, k: int, search_k: int = None):
+        """
+        Searches many query vectors; returns per-query lists of ids and distances.
+
+        search_k sets the Annoy search effort of this call only (None: the
+        index's own setting). Indexes are shared between threads, so it is
+        never stored on the index; backends without it ignore it.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of indexed items."""
+
+    def close(self):
+        """
+        Releases resources held for searching (threads, pools). The index
+        stays searchable; backends without such resources do nothing.
+        """
+
+
+class AnnoyVectorIndex(VectorIndex):
+    """
+    Approximate search with an Annoy forest (angular metric).
+
+    Args:
+        dim (int): Vector dimension
+        search_k (int): Nodes inspected per query (-1 = Annoy default)
+    """
+
+    backend = "annoy"
+
+    def __init__(self, dim: int, search_k: int = -1):
+        self.dim = dim
+        self.search_k = search_k
+        self.annoy = AnnoyIndex(dim, metric="angular")
+
+    def build(
+        self,
+        vectors,
+        n_trees: int = 10,
+        seed: int = None,
+        n_jobs: int = -1,
+        on_disk_path: str = None,
+    ):
+        """
+        Adds the vectors (any iterable of rows) and builds the forest.
+        With on_disk_path, Annoy builds directly into that file instead of
+        RAM, so the index is complete on disk when this returns.
+        """
+        if seed is not None:
+            self.annoy.set_seed(seed)
+        if on_disk_path is not None:
+            self.annoy.on_disk_build(on_disk_path)
+        for i, vector in enumerate(vectors):
+            self.annoy.add_item(i, np.asarray(vector, dtype=np.float32).tolist())
+        self.annoy.build(n_trees, n_jobs=n_jobs)
+        return self
+
+    def save(self, path: str):
+        self.annoy.save(path)
+
+    @classmethod
+    def load(cls, path: str, dim: int = None, search_k: int = -1):
+        if dim is None:
+            from image_recommender.similarity.similarity_embedding import (
+                get_embedding_dim,
+            )
+
+            dim = get_embedding_dim()
+        index = cls(dim, search_k=search_k)
+        index.annoy.load(path)
+        return index
+
+    def search(self, vector, k: int, search_k: int = None):
+        ids, dists = self.annoy.get_nns_by_vector(
+            np.asarray(vector, dtype=np.float32).tolist(),
+            k,
+            search_k=self.search_k if search_k is None else search_k,
+            include_distances=True,
+        )
+        return ids, dists
+
+    def batch_search(self, vectors, k: int, search_k: int = None):
+        results = [self.search(v, k, search_k) for v in vectors]
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def __len__(self) -> int:
+        return self.annoy.get_n_items()
+
+
+class ExactVectorIndex(VectorIndex):
+    """
+    Exact top-k by matrix multiplication over an L2-normalized matrix.
+
+    The matrix is usually a np.memmap (saved .npy or an embedding store),
+    and it is scanned in row blocks, so memory use stays bounded whatever
+    the corpus size. Results have perfect recall, which makes this backend
+    the ground truth for tuning approximate ones.
+
+    Args:
+        vectors (np.ndarray): (n, dim) L2-normalized vectors
+        block_rows (int): Rows multiplied per block
+    """
+
+    backend = "exact"
+
+    def __init__(self, vectors: np.ndarray = None, block_rows: int = 65536):
+        self.vectors = vectors
+        self.block_rows = block_rows
+
+    def build(self, vectors, **params):
+        self.vectors = _normalize_rows(vectors)
+        return self
+
+    def save(self, path: str):
+        if len(self.vectors) == 0:
+            np.save(path, np.zeros(self.vectors.shape, dtype=np.float32))
+            return
+        # Written block by block, so a memmapped source is never fully loaded
+        out = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=self.vectors.shape
+        )
+        for start in range(0, len(self.vectors), self.block_rows):
+            block = self.vectors[start : start + self.block_rows]
+            out[start : start + len(block)] = _normalize_rows(block)
+        out.flush()
+        del out
+
+    @classmethod
+    def load(cls, path: str, **params):
+        return cls(np.load(path, mmap_mode="r"), **params)
+
+    @classmethod
+    def from_store(cls, store_path: str, **params):
+        """Searches an embedding store in place (its vectors are normalized)."""
+        from image_recommender.data.embedding_store import EmbeddingStore
+
+        return cls(EmbeddingStore(store_path).vectors, **params)
+
+    def batch_search(self, vectors, k: int, search_k: int = None):
+        queries = _normalize_rows(np.atleast_2d(vectors))
+        n = len(self.vectors)
+        k = min(k, n)
+        if k <= 0:
+            return [[] for _ in queries], [[] for _ in queries]
+
+        best_sims = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, n, self.block_rows):
+            block = np.asarray(
+                self.vectors[start : start + self.block_rows], dtype=np.float32
+            )
+            sims = queries @ block.T
+            kk = min(k, sims.shape[1])
+            part = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+
+            # merge this block's top-k with the running top-k
+            cand_sims = np.concatenate(
+                [best_sims, np.take_along_axis(sims, part, axis=1)], axis=1
+            )
+            cand_ids = np.concatenate([best_ids, part + start], axis=1)
+            keep = np.argsort(-cand_sims, axis=1, kind="stable")[:, :k]
+            best_sims = np.take_along_axis(cand_sims, keep, axis=1)
+            best_ids = np.take_along_axis(cand_ids, keep, axis=1)
+
+        dists = _angular_from_cosine(best_sims)
+        return best_ids.tolist(), dists.tolist()
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+
+INDEX_BACKENDS = ("annoy", "exact", "ivfpq", "sharded")
+
+# File extension of each backend's saved index
+INDEX_EXTENSIONS = {
+    ".ann": "annoy",
+    ".npy": "exact",
+    ".ivfpq": "ivfpq",
+    ".shards": "sharded",
+}
+
+
+def get_backend_class(backend: str):
+    """
+    Returns the VectorIndex class of a backend name.
+    """
+    if backend == "annoy":
+        return AnnoyVectorIndex
+    if backend == "exact":
+        return ExactVectorIndex
+    # The other backends live in separate modules built on the helpers above
+    if backend == "ivfpq":
+        from image_recommender.similarity.ivfpq_index import IVFPQVectorIndex
+
+        return IVFPQVectorIndex
+    if backend == "sharded":
+        from image_recommender.similarity.sharded_index import ShardedVectorIndex
+
+        return ShardedVectorIndex
+    raise ValueError(f"Unknown backend {backend!r}, use one of {list(INDEX_BACKENDS)}")
+
+
+def detect_backend(path: str) -> str:
+    """
+    Infers the index backend from a path: by file extension, or "exact"
+    for an embedding store prefix.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in INDEX_EXTENSIONS:
+        return INDEX_EXTENSIONS[ext]
+
+    from image_recommender.data.embedding_store import store_exists
+
+    if store_exists(path):
+        return "exact"
+    raise ValueError(f"Cannot tell the index backend of {path}")
+
+
+def build_vector_index(vectors, path: str, backend: str = "annoy", **params):
+    """
+    Builds an index of the given backend over (n, dim) vectors and saves it.
+
+    Returns:
+        VectorIndex: The built index
+    """
+    cls = get_backend_class(backend)
+    vectors = np.asarray(vectors) if not hasattr(vectors, "shape") else vectors
+    index = cls(vectors.shape[1]) if cls is AnnoyVectorIndex else cls()
+    index.build(vectors, **params)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    index.save(path)
+    return index
+
+
+def load_vector_index(
+    path: str, backend: str = None, dim: int = None, **params
+) -> VectorIndex:
+    """
+    Loads a saved index; the backend is inferred from the path if not given.
+    `dim` is only needed by Annoy files (default: the CLIP embedding size);
+    the other formats record it.
+    """
+    cls = get_backend_class(backend or detect_backend(path))
+    if cls is AnnoyVectorIndex:
+        params["dim"] = dim
+    if cls is ExactVectorIndex and os.path.splitext(path)[1].lower() != ".npy":
+        return ExactVectorIndex.from_store(path, **params)
+    return cls.load(path, **params)
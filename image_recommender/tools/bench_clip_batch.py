@@ -1,4 +1,4 @@
-import time, statistics as stats
+import argparse, time, statistics as stats
 import numpy as np
 from PIL import Image
 import torch
@@ -6,6 +6,8 @@ import torch
 from image_recommender.similarity.similarity_embedding import (
     compute_clip_embedding,
     compute_clip_embeddings_batch,
+    get_clip_model,
+    set_encoder_backend,
 )
 
 
@@ -24,8 +26,40 @@ def describe(name, xs):
     )
 
 
+def compare_backends(imgs, torchscript_path: str, repeats: int = 5):
+    """Eager vs frozen TorchScript: cold start and per-batch latency."""
+    set_encoder_backend("torchscript", torchscript_path=torchscript_path)
+    for backend in ("eager", "torchscript"):
+        t0 = time.perf_counter()
+        get_clip_model(backend=backend)
+        print(f"[{backend}] load: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        compute_clip_embeddings_batch(imgs, backend=backend)  # warmup
+        t = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            _ = compute_clip_embeddings_batch(imgs, backend=backend)
+            t.append(time.perf_counter() - t0)
+        describe(f"[{backend}] batch of {len(imgs)}", t)
+
+    eager = compute_clip_embeddings_batch(imgs, backend="eager").numpy()
+    frozen = compute_clip_embeddings_batch(imgs, backend="torchscript").numpy()
+    print(f"max |eager - frozen|: {np.abs(eager - frozen).max():.2e}")
+
+
 def main():
-    imgs = make_dataset(64)
+    ap = argparse.ArgumentParser(description="Benchmark batched CLIP encoding.")
+    ap.add_argument("--n", type=int, default=64, help="Number of images")
+    ap.add_argument(
+        "--torchscript",
+        help="Path of a TorchScript artifact; compares eager vs frozen runs",
+    )
+    args = ap.parse_args()
+
+    imgs = make_dataset(args.n)
+    if args.torchscript:
+        compare_backends(imgs, args.torchscript)
+        return
 
     # per-image
     t = []
@@ -0,0 +1,96 @@
+import argparse, time
+
+import numpy as np
+from PIL import Image
+import torch
+
+from image_recommender.data.loader import (
+    load_image,
+    load_images_generator,
+    preprocess_image,
+)
+from image_recommender.similarity.similarity_embedding import (
+    compute_clip_embeddings_batch,
+    get_clip_model,
+)
+
+
+def load_corpus(images_dir: str | None, limit: int):
+    if images_dir:
+        imgs = []
+        for path in load_images_generator(images_dir):
+            img = load_image(path)
+            if img is not None:
+                imgs.append(preprocess_image(img))
+            if len(imgs) >= limit:
+                break
+        return imgs
+
+    # synthetic fallback: random noise patterns (agreement numbers are only
+    # meaningful on real photos)
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8))
+        for _ in range(limit)
+    ]
+
+
+def embed_all(imgs, backend: str, batch_size: int):
+    get_clip_model(backend=backend)  # load outside the timed region
+    compute_clip_embeddings_batch(imgs[:batch_size], backend=backend)  # warmup
+
+    t0 = time.perf_counter()
+    out = [
+        compute_clip_embeddings_batch(imgs[i : i + batch_size], backend=backend)
+        for i in range(0, len(imgs), batch_size)
+    ]
+    elapsed = time.perf_counter() - t0
+    return torch.cat(out).numpy(), elapsed
+
+
+def topk_overlap(ref: np.ndarray, test: np.ndarray, k: int) -> float:
+    """Mean fraction of each item's top-k neighbors (excluding itself) shared by both spaces."""
+    k = min(k, len(ref) - 1)
+    if k <= 0:
+        return 1.0
+
+    def _topk(emb):
+        sims = emb @ emb.T
+        np.fill_diagonal(sims, -np.inf)
+        return np.argpartition(-sims, k, axis=1)[:, :k]
+
+    a, b = _topk(ref), _topk(test)
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a, b)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare fp32 and int8-quantized CLIP image encoders on CPU."
+    )
+    parser.add_argument("--images", help="Directory with sample images")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    imgs = load_corpus(args.images, args.limit)
+    print(f"Corpus: {len(imgs)} images ({args.images or 'synthetic'})")
+
+    fp32, t_fp32 = embed_all(imgs, "eager", args.batch_size)
+    int8, t_int8 = embed_all(imgs, "int8", args.batch_size)
+
+    cos = np.sum(fp32 * int8, axis=1)  # both are L2-normalized
+    print(f"fp32: {len(imgs) / t_fp32:.1f} img/s")
+    print(f"int8: {len(imgs) / t_int8:.1f} img/s ({t_fp32 / t_int8:.2f}x)")
+    print(
+        f"cosine(fp32, int8): mean={cos.mean():.4f} | min={cos.min():.4f} | p5={np.percentile(cos, 5):.4f}"
+    )
+    print(f"top-{args.topk} overlap: {topk_overlap(fp32, int8, args.topk):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse, tempfile, time
+from pathlib import Path
+import sys
+
+import numpy as np
+from PIL import Image
+
+if __package__ is None and __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from image_recommender.data.loader import (
+    load_image,
+    load_images_generator,
+    load_preprocessed_image,
+    preprocess_image,
+    read_image_size,
+)
+
+# Common camera / phone photo resolutions
+PHOTO_SIZES = [(1920, 1080), (4032, 3024), (6000, 4000)]
+
+
+def synthetic_photo(size, seed: int) -> Image.Image:
+    """Smooth gradients plus noise, so JPEG sizes resemble real photos."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    x = np.linspace(0, 1, w, dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None, None]
+    base = 255 * (0.5 + 0.5 * np.sin(6 * x + 4 * y + rng.uniform(0, 6, 3)))
+    noise = rng.normal(0, 12, (h, w, 3)).astype(np.float32)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def best_of(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def bench(paths, repeats: int):
+    full = best_of(lambda: [preprocess_image(load_image(p)) for p in paths], repeats)
+    draft = best_of(lambda: [load_preprocessed_image(p) for p in paths], repeats)
+    diffs = [
+        np.abs(
+            np.asarray(preprocess_image(load_image(p)), dtype=np.int16)
+            - np.asarray(load_preprocessed_image(p), dtype=np.int16)
+        ).mean()
+        for p in paths
+    ]
+    return full, draft, float(np.mean(diffs))
+
+
+def report(label: str, paths, repeats: int):
+    full, draft, diff = bench(paths, repeats)
+    n = len(paths)
+    print(
+        f"{label}: full {full / n * 1000:.1f} ms/image, "
+        f"draft {draft / n * 1000:.1f} ms/image → {full / draft:.1f}x "
+        f"(mean abs pixel difference at 224x224: {diff:.2f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Full-resolution vs reduced-resolution (draft) JPEG decode "
+        "of load + preprocess."
+    )
+    parser.add_argument(
+        "--images", default=None, help="Directory of real photos (default: synthetic)"
+    )
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.images:
+        paths = []
+        for path in load_images_generator(args.images):
+            if path.lower().endswith((".jpg", ".jpeg")) and read_image_size(path):
+                paths.append(path)
+            if len(paths) >= args.limit:
+                break
+        if not paths:
+            print("❌ No readable JPEGs found.")
+            return
+        sizes = np.array([read_image_size(p) for p in paths])
+        megapixels = (sizes[:, 0] * sizes[:, 1]).mean() / 1e6
+        report(f"{len(paths)} photos, {megapixels:.1f} MP avg", paths, args.repeats)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for w, h in PHOTO_SIZES:
+            paths = []
+            for i in range(min(args.limit, 5)):
+                path = str(Path(tmp) / f"{w}x{h}_{i}.jpg")
+                synthetic_photo((w, h), i).save(path, quality=90)
+                paths.append(path)
+            report(f"{w}x{h} ({w * h / 1e6:.1f} MP)", paths, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse, time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+if __package__ is None and __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from image_recommender.similarity.hist_similarity import (
+    compute_histogram,
+    compute_histograms_batch,
+)
+
+
+def best_of(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-image compute_histogram vs compute_histograms_batch."
+    )
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--size", type=int, default=224, help="Square image side")
+    parser.add_argument("--bins", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    stack = rng.integers(0, 256, (args.images, args.size, args.size, 3), dtype=np.uint8)
+
+    loop = best_of(
+        lambda: np.stack([compute_histogram(img, args.bins) for img in stack]),
+        args.repeats,
+    )
+    batch = best_of(lambda: compute_histograms_batch(stack, args.bins), args.repeats)
+
+    ref = np.stack([compute_histogram(img, args.bins) for img in stack])
+    diff = np.abs(compute_histograms_batch(stack, args.bins) - ref).max()
+
+    n = args.images
+    print(f"{n} images {args.size}x{args.size}, {args.bins} bins per channel")
+    print(f"per-image loop: {loop * 1000:.1f} ms ({loop / n * 1e6:.0f} µs/image)")
+    print(f"batched:        {batch * 1000:.1f} ms ({batch / n * 1e6:.0f} µs/image)")
+    print(f"speedup: {loop / batch:.1f}x | max abs difference: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse, os, tempfile, time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+if __package__ is None and __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.pipeline import search_pipeline
+from image_recommender.pipeline.build_embedding_index import build_index_from_store
+from image_recommender.pipeline.resource_cache import resource_cache
+
+
+def build_synthetic(workdir: str, n: int, dim: int):
+    """Annoy index + binary mapping over n random unit vectors."""
+    rng = np.random.default_rng(0)
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    store = os.path.join(workdir, "emb")
+    with EmbeddingStoreWriter(store, dim) as w:
+        w.append([f"{i:064x}" for i in range(n)], v)
+    index_path = os.path.join(workdir, "clip_index.ann")
+    mapping_path = os.path.join(workdir, "index_to_id.idmap")
+    build_index_from_store(store, index_path, mapping_path, n_trees=10)
+    return index_path, mapping_path
+
+
+def time_queries(index_path, mapping_path, queries, k: int, cold: bool):
+    """
+    Per-query seconds of index/mapping lookup + ANN search + ID mapping;
+    the part of combined_similarity_search that does not depend on CLIP.
+    With cold=True the cache is cleared first, i.e. every query loads.
+    """
+    times = []
+    for q in queries:
+        if cold:
+            resource_cache.invalidate()
+        t0 = time.perf_counter()
+        index, index_to_id = search_pipeline._load_clip_index(index_path, mapping_path)
+        ids, _ = index.search(q, k)
+        [index_to_id[i] for i in ids]
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def describe(name, xs):
+    ms = np.asarray(xs) * 1000
+    print(
+        f"{name}: mean={ms.mean():.3f} ms | p50={np.percentile(ms, 50):.3f} ms | "
+        f"p99={np.percentile(ms, 99):.3f} ms | n={len(ms)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query latency with a cold vs warm index/mapping cache."
+    )
+    parser.add_argument("--index", help="Index file (default: synthetic corpus)")
+    parser.add_argument("--mapping", help="Mapping file for --index")
+    parser.add_argument("--synthetic", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.index:
+            index_path, mapping_path = args.index, args.mapping
+        else:
+            print(f"Building synthetic index: {args.synthetic} x {args.dim}")
+            index_path, mapping_path = build_synthetic(
+                workdir, args.synthetic, args.dim
+            )
+
+        index, _ = search_pipeline._load_clip_index(index_path, mapping_path)
+        rng = np.random.default_rng(1)
+        queries = rng.standard_normal(
+            (args.queries, getattr(index, "dim", args.dim))
+        ).astype(np.float32)
+
+        describe(
+            "cold (load per query)",
+            time_queries(index_path, mapping_path, queries, args.k, True),
+        )
+        describe(
+            "warm (resource cache)",
+            time_queries(index_path, mapping_path, queries, args.k, False),
+        )
+        print(f"cache hits={resource_cache.hits} misses={resource_cache.misses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse, subprocess, sys, statistics as stats
+from pathlib import Path
+
+import numpy as np
+
+# Each scenario runs in a fresh interpreter so nothing is cached between runs.
+# "import + load" is what every import used to cost when clip.load ran at
+# module import; "import only" is the lazy registry.
+SCENARIOS = {
+    "import only (lazy registry)": (
+        "import image_recommender.similarity.similarity_embedding as se"
+    ),
+    "import + EMBEDDING_DIM": (
+        "from image_recommender.similarity.similarity_embedding import EMBEDDING_DIM"
+    ),
+    "import + load (previous import-time cost)": (
+        "import image_recommender.similarity.similarity_embedding as se\n"
+        "se.get_clip_model()"
+    ),
+}
+
+_TIMER = """
+import time
+t0 = time.perf_counter()
+{body}
+print(time.perf_counter() - t0)
+"""
+
+
+def time_scenario(body: str, repeats: int):
+    repo_root = str(Path(__file__).resolve().parents[2])
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", _TIMER.format(body=body)],
+            cwd=repo_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def describe(name, xs):
+    print(
+        f"{name}: mean={stats.mean(xs) * 1000:.1f} ms | p50={np.percentile(xs, 50) * 1000:.1f} ms | max={max(xs) * 1000:.1f} ms | n={len(xs)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure import cost of similarity_embedding with and without model load."
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, body in SCENARIOS.items():
+        describe(name, time_scenario(body, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
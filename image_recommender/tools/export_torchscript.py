@@ -0,0 +1,111 @@
+import argparse, json, time
+from pathlib import Path
+import sys
+
+import torch
+
+if __package__ is None and __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from image_recommender.similarity.similarity_embedding import (
+    MODEL_NAME,
+    TORCHSCRIPT_META,
+    TORCHSCRIPT_PATH,
+    get_clip_model,
+)
+
+
+class ImageEncoder(torch.nn.Module):
+    """
+    CLIP image encoder with its preprocessing constants baked in:
+    takes [0, 1] RGB tensors, returns L2-normalized float32 embeddings.
+    """
+
+    def __init__(self, visual: torch.nn.Module, mean, std):
+        super().__init__()
+        self.visual = visual
+        self.register_buffer("mean", torch.tensor(mean).view(1, 3, 1, 1))
+        self.register_buffer("std", torch.tensor(std).view(1, 3, 1, 1))
+        self.dtype = next(visual.parameters()).dtype
+
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        x = (images - self.mean) / self.std
+        emb = self.visual(x.to(self.dtype)).float()
+        return emb / emb.norm(dim=-1, keepdim=True)
+
+
+def _normalize_constants(preprocess):
+    for t in getattr(preprocess, "transforms", []):
+        if type(t).__name__ == "Normalize":
+            return list(t.mean), list(t.std)
+    raise ValueError("preprocess has no Normalize transform")
+
+
+def export_image_encoder(
+    visual: torch.nn.Module,
+    out_path: str,
+    resolution: int,
+    mean,
+    std,
+    meta: dict,
+    device: str = "cpu",
+    example_batch: int = 4,
+):
+    """
+    Traces and freezes an image encoder and saves it with its metadata.
+
+    Args:
+        visual (torch.nn.Module): Image encoder, (N, 3, R, R) → (N, dim)
+        out_path (str): Where to write the TorchScript archive
+        resolution (int): Input resolution R
+        mean, std: Per-channel normalization constants
+        meta (dict): Extra metadata to store (e.g. model name)
+        device (str): Device to trace on (the artifact is specific to it)
+        example_batch (int): Batch size of the tracing example
+    """
+    encoder = ImageEncoder(visual, mean, std).to(device).eval()
+    example = torch.rand(example_batch, 3, resolution, resolution, device=device)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(encoder, example)
+        frozen = torch.jit.freeze(traced.eval())
+        dim = frozen(example).shape[-1]
+
+    meta = dict(meta, resolution=resolution, mean=mean, std=std, dim=int(dim))
+    meta["device"] = device
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(frozen, out_path, _extra_files={TORCHSCRIPT_META: json.dumps(meta)})
+    return meta
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Export the CLIP image encoder as a frozen TorchScript artifact."
+    )
+    ap.add_argument("--out", default=TORCHSCRIPT_PATH, help="Output .ts path")
+    ap.add_argument("--model", default=MODEL_NAME)
+    ap.add_argument("--device", default="cpu")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    model, preprocess = get_clip_model(args.model, device=args.device, backend="eager")
+    mean, std = _normalize_constants(preprocess)
+    meta = export_image_encoder(
+        model.visual,
+        args.out,
+        model.visual.input_resolution,
+        mean,
+        std,
+        {"model": args.model},
+        device=args.device,
+    )
+    print(f"Exported {meta['model']} ({meta['dim']}-d) → {args.out}")
+    print(f"Took {time.perf_counter() - t0:.1f} s")
+    print(
+        "Use it with CLIP_BACKEND=torchscript or "
+        "set_encoder_backend('torchscript', torchscript_path=...)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse, json, os, tempfile, time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+if __package__ is None and __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from image_recommender.data.embedding_store import EmbeddingStore
+from image_recommender.pipeline.build_embedding_index import (
+    ANNOY_SEED,
+    BASE_DIR,
+    embeddings_out,
+)
+from image_recommender.similarity.vector_index import (
+    AnnoyVectorIndex,
+    ExactVectorIndex,
+)
+
+REPORT_PATH = os.path.join(BASE_DIR, "data", "out", "annoy_tuning.json")
+
+
+def split_queries(vectors: np.ndarray, n_queries: int, seed: int = 0):
+    """
+    Holds out n_queries random rows as queries and returns (corpus, queries),
+    so no query is trivially its own nearest neighbor.
+    """
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    queries = np.asarray(vectors[np.sort(order[:n_queries])], dtype=np.float32)
+    corpus = np.asarray(vectors[np.sort(order[n_queries:])], dtype=np.float32)
+    return corpus, queries
+
+
+def recall_at_k(found, truth) -> float:
+    """Mean fraction of the true top-k found, over all queries."""
+    hits = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if t]
+    return float(np.mean(hits)) if hits else 1.0
+
+
+def run_grid(corpus, queries, n_trees_grid, search_k_grid, k: int, workdir: str):
+    """
+    Builds one Annoy index per n_trees and queries it with every search_k.
+
+    Returns:
+        List of dicts with n_trees, search_k, recall, p50_ms, p99_ms,
+        build_s and file_mb
+    """
+    truth, _ = ExactVectorIndex().build(corpus).batch_search(queries, k)
+
+    results = []
+    for n_trees in n_trees_grid:
+        index = AnnoyVectorIndex(corpus.shape[1])
+        t0 = time.perf_counter()
+        index.build(corpus, n_trees=n_trees, seed=ANNOY_SEED)
+        build_s = time.perf_counter() - t0
+
+        path = os.path.join(workdir, f"trees_{n_trees}.ann")
+        index.save(path)
+        file_mb = os.path.getsize(path) / 2**20
+        index = AnnoyVectorIndex.load(path, dim=corpus.shape[1])
+
+        for search_k in search_k_grid:
+            index.search_k = search_k
+            found, latencies = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                ids, _ = index.search(q, k)
+                latencies.append(time.perf_counter() - t0)
+                found.append(ids)
+            results.append(
+                {
+                    "n_trees": n_trees,
+                    "search_k": search_k,
+                    "recall": recall_at_k(found, truth),
+                    "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                    "p99_ms": float(np.percentile(latencies, 99) * 1000),
+                    "build_s": build_s,
+                    "file_mb": file_mb,
+                }
+            )
+        index.annoy.unload()
+    return results
+
+
+def pareto_front(results):
+    """
+    Configurations not dominated in (recall up, p99 latency down, file size down).
+    """
+
+    def dominates(a, b):
+        no_worse = (
+            a["recall"] >= b["recall"]
+            and a["p99_ms"] <= b["p99_ms"]
+            and a["file_mb"] <= b["file_mb"]
+        )
+        better = (
+            a["recall"] > b["recall"]
+            or a["p99_ms"] < b["p99_ms"]
+            or a["file_mb"] < b["file_mb"]
+        )
+        return no_worse and better
+
+    front = [r for r in results if not any(dominates(o, r) for o in results)]
+    return sorted(front, key=lambda r: (r["recall"], -r["p99_ms"]))
+
+
+def recommend(results, target_recall: float):
+    """
+    Fastest (p99) configuration reaching target_recall, else the one with
+    the best recall.
+    """
+    ok = [r for r in results if r["recall"] >= target_recall]
+    if ok:
+        return min(ok, key=lambda r: (r["p99_ms"], r["file_mb"]))
+    return max(results, key=lambda r: (r["recall"], -r["p99_ms"]))
+
+
+def describe(r) -> str:
+    return (
+        f"n_trees={r['n_trees']:>4} search_k={r['search_k']:>7} | "
+        f"recall={r['recall']:.3f} | p50={r['p50_ms']:.2f} ms p99={r['p99_ms']:.2f} ms | "
+        f"build={r['build_s']:.1f} s | {r['file_mb']:.1f} MB"
+    )
+
+
+def load_vectors(args):
+    if args.synthetic:
+        # clustered unit vectors, roughly like CLIP embeddings of a photo corpus
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((max(1, args.synthetic // 100), 512))
+        labels = rng.integers(0, len(centers), args.synthetic)
+        v = centers[labels] + 0.5 * rng.standard_normal((args.synthetic, 512))
+        v = v.astype(np.float32)
+        return v / np.linalg.norm(v, axis=1, keepdims=True)
+    vectors = EmbeddingStore(args.embeddings).vectors
+    if args.limit:
+        vectors = vectors[: args.limit]
+    return vectors
+
+
+def _int_list(value: str):
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure Annoy recall@k vs latency over n_trees x search_k."
+    )
+    parser.add_argument("--embeddings", default=embeddings_out)
+    parser.add_argument(
+        "--synthetic", type=int, default=None, help="Use N random vectors"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Use the first N rows")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--k", type=int, default=20, help="Neighbors per query (--clipk)"
+    )
+    parser.add_argument("--n-trees", type=_int_list, default=[5, 10, 25, 50, 100])
+    parser.add_argument(
+        "--search-k", type=_int_list, default=[-1, 1000, 5000, 20000, 50000]
+    )
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--out", default=REPORT_PATH)
+    args = parser.parse_args()
+
+    corpus, queries = split_queries(load_vectors(args), args.queries)
+    print(f"Corpus: {len(corpus)} vectors, {len(queries)} held-out queries, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_grid(
+            corpus, queries, args.n_trees, args.search_k, args.k, workdir
+        )
+
+    for r in results:
+        print(describe(r))
+    front = pareto_front(results)
+    print("\nPareto front (recall / p99 / size):")
+    for r in front:
+        print("  " + describe(r))
+
+    best = recommend(results, args.target_recall)
+    print(f"\nRecommended for recall >= {args.target_recall}: " + describe(best))
+    print(
+        f"  build: python -m image_recommender.pipeline.build_embedding_index "
+        f"--from-store --n-trees {best['n_trees']}\n"
+        f"  query: python -m image_recommender.main <images> --search-k {best['search_k']}"
+        f"  (GUI: CLIP_SEARCH_K={best['search_k']})"
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(
+            {
+                "corpus": len(corpus),
+                "queries": len(queries),
+                "k": args.k,
+                "target_recall": args.target_recall,
+                "results": results,
+                "pareto": front,
+                "recommended": best,
+            },
+            f,
+            indent=2,
+        )
+    print(f"✅ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
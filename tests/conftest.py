@@ -0,0 +1,9 @@
+import numpy as np
+
+
+def flip_bits(rng, h, n_bits):
+    """Flips n_bits distinct random bits of a packed 64-bit hash."""
+    u = np.array([h], dtype=np.int64).view(np.uint64)
+    for b in rng.choice(64, n_bits, replace=False):
+        u ^= np.uint64(1) << np.uint64(b)
+    return int(u.view(np.int64)[0])
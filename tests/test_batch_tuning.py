@@ -0,0 +1,65 @@
+from PIL import Image
+
+from image_recommender.pipeline.batch_tuning import (
+    autotune_batch_size,
+    load_tuned_batch_size,
+    save_tuned_batch_size,
+    tuning_key,
+)
+from image_recommender.similarity import similarity_embedding as se
+
+
+class FakeClock:
+    """Simulated time, advanced only by fake_embed."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_embed(images, clock=None):
+    # fixed per-call overhead + per-image cost: larger batches are faster
+    if clock is not None:
+        clock.now += 0.002 + 0.0001 * len(images)
+
+
+def test_autotune_picks_fastest_fitting_size():
+    imgs = [Image.new("RGB", (8, 8))] * 3
+    clock = FakeClock()
+    best, results = autotune_batch_size(
+        imgs,
+        candidates=(4, 16, 8),
+        repeats=1,
+        embed_fn=lambda batch: fake_embed(batch, clock),
+        clock=clock,
+    )
+    assert [r["batch_size"] for r in results] == [4, 8, 16]
+    assert best == 16
+
+
+def test_autotune_respects_memory_ceiling():
+    imgs = [Image.new("RGB", (8, 8))]
+    best, results = autotune_batch_size(
+        imgs, max_rss_mb=0.001, candidates=(4, 8), repeats=1, embed_fn=fake_embed
+    )
+    # the first probe already exceeds the ceiling: probing stops there
+    assert len(results) == 1 and not results[0]["fits"]
+    assert best == 4
+
+
+def test_tuned_size_is_persisted(tmp_path):
+    path = str(tmp_path / "batch_size.json")
+    assert load_tuned_batch_size(path, key="host|m|cpu") is None
+    save_tuned_batch_size(48, path=path, key="host|m|cpu")
+    save_tuned_batch_size(96, path=path, key="other|m|cuda")
+    assert load_tuned_batch_size(path, key="host|m|cpu") == 48
+    assert load_tuned_batch_size(path, key="other|m|cuda") == 96
+
+
+def test_int8_is_tuned_for_the_cpu(monkeypatch):
+    assert se.get_encoder_device("cuda", "int8") == "cpu"
+    assert se.get_encoder_device("cuda", "eager") == "cuda"
+    monkeypatch.setattr(se, "_default_backend", "int8")
+    assert tuning_key().endswith(":int8|cpu")
@@ -0,0 +1,228 @@
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from image_recommender.data.embedding_store import EmbeddingStore
+from image_recommender.pipeline import build_embedding_index as build
+from image_recommender.similarity import similarity_embedding as se
+from image_recommender.similarity.similarity_embedding import EMBEDDING_DIM
+from image_recommender.tools.export_torchscript import export_image_encoder
+
+
+def fake_embed(images):
+    # Deterministic stand-in for CLIP: embedding derived from pixel content
+    rows = []
+    for img in images:
+        rng = np.random.default_rng(sum(img.getpixel((0, 0))))
+        v = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        rows.append(v / np.linalg.norm(v))
+    return torch.from_numpy(np.stack(rows))
+
+
+def make_corpus(tmp_path, n, broken=()):
+    rows = []
+    for i in range(n):
+        path = tmp_path / "imgs" / f"{i}.png"
+        path.parent.mkdir(exist_ok=True)
+        if i in broken:
+            path.write_text("broken")
+        else:
+            Image.new("RGB", (40, 40), (i, 2 * i, 3 * i)).save(path)
+        rows.append((f"{i:064x}", str(path)))
+    return rows
+
+
+def setup_build(tmp_path, monkeypatch, rows):
+    monkeypatch.setattr(build, "compute_clip_embeddings_batch", fake_embed)
+    monkeypatch.setattr(build, "get_all_images_from_db", lambda: list(rows))
+    monkeypatch.setattr(build, "BATCH_SIZE", 4)
+    monkeypatch.setattr(build, "load_tuned_batch_size", lambda: None)
+    out = tmp_path / "out"
+    return str(out / "clip_index.ann"), str(out / "index_to_id.json")
+
+
+def test_incremental_build_embeds_only_new_images(tmp_path, monkeypatch):
+    rows = make_corpus(tmp_path, 12, broken={5})
+    index_path, mapping_path = setup_build(tmp_path, monkeypatch, rows[:8])
+
+    first = build.build_and_save_embeddings(index_path, mapping_path, workers=2)
+    assert (first["embedded"], first["skipped"], first["failed"]) == (7, 0, 1)
+
+    monkeypatch.setattr(build, "get_all_images_from_db", lambda: list(rows))
+    second = build.build_and_save_embeddings(
+        index_path, mapping_path, workers=2, incremental=True
+    )
+    assert second["mode"] == "incremental"
+    assert (second["embedded"], second["skipped"], second["failed"]) == (4, 7, 1)
+
+    store = EmbeddingStore(build.default_embeddings_path(index_path))
+    expected_ids = [image_id for i, (image_id, _) in enumerate(rows) if i != 5]
+    assert store.image_ids() == expected_ids
+
+    with open(mapping_path) as f:
+        assert len(json.load(f)) == 11
+
+    runs_file = tmp_path / "out" / build.BUILD_RUNS_FILE
+    runs = [json.loads(line) for line in runs_file.read_text().splitlines()]
+    assert [r["mode"] for r in runs] == ["full", "incremental"]
+
+
+def read_artifacts(index_path, mapping_path):
+    store_path = build.default_embeddings_path(index_path)
+    return [
+        open(p, "rb").read()
+        for p in (
+            index_path,
+            mapping_path,
+            store_path + ".vectors",
+            store_path + ".ids",
+        )
+    ]
+
+
+def test_resume_after_crash_matches_uninterrupted_build(tmp_path, monkeypatch):
+    rows = make_corpus(tmp_path, 30, broken={9})
+
+    ref_index, ref_mapping = setup_build(tmp_path / "ref", monkeypatch, rows)
+    build.build_and_save_embeddings(ref_index, ref_mapping, workers=2)
+
+    index_path, mapping_path = setup_build(tmp_path / "crash", monkeypatch, rows)
+    calls = {"n": 0}
+
+    def crashing_embed(images):
+        calls["n"] += 1
+        if calls["n"] == 5:
+            raise KeyboardInterrupt
+        return fake_embed(images)
+
+    monkeypatch.setattr(build, "compute_clip_embeddings_batch", crashing_embed)
+    with pytest.raises(KeyboardInterrupt):
+        build.build_and_save_embeddings(
+            index_path, mapping_path, workers=2, checkpoint_every=3
+        )
+
+    store_path = build.default_embeddings_path(index_path)
+    with open(build.checkpoint_path(store_path)) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["rows"] == 16  # four whole batches survived the crash
+
+    monkeypatch.setattr(build, "compute_clip_embeddings_batch", fake_embed)
+    run = build.build_and_save_embeddings(
+        index_path, mapping_path, workers=2, resume=True
+    )
+    assert run["resumed_at"] == checkpoint["cursor"]
+    assert not (tmp_path / "crash" / "out" / "clip_embeddings.checkpoint.json").exists()
+    assert read_artifacts(index_path, mapping_path) == read_artifacts(
+        ref_index, ref_mapping
+    )
+
+    # the build finished: a second --resume must not redo it as a full build
+    store = tmp_path / "crash" / "out" / "clip_embeddings.vectors"
+    mtime = store.stat().st_mtime_ns
+    with pytest.raises(FileNotFoundError):
+        build.build_and_save_embeddings(
+            index_path, mapping_path, workers=2, resume=True
+        )
+    assert store.stat().st_mtime_ns == mtime
+
+
+def test_interrupt_right_after_append_does_not_duplicate_rows(tmp_path, monkeypatch):
+    rows = make_corpus(tmp_path, 20)
+
+    ref_index, ref_mapping = setup_build(tmp_path / "ref", monkeypatch, rows)
+    build.build_and_save_embeddings(ref_index, ref_mapping, workers=2)
+
+    class InterruptedWriter(build.EmbeddingStoreWriter):
+        appends = 0
+
+        def append(self, ids, vectors):
+            super().append(ids, vectors)
+            InterruptedWriter.appends += 1
+            if InterruptedWriter.appends == 3:
+                raise KeyboardInterrupt  # rows written, cursor not yet moved
+
+    index_path, mapping_path = setup_build(tmp_path / "crash", monkeypatch, rows)
+    monkeypatch.setattr(build, "EmbeddingStoreWriter", InterruptedWriter)
+    with pytest.raises(KeyboardInterrupt):
+        build.build_and_save_embeddings(index_path, mapping_path, workers=2)
+
+    store_path = build.default_embeddings_path(index_path)
+    with open(build.checkpoint_path(store_path)) as f:
+        checkpoint = json.load(f)
+    assert (checkpoint["cursor"], checkpoint["rows"]) == (8, 8)
+
+    monkeypatch.undo()
+    setup_build(tmp_path / "crash", monkeypatch, rows)
+    build.build_and_save_embeddings(index_path, mapping_path, workers=2, resume=True)
+    assert read_artifacts(index_path, mapping_path) == read_artifacts(
+        ref_index, ref_mapping
+    )
+
+
+def test_auto_batch_size_falls_back_when_no_sample_decodes(tmp_path, monkeypatch):
+    rows = make_corpus(tmp_path, 8, broken={0, 1, 2, 3})
+    index_path, mapping_path = setup_build(tmp_path, monkeypatch, rows)
+    monkeypatch.setattr(build, "AUTOTUNE_SAMPLE", 2)  # sample rows 0-3 only
+    monkeypatch.setattr(
+        build, "save_tuned_batch_size", lambda *a: pytest.fail("nothing was tuned")
+    )
+
+    run = build.build_and_save_embeddings(
+        index_path, mapping_path, workers=2, batch_size="auto"
+    )
+    assert (run["embedded"], run["failed"]) == (4, 4)
+
+
+def test_low_memory_build_writes_the_same_index_and_mapping(tmp_path, monkeypatch):
+    rows = make_corpus(tmp_path, 20)
+    ref_index, ref_mapping = setup_build(tmp_path / "ref", monkeypatch, rows)
+    build.build_and_save_embeddings(ref_index, ref_mapping, workers=2)
+
+    monkeypatch.setattr(build, "INDEX_CHUNK_ROWS", 7)  # several chunks
+    index_path = str(tmp_path / "low" / "clip_index.ann")
+    mapping_path = str(tmp_path / "low" / "index_to_id.json")
+    stats = build.build_index_from_store(
+        build.default_embeddings_path(ref_index),
+        index_path,
+        mapping_path,
+        low_memory=True,
+    )
+
+    assert stats["peak_rss_mb"] > 0
+    assert not os.path.exists(index_path + ".tmp")
+    assert open(index_path, "rb").read() == open(ref_index, "rb").read()
+    with open(mapping_path) as f, open(ref_mapping) as g:
+        assert f.read() == g.read()
+
+
+def test_torchscript_build_uses_the_artifact_dim_and_model(tmp_path, monkeypatch):
+    torch.manual_seed(0)
+    visual = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, 8, stride=8),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(4, 24),
+    ).eval()
+    artifact = str(tmp_path / "encoder.ts")
+    export_image_encoder(visual, artifact, 16, [0.5] * 3, [0.25] * 3, {"model": "RN50"})
+
+    rows = make_corpus(tmp_path, 6)
+    index_path, mapping_path = setup_build(tmp_path, monkeypatch, rows)
+    monkeypatch.setattr(se, "_default_backend", "eager")
+    monkeypatch.setattr(se, "TORCHSCRIPT_PATH", artifact)
+    se.set_encoder_backend("torchscript")  # selected after import, as main() does
+    monkeypatch.setattr(
+        build,
+        "compute_clip_embeddings_batch",
+        lambda imgs: se.compute_clip_embeddings_batch(imgs, backend="torchscript"),
+    )
+
+    build.build_and_save_embeddings(index_path, mapping_path, workers=1)
+    store = EmbeddingStore(build.default_embeddings_path(index_path))
+    assert store.dim == 24
+    # the artifact's model, not MODEL_NAME (ViT-B/32)
+    assert store.model == "RN50:torchscript"
@@ -7,6 +7,7 @@ from image_recommender.similarity.similarity_embedding import (
     compute_clip_embeddings_batch,
     EMBEDDING_DIM,
     get_clip_model,
+    get_encoder_id,
 )
 
 
@@ -42,3 +43,20 @@ def test_norm_is_one():
     embs = compute_clip_embeddings_batch(make_imgs()).numpy()
     norms = np.linalg.norm(embs, axis=1)
     assert np.allclose(norms, 1.0, atol=1e-6, rtol=1e-6)
+
+
+def test_int8_backend_agrees_with_fp32():
+    imgs = make_imgs()
+    fp32 = compute_clip_embeddings_batch(imgs, backend="eager").numpy()
+    int8 = compute_clip_embeddings_batch(imgs, backend="int8").numpy()
+    assert int8.shape == fp32.shape
+    cos = np.sum(fp32 * int8, axis=1)
+    assert np.all(cos > 0.95)
+
+
+def test_int8_backend_is_a_separate_model():
+    m_fp32, _ = get_clip_model(backend="eager")
+    m_int8, _ = get_clip_model(backend="int8")
+    assert m_fp32 is not m_int8
+    assert get_clip_model(backend="int8")[0] is m_int8
+    assert get_encoder_id(backend="int8") != get_encoder_id(backend="eager")
@@ -1,9 +1,16 @@
+import subprocess
+import sys
+import threading
+
 import numpy as np
 import torch
 from PIL import Image
 import clip
 
-from image_recommender.similarity.similarity_embedding import get_clip_model
+from image_recommender.similarity.similarity_embedding import (
+    get_clip_model,
+    EMBEDDING_DIM,
+)
 
 
 def test_same_object_identity():
@@ -37,3 +44,36 @@ def test_embeddings_equal(tmp_path):
 
     # Same numerical result within tolerance
     assert np.allclose(fresh_emb, cached_emb, atol=1e-6)
+
+
+def test_concurrent_callers_share_one_model():
+    results = []
+
+    def worker():
+        results.append(get_clip_model())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(m is results[0][0] for m, _ in results)
+
+
+def test_embedding_dim_matches_model():
+    model, _ = get_clip_model()
+    assert EMBEDDING_DIM == model.visual.output_dim
+
+
+def test_import_does_not_load_model():
+    # Fresh interpreter: importing the module and reading EMBEDDING_DIM
+    # must not trigger clip.load
+    code = (
+        "import image_recommender.similarity.similarity_embedding as se\n"
+        "se.EMBEDDING_DIM\n"
+        "print(se.is_clip_model_loaded())"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "False"
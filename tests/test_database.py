@@ -42,3 +42,26 @@ def test_insert_and_get_image(tmp_path, monkeypatch):
 
     # Querying non-existent ID should return None
     assert database.get_image_by_id("does_not_exist") is None
+
+
+def test_phash_column_migration_and_lookup(tmp_path, monkeypatch):
+    db_file = tmp_path / "old.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_file))
+    # database created before the phash column existed
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE images (id TEXT PRIMARY KEY, path TEXT NOT NULL, "
+        "width INTEGER, height INTEGER);"
+    )
+    conn.execute("INSERT INTO images VALUES ('old', '/old.jpg', 1, 1);")
+    conn.commit()
+    conn.close()
+
+    database.create_table()
+    database.insert_image_data("new", "/new.jpg", 2, 2, phash=-(2**63))
+    assert database.get_phashes_by_ids(["old", "new"]) == {"new": -(2**63)}
+    assert list(database.iter_missing_phashes()) == [[("old", "/old.jpg")]]
+
+    database.update_phashes([("old", 2**63 - 1)])
+    assert database.get_phashes_by_ids(["old"]) == {"old": 2**63 - 1}
+    assert list(database.iter_missing_phashes()) == []
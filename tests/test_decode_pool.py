@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image
+
+from image_recommender.pipeline.decode_pool import StageStats, iter_decoded_batches
+
+
+def make_rows(tmp_path, n, broken=()):
+    rows = []
+    for i in range(n):
+        path = tmp_path / f"img_{i}.png"
+        if i in broken:
+            path.write_text("not an image")
+        else:
+            Image.new("RGB", (32, 32), (i * 10 % 256, 0, 0)).save(path)
+        rows.append((f"id{i}", str(path)))
+    return rows
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_batches_keep_order_and_skip_failures(tmp_path, use_processes):
+    rows = make_rows(tmp_path, 11, broken={3, 7})
+    stats = StageStats()
+
+    batches = list(
+        iter_decoded_batches(
+            rows, batch_size=4, workers=2, use_processes=use_processes, stats=stats
+        )
+    )
+
+    ids = [i for batch_ids, _, _ in batches for i in batch_ids]
+    assert ids == [f"id{i}" for i in range(11) if i not in (3, 7)]
+    assert [len(imgs) for _, imgs, _ in batches] == [4, 4, 1]
+    assert all(img.size == (224, 224) for _, imgs, _ in batches for img in imgs)
+    # rows consumed includes failed decodes
+    assert [consumed for _, _, consumed in batches] == [5, 10, 11]
+    assert stats.failed == 2
+    assert stats.items["decode"] == 9
+
+
+def test_consumer_can_stop_early(tmp_path):
+    rows = make_rows(tmp_path, 20)
+    gen = iter_decoded_batches(rows, batch_size=2, workers=2, prefetch_batches=1)
+    first = next(gen)
+    gen.close()  # must not hang on the bounded queue
+    assert first[0] == ["id0", "id1"]
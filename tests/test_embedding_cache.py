@@ -0,0 +1,61 @@
+import numpy as np
+from PIL import Image
+
+from image_recommender.similarity.embedding_cache import QueryEmbeddingCache
+
+
+def save_image(path, color):
+    Image.new("RGB", (16, 16), color).save(path)
+    return str(path)
+
+
+def counting_compute(value):
+    calls = {"n": 0}
+
+    def compute():
+        calls["n"] += 1
+        return np.full(4, value, dtype=np.float32)
+
+    return compute, calls
+
+
+def test_same_content_hits_and_model_is_part_of_key(tmp_path):
+    a = save_image(tmp_path / "a.png", (1, 2, 3))
+    a_copy = save_image(tmp_path / "copy_of_a.png", (1, 2, 3))
+    cache = QueryEmbeddingCache(max_entries=8)
+    compute, calls = counting_compute(1.0)
+
+    first = cache.get_or_compute(a, compute, "ViT-B/32")
+    again = cache.get_or_compute(a_copy, compute, "ViT-B/32")
+    assert calls["n"] == 1
+    assert np.array_equal(first.numpy(), again.numpy())
+
+    cache.get_or_compute(a, compute, "ViT-B/32:int8")
+    assert calls["n"] == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_lru_bound(tmp_path):
+    cache = QueryEmbeddingCache(max_entries=2)
+    paths = [save_image(tmp_path / f"{i}.png", (i, 0, 0)) for i in range(3)]
+    compute, calls = counting_compute(0.5)
+    for p in paths:
+        cache.get_or_compute(p, compute, "m")
+    assert cache.stats()["entries"] == 2
+
+    cache.get_or_compute(paths[0], compute, "m")  # evicted → recomputed
+    assert calls["n"] == 4
+
+
+def test_disk_store_survives_new_process_cache(tmp_path):
+    p = save_image(tmp_path / "q.png", (9, 9, 9))
+    disk = str(tmp_path / "cache")
+    compute, calls = counting_compute(2.0)
+
+    QueryEmbeddingCache(disk_dir=disk).get_or_compute(p, compute, "m")
+    fresh = QueryEmbeddingCache(disk_dir=disk)
+    emb = fresh.get_or_compute(p, compute, "m")
+
+    assert calls["n"] == 1
+    assert fresh.stats()["disk_hits"] == 1
+    assert np.allclose(emb.numpy(), 2.0)
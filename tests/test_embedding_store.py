@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pytest
+
+from image_recommender.data.embedding_store import (
+    EmbeddingStore,
+    EmbeddingStoreWriter,
+    store_exists,
+)
+from image_recommender.pipeline.build_embedding_index import build_index_from_store
+from image_recommender.similarity.similarity_embedding import load_annoy_index
+
+
+def make_rows(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    ids = [f"{i:064x}" for i in range(n)]
+    return ids, vecs
+
+
+def test_write_and_memmap_roundtrip(tmp_path):
+    path = str(tmp_path / "emb")
+    ids, vecs = make_rows(10)
+    with EmbeddingStoreWriter(path, dim=8) as w:
+        w.append(ids[:4], vecs[:4])
+        w.append(ids[4:], vecs[4:])
+
+    assert store_exists(path)
+    store = EmbeddingStore(path)
+    assert isinstance(store.vectors, np.memmap)
+    assert store.vectors.shape == (10, 8)
+    assert np.array_equal(store.vectors, vecs)
+    assert store.image_ids() == ids
+    assert store.image_id(3) == ids[3]
+
+
+def test_float16_store(tmp_path):
+    path = str(tmp_path / "emb16")
+    ids, vecs = make_rows(5)
+    with EmbeddingStoreWriter(path, dim=8, dtype="float16") as w:
+        w.append(ids, vecs)
+
+    store = EmbeddingStore(path)
+    assert store.vectors.dtype == np.float16
+    assert np.allclose(store.vectors, vecs, atol=1e-3)
+
+
+def test_append_discards_unflushed_tail(tmp_path):
+    path = str(tmp_path / "emb")
+    ids, vecs = make_rows(6)
+    w = EmbeddingStoreWriter(path, dim=8)
+    w.append(ids[:3], vecs[:3])
+    w.flush()
+    w.append(ids[3:5], vecs[3:5])  # never flushed, simulates a crash
+    w._vec_file.close()
+    w._ids_file.close()
+
+    assert len(EmbeddingStore(path)) == 3
+
+    with EmbeddingStoreWriter(path, dim=8, append=True) as w2:
+        w2.append(ids[3:], vecs[3:])
+
+    store = EmbeddingStore(path)
+    assert store.image_ids() == ids
+    assert np.array_equal(store.vectors, vecs)
+
+
+def test_empty_store_and_dim_mismatch(tmp_path):
+    path = str(tmp_path / "emb")
+    EmbeddingStoreWriter(path, dim=8).close()
+    assert EmbeddingStore(path).vectors.shape == (0, 8)
+
+    with pytest.raises(ValueError):
+        EmbeddingStoreWriter(path, dim=4, append=True)
+
+
+def test_append_rejects_wrong_dim(tmp_path):
+    path = str(tmp_path / "emb")
+    ids, vecs = make_rows(3, dim=8)
+    with EmbeddingStoreWriter(path, dim=8) as writer:
+        writer.append(ids[:2], vecs[:2])
+        with pytest.raises(ValueError):
+            writer.append(ids[2:], np.zeros((1, 4), dtype=np.float32))
+
+    store = EmbeddingStore(path)
+    assert len(store) == 2
+    np.testing.assert_array_equal(store.vectors, vecs[:2])
+
+
+def test_build_annoy_index_from_store(tmp_path):
+    path = str(tmp_path / "emb")
+    ids, vecs = make_rows(20, dim=512)
+    with EmbeddingStoreWriter(path, dim=512) as w:
+        w.append(ids, vecs)
+
+    index_path = tmp_path / "out" / "index.ann"
+    mapping_path = tmp_path / "out" / "index_to_id.json"
+    build_index_from_store(path, str(index_path), str(mapping_path), n_trees=5)
+
+    index = load_annoy_index(str(index_path))
+    assert index.get_n_items() == 20
+    assert index.get_nns_by_vector(vecs[7].tolist(), 1) == [7]
+    with open(mapping_path) as f:
+        assert json.load(f)["7"] == ids[7]
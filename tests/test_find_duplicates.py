@@ -0,0 +1,119 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from image_recommender.data import database
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.pipeline import find_duplicates
+from image_recommender.similarity.similarity_phash import hamming_distances
+from tests.conftest import flip_bits
+
+
+def brute_force_clusters(hashes, max_distance):
+    uf = find_duplicates.UnionFind(len(hashes))
+    dist = hamming_distances(hashes, hashes)
+    for a, b in zip(*np.nonzero(np.triu(dist <= max_distance, k=1))):
+        uf.union(int(a), int(b))
+    return uf.groups()
+
+
+def make_corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.create_table()
+    rng = np.random.default_rng(0)
+    hashes = list(rng.integers(-(2**63), 2**63 - 1, 400, dtype=np.int64))
+    for base in hashes[:40]:  # near-duplicates at 0..7 bits
+        hashes.append(flip_bits(rng, int(base), int(rng.integers(0, 8))))
+    ids = [f"{i:064x}" for i in range(len(hashes))]
+    for i, (image_id, h) in enumerate(zip(ids, hashes)):
+        database.insert_image_data(image_id, f"/img{i}.jpg", 1, 1, phash=int(h))
+    return ids, np.array(hashes, dtype=np.int64)
+
+
+def test_clusters_match_brute_force(tmp_path, monkeypatch):
+    ids, hashes = make_corpus(tmp_path, monkeypatch)
+    expected = [[ids[r] for r in g] for g in brute_force_clusters(hashes, 6)]
+
+    stats = find_duplicates.find_duplicate_clusters(max_distance=6, workers=1)
+    assert stats["clusters"] == len(expected) > 0
+    # each image pair once, whatever number of bands it was found in
+    dist = hamming_distances(hashes, hashes)
+    assert stats["pairs"] == int(np.triu(dist <= 6, k=1).sum())
+    for members in expected:
+        assert database.get_duplicate_cluster(members[0]) == sorted(members)
+    clustered = {i for m in expected for i in m}
+    loner = next(i for i in ids if i not in clustered)
+    assert database.get_duplicate_cluster(loner) == []
+
+    # process pool and 8 bands give the same clusters
+    stats = find_duplicates.find_duplicate_clusters(
+        max_distance=6, n_bands=8, workers=2
+    )
+    assert stats["clusters"] == len(expected)
+    for members in expected:
+        assert database.get_duplicate_cluster(members[-1]) == sorted(members)
+
+
+def test_clip_threshold_splits_clusters(tmp_path, monkeypatch):
+    ids, hashes = make_corpus(tmp_path, monkeypatch)
+    pairs = brute_force_clusters(hashes, 6)
+    # embeddings: every image orthogonal to all others except the first cluster
+    dim = len(ids)
+    vectors = np.eye(dim, dtype=np.float32)
+    first = pairs[0]
+    vectors[first] = vectors[first[0]]
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, dim) as w:
+        w.append(ids, vectors)
+
+    stats = find_duplicates.find_duplicate_clusters(
+        max_distance=6, workers=1, clip_threshold=0.9, embeddings_path=store
+    )
+    assert stats["clusters"] == 1
+    assert database.get_duplicate_cluster(ids[first[0]]) == sorted(
+        ids[r] for r in first
+    )
+
+
+def test_clip_threshold_checks_every_image_pair(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.create_table()
+    rng = np.random.default_rng(3)
+    h = int(rng.integers(-(2**63), 2**63 - 1))
+    near = flip_bits(rng, h, 3)
+    # hash h: a, b, c (b unlike a and c); hash near: d (no embedding), e like a
+    rows = [("a", h), ("b", h), ("c", h), ("d", near), ("e", near)]
+    ids = [name * 64 for name, _ in rows]
+    for i, (image_id, (_, phash)) in enumerate(zip(ids, rows)):
+        database.insert_image_data(image_id, f"/img{i}.jpg", 1, 1, phash=phash)
+
+    like_a, unlike = np.eye(2, dtype=np.float32)
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, 2) as w:
+        w.append([ids[0], ids[1], ids[2], ids[4]], [like_a, unlike, like_a, like_a])
+
+    # results must not depend on which image of a hash comes first
+    phash_of = {image_id: phash for image_id, (_, phash) in zip(ids, rows)}
+    for order in (ids, ids[::-1]):
+        monkeypatch.setattr(
+            find_duplicates,
+            "get_all_phashes",
+            lambda o=order: (o, [phash_of[i] for i in o]),
+        )
+        stats = find_duplicates.find_duplicate_clusters(
+            max_distance=6, workers=1, clip_threshold=0.9, embeddings_path=store
+        )
+        assert stats["pairs"] == 3  # a-c, a-e, c-e
+        assert database.get_duplicate_cluster(ids[0]) == sorted(
+            [ids[0], ids[2], ids[4]]
+        )
+        assert database.get_duplicate_cluster(ids[1]) == []
+
+
+def test_job_does_not_import_torch():
+    code = (
+        "import sys, image_recommender.pipeline.find_duplicates; "
+        "sys.exit('torch' in sys.modules)"
+    )
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,32 @@
+import numpy as np
+
+from image_recommender.data.histogram_store import (
+    HistogramStore,
+    load_histogram_store,
+    open_histogram_writer,
+    stored_histogram_ids,
+)
+
+
+def test_lookup_by_image_id(tmp_path):
+    path = str(tmp_path / "hist")
+    assert load_histogram_store(path) is None
+
+    rng = np.random.default_rng(0)
+    hists = rng.random((6, 24)).astype(np.float32)
+    ids = [f"{i:064x}" for i in (5, 3, 9, 1, 7, 2)]  # unsorted on purpose
+    with open_histogram_writer(path) as w:
+        w.append(ids[:4], hists[:4])
+    with open_histogram_writer(path) as w:  # appends
+        w.append(ids[4:], hists[4:])
+
+    store = HistogramStore(path)
+    assert len(store) == 6 and store.bins == 8
+    assert stored_histogram_ids(path) == set(ids)
+
+    missing = f"{42:064x}"
+    assert store.rows([ids[2], missing, ids[5]]).tolist() == [2, -1, 5]
+    found = store.lookup([missing, ids[4], ids[0]])
+    assert set(found) == {ids[4], ids[0]}
+    assert np.array_equal(found[ids[4]], hists[4])
+    assert np.array_equal(found[ids[0]], hists[0])
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+
+from image_recommender.data.id_mapping import (
+    IdMapping,
+    IdMappingWriter,
+    convert_json_mapping,
+    find_mapping,
+    load_id_mapping,
+)
+
+
+def test_digest_mapping_round_trip(tmp_path):
+    ids = [f"{i:064x}" for i in range(5)] + ["00" * 31 + "ff", "ab" + "00" * 31]
+    path = str(tmp_path / "index_to_id.idmap")
+    with IdMappingWriter(path) as w:
+        w.add(ids[:3])
+        w.add(iter(ids[3:]))
+
+    mapping = load_id_mapping(path)
+    assert isinstance(mapping, IdMapping)
+    assert len(mapping) == len(ids)
+    assert [mapping[i] for i in range(len(ids))] == ids  # trailing zero bytes kept
+    assert mapping[np.int64(2)] == ids[2]
+    assert 6 in mapping and 7 not in mapping
+    assert mapping.get(7) is None
+    with pytest.raises(KeyError):
+        mapping[-1]
+
+    # 32 bytes per ID plus the header
+    assert (tmp_path / "index_to_id.idmap").stat().st_size == 32 + 32 * len(ids)
+
+
+def test_convert_json_mapping(tmp_path):
+    digests = {str(i): f"{i + 1:064x}" for i in range(4)}
+    json_path = tmp_path / "index_to_id.json"
+    json_path.write_text(json.dumps(digests))
+    out = str(tmp_path / "index_to_id.idmap")
+
+    assert convert_json_mapping(str(json_path), out) == 4
+    mapping = IdMapping(out)
+    assert mapping.kind == "digest"
+    assert dict(mapping.items()) == load_id_mapping(str(json_path))
+
+    # non-hash IDs fall back to fixed-width ASCII records
+    json_path.write_text(json.dumps({"0": "a.jpg", "1": "dir/bb.png"}))
+    convert_json_mapping(str(json_path), out)
+    mapping = IdMapping(out)
+    assert mapping.kind == "ascii" and mapping[1] == "dir/bb.png"
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    path = str(tmp_path / "m.idmap")
+    with pytest.raises(ValueError):
+        with IdMappingWriter(path) as w:
+            w.add(["not-a-digest"])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_find_mapping_falls_back_to_json(tmp_path):
+    binary, legacy = tmp_path / "index_to_id.idmap", tmp_path / "index_to_id.json"
+    assert find_mapping(str(tmp_path)) == str(binary)  # nothing built yet
+
+    legacy.write_text(json.dumps({"0": "a"}))
+    assert find_mapping(str(tmp_path)) == str(legacy)
+
+    convert_json_mapping(str(legacy), str(binary))
+    assert find_mapping(str(tmp_path)) == str(binary)
@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.data.id_mapping import load_id_mapping
+from image_recommender.pipeline import index_versions as iv
+from image_recommender.pipeline.build_embedding_index import build_index_version
+from image_recommender.pipeline.search_pipeline import _load_index_and_mapping
+
+
+def write_store(path, n, seed):
+    v = np.random.default_rng(seed).standard_normal((n, 8)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    with EmbeddingStoreWriter(str(path), 8, model="test-model") as w:
+        w.append([f"{seed:02d}{i:062x}" for i in range(n)], v)
+    return str(path)
+
+
+def test_publish_writes_manifest_and_switches_current(tmp_path):
+    root = str(tmp_path / "index")
+    first = build_index_version(write_store(tmp_path / "a", 10, 1), root, n_trees=3)
+
+    index_path, mapping_path, manifest = iv.resolve_version(root)
+    assert iv.current_version(root) == first["version"]
+    assert (manifest["model"], manifest["dim"], manifest["count"]) == (
+        "test-model",
+        8,
+        10,
+    )
+    assert manifest["build"]["n_trees"] == 3
+    assert set(manifest["files"]) == {"clip_index.ann", "index_to_id.idmap"}
+    assert iv.verify_version(tmp_path / "index" / first["version"])
+
+    second = build_index_version(
+        write_store(tmp_path / "b", 12, 2), root, keep_versions=1
+    )
+    assert iv.current_version(root) == second["version"]
+    assert not (tmp_path / "index" / first["version"]).exists()  # pruned
+    assert not list((tmp_path / "index").glob(iv.STAGING_PREFIX + "*"))
+
+    # tampering is detected
+    with open(iv.resolve_version(root)[1], "a") as f:
+        f.write(" ")
+    assert not iv.verify_version(tmp_path / "index" / second["version"])
+
+
+def test_versioned_index_hot_swaps_in_background(tmp_path):
+    root = str(tmp_path / "index")
+    build_index_version(write_store(tmp_path / "a", 10, 1), root)
+    handle = iv.VersionedIndex(root, _load_index_and_mapping, poll_interval=0)
+
+    v1, index, mapping, _ = handle.get()
+    assert len(index) == 10 and len(mapping) == 10
+
+    v2 = build_index_version(write_store(tmp_path / "b", 12, 2), root)["version"]
+    # the first call after publishing still serves v1 while v2 preloads
+    deadline = time.monotonic() + 10
+    while handle.get()[0] != v2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    version, index, mapping, manifest = handle.get()
+    assert version == v2 and manifest["count"] == 12
+    assert len(index) == 12 and mapping[0].startswith("02")  # matching pair
+    assert load_id_mapping(iv.resolve_version(root, v1)[1])[0].startswith("01")
+
+
+def test_ivfpq_version_reranks_from_its_own_store_copy(tmp_path):
+    root = str(tmp_path / "index")
+    store = write_store(tmp_path / "emb", 40, 1)
+    build_index_version(
+        store, root, index_file="clip_index.ivfpq", nlist=2, m=2, rerank=4
+    )
+    index_path, mapping_path, manifest = iv.resolve_version(root)
+    assert "rerank_embeddings.vectors" in manifest["files"]
+
+    query = np.random.default_rng(7).standard_normal(8).astype(np.float32)
+    index, _ = _load_index_and_mapping(index_path, mapping_path, manifest)
+    before = index.search(query, 5)
+
+    # the next build rewrites the shared store under the published version
+    write_store(tmp_path / "emb", 40, 2)
+    index, _ = _load_index_and_mapping(index_path, mapping_path, manifest)
+    assert index.search(query, 5) == before
+    assert iv.verify_version(tmp_path / "index" / manifest["version"])
+
+
+def test_hot_swap_closes_the_old_index(tmp_path):
+    class ClosingIndex:
+        def __init__(self, path):
+            self.path, self.closed = path, False
+
+        def close(self):
+            self.closed = True
+
+    root = str(tmp_path / "index")
+    build_index_version(write_store(tmp_path / "a", 10, 1), root)
+    handle = iv.VersionedIndex(
+        root, lambda index_path, *_: (ClosingIndex(index_path), None)
+    )
+    _, old, _, _ = handle.get()
+
+    build_index_version(write_store(tmp_path / "b", 12, 2), root)
+    handle.check(wait=True)
+    _, new, _, _ = handle.get()
+    assert new is not old
+    assert old.closed and not new.closed
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.similarity.ivfpq_index import IVFPQVectorIndex, kmeans
+from image_recommender.similarity.vector_index import load_vector_index
+
+
+def clustered_vectors(n, dim=32, clusters=20, seed=0):
+    # Embeddings are clustered, not uniform; PQ relies on that structure
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    v = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, dim))
+    v = v.astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def recall(found, vecs, queries, k):
+    truth = np.argsort(-(queries @ vecs.T), axis=1)[:, :k]
+    hits = [len(set(f) & set(t)) for f, t in zip(found, truth.tolist())]
+    return sum(hits) / (k * len(queries))
+
+
+def test_kmeans_separates_obvious_clusters():
+    x = np.concatenate([np.zeros((50, 2)), np.full((50, 2), 10.0)]).astype(np.float32)
+    centroids = kmeans(x, 2, seed=3)
+    assert sorted(centroids[:, 0].round(3).tolist()) == [0.0, 10.0]
+
+
+def test_ivfpq_recall_with_rerank_from_store(tmp_path):
+    vecs = clustered_vectors(3000)
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, 32) as w:
+        w.append([f"{i:064x}" for i in range(len(vecs))], vecs)
+
+    path = str(tmp_path / "index.ivfpq")
+    index = IVFPQVectorIndex(nprobe=8).build(vecs, nlist=32, m=8, store_path=store)
+    index.save(path)
+    assert index.memory_bytes() < vecs.nbytes / 2
+
+    loaded = load_vector_index(path)
+    assert isinstance(loaded, IVFPQVectorIndex)
+    assert len(loaded) == 3000 and loaded.rerank_vectors is not None
+
+    queries = clustered_vectors(20, seed=1)
+    ids, dists = loaded.batch_search(queries, 10)
+    assert recall(ids, vecs, queries, 10) >= 0.9
+    # re-ranked distances are exact angular distances
+    cos = (vecs[ids[0]] @ queries[0]).astype(np.float64)
+    assert np.allclose(dists[0], np.sqrt(2 - 2 * cos), atol=1e-4)
+    assert dists[0] == sorted(dists[0])
+
+    # without the store, ADC order is used and recall degrades gracefully
+    adc_only = load_vector_index(path, rerank=0)
+    ids, _ = adc_only.batch_search(queries, 10)
+    assert recall(ids, vecs, queries, 10) >= 0.5
+
+
+def test_ivfpq_rejects_bad_m():
+    with pytest.raises(ValueError):
+        IVFPQVectorIndex().build(clustered_vectors(100), nlist=4, m=7)
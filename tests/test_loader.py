@@ -7,9 +7,11 @@ from PIL import Image
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from image_recommender.data.loader import (
     load_image,
+    load_preprocessed_image,
     preprocess_image,
     load_images_generator,
     generate_image_id,
+    read_image_size,
 )
 
 
@@ -33,6 +35,26 @@ def test_load_image_and_preprocess(tmp_path):
     assert load_image(str(tmp_path / "no_image.jpg")) is None
 
 
+def test_reduced_resolution_decode(tmp_path):
+    jpg, png = tmp_path / "big.jpg", tmp_path / "big.png"
+    Image.new("RGB", (2000, 1000), (10, 200, 30)).save(jpg)
+    Image.new("RGB", (2000, 1000), (10, 200, 30)).save(png)
+
+    assert read_image_size(str(jpg)) == (2000, 1000)
+    assert read_image_size(str(tmp_path / "missing.jpg")) is None
+
+    # JPEG: decoded at 1/4 scale, the smallest that still covers 224x224
+    draft = load_image(str(jpg), target_size=(224, 224))
+    assert draft.mode == "RGB" and draft.size == (500, 250)
+    # other formats are decoded fully
+    assert load_image(str(png), target_size=(224, 224)).size == (2000, 1000)
+
+    img = load_preprocessed_image(str(jpg))
+    assert img.size == (224, 224)
+    assert img.getpixel((100, 100)) == pytest.approx((10, 200, 30), abs=3)
+    assert load_preprocessed_image(str(tmp_path / "missing.jpg")) is None
+
+
 def test_load_images_generator(tmp_path):
     # Setup directory with various files
     root = tmp_path / "dataset"
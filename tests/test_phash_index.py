@@ -0,0 +1,35 @@
+import numpy as np
+
+from image_recommender.similarity.phash_index import PHashIndex
+from image_recommender.similarity.similarity_phash import hamming_distances
+from tests.conftest import flip_bits
+
+
+def random_hashes(rng, n):
+    return rng.integers(-(2**63), 2**63 - 1, n, dtype=np.int64, endpoint=True)
+
+
+def test_range_search_matches_linear_scan():
+    rng = np.random.default_rng(0)
+    hashes = random_hashes(rng, 5000)
+    query = int(hashes[17])
+    # plant near-duplicates at known distances
+    near = [flip_bits(rng, query, d) for d in (0, 1, 3, 5, 8, 11, 14)]
+    hashes = np.concatenate([hashes, near])
+    index = PHashIndex(hashes, [f"id{i}" for i in range(len(hashes))])
+
+    all_dist = hamming_distances(query, hashes)
+    for d in (0, 2, 4, 8, 12, 16, 20):
+        rows, dist = index.range_search(query, d)
+        expected = np.flatnonzero(all_dist <= d)
+        assert sorted(rows) == expected.tolist()
+        assert dist == sorted(dist) and all(x <= d for x in dist)
+
+    pairs = index.search(query, 8)
+    assert pairs[0] == ("id17", 0) and len(pairs) >= 6
+
+
+def test_empty_index():
+    index = PHashIndex([], [])
+    assert len(index) == 0
+    assert index.range_search(123, 8) == ([], [])
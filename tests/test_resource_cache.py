@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+from image_recommender.pipeline.resource_cache import ResourceCache, file_signature
+
+
+def test_cached_until_file_changes(tmp_path):
+    path = tmp_path / "index.ann"
+    path.write_bytes(b"v1")
+    cache = ResourceCache()
+    loads = []
+
+    def load():
+        loads.append(path.read_bytes())
+        return object()
+
+    first = cache.get("index", [str(path)], load)
+    assert cache.get("index", [str(path)], load) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    path.write_bytes(b"v2-longer")  # size and mtime change
+    second = cache.get("index", [str(path)], load)
+    assert second is not first and loads == [b"v1", b"v2-longer"]
+
+    # same size, new mtime
+    path.write_bytes(b"v3-longer")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.get("index", [str(path)], load) is not second
+
+    cache.invalidate("index")
+    assert "index" not in cache
+
+
+def test_concurrent_gets_load_once(tmp_path):
+    path = tmp_path / "m.idmap"
+    path.write_bytes(b"x")
+    cache = ResourceCache()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.05)
+        return "mapping"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get("m", [str(path)], slow_load))
+        )
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["mapping"] * 8 and len(calls) == 1
+
+
+def test_signature_of_store_prefix(tmp_path):
+    assert file_signature(str(tmp_path / "emb")) is None
+    (tmp_path / "emb.vectors").write_bytes(b"\0" * 8)
+    (tmp_path / "emb.json").write_text("{}")
+    assert len(file_signature(str(tmp_path / "emb"))) == 2
@@ -0,0 +1,180 @@
+import threading
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from image_recommender.data import database, loader
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.pipeline import search_pipeline
+from image_recommender.pipeline.build_embedding_index import build_index_from_store
+from image_recommender.similarity import embedding_cache
+from image_recommender.similarity.similarity_embedding import EMBEDDING_DIM
+
+
+def fake_vector(img):
+    # Deterministic stand-in for CLIP, driven by the mean color
+    mean = np.asarray(img, dtype=np.float32).reshape(-1, 3).mean(axis=0)
+    rng = np.random.default_rng(int(mean.sum()))
+    v = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+    v[:3] += mean / 10.0
+    return v / np.linalg.norm(v)
+
+
+def fake_single(img):
+    return torch.from_numpy(fake_vector(img))
+
+
+def fake_batch(imgs):
+    return torch.from_numpy(np.stack([fake_vector(img) for img in imgs]))
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "db.sqlite"))
+    monkeypatch.setattr(search_pipeline, "HISTOGRAM_PATH", str(tmp_path / "hist"))
+    monkeypatch.setattr(embedding_cache, "compute_clip_embedding", fake_single)
+    monkeypatch.setattr(embedding_cache, "compute_clip_embeddings_batch", fake_batch)
+    monkeypatch.setattr(
+        embedding_cache, "query_embedding_cache", embedding_cache.QueryEmbeddingCache()
+    )
+    database.create_table()
+
+    rng = np.random.default_rng(1)
+    paths, ids, vecs = [], [], []
+    for i in range(30):
+        arr = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+        arr[..., i % 3] = (i * 8) % 256
+        path = tmp_path / f"img{i}.png"
+        Image.fromarray(arr).save(path)
+        image_id = f"{i:064x}"
+        database.insert_image_data(image_id, str(path), 32, 32)
+        img = search_pipeline._load_query_image(str(path))
+        paths.append(str(path))
+        ids.append(image_id)
+        vecs.append(fake_vector(img))
+
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, EMBEDDING_DIM) as w:
+        w.append(ids, np.stack(vecs))
+    index_path, mapping_path = str(tmp_path / "i.ann"), str(tmp_path / "m.json")
+    build_index_from_store(store, index_path, mapping_path, n_trees=5)
+    return paths, index_path, mapping_path
+
+
+def test_batch_search_matches_single_queries(corpus):
+    paths, index_path, mapping_path = corpus
+    query_sets = [paths[0], [paths[1], paths[2]], paths[0], ["/missing.jpg"]]
+
+    batch = search_pipeline.batch_similarity_search(
+        query_sets, index_path, mapping_path, k_clip=10, top_k_result=3
+    )
+
+    assert len(batch) == 4
+    assert batch[3] == []
+    for qs, result in zip(query_sets[:3], batch):
+        single = search_pipeline.combined_similarity_search(
+            qs, index_path, mapping_path, k_clip=10, top_k_result=3
+        )
+        assert [p for p, _ in result] == [p for p, _ in single]
+        assert np.allclose([s for _, s in result], [s for _, s in single], atol=1e-5)
+
+    # the query image itself is its own best match
+    assert batch[0][0][0] == paths[0]
+
+
+def test_batch_search_embeds_queries_in_one_pass(corpus, monkeypatch):
+    paths, index_path, mapping_path = corpus
+    calls = []
+
+    def counting_batch(imgs):
+        calls.append(len(imgs))
+        return fake_batch(imgs)
+
+    monkeypatch.setattr(
+        embedding_cache, "compute_clip_embeddings_batch", counting_batch
+    )
+    search_pipeline.batch_similarity_search(
+        [paths[3], [paths[4], paths[3]], paths[5]], index_path, mapping_path
+    )
+    assert calls == [3]  # distinct query images, one forward pass
+
+
+def test_stored_features_give_same_ranking_without_decoding(corpus, monkeypatch):
+    paths, index_path, mapping_path = corpus
+    before = search_pipeline.combined_similarity_search(
+        paths[6], index_path, mapping_path, k_clip=10, top_k_result=5
+    )
+
+    assert loader.backfill_phashes() == 30
+    assert (
+        loader.backfill_histograms(histogram_path=search_pipeline.HISTOGRAM_PATH) == 30
+    )
+    # already stored rows are skipped
+    assert (
+        loader.backfill_histograms(histogram_path=search_pipeline.HISTOGRAM_PATH) == 0
+    )
+
+    def no_decode(*args):
+        raise AssertionError("candidate decoded for a stored feature")
+
+    monkeypatch.setattr(search_pipeline, "_load_candidate_features", no_decode)
+    after = search_pipeline.combined_similarity_search(
+        paths[6], index_path, mapping_path, k_clip=10, top_k_result=5
+    )
+    batch = search_pipeline.batch_similarity_search(
+        [paths[6]], index_path, mapping_path, k_clip=10, top_k_result=5
+    )
+    for result in (after, batch[0]):
+        assert [p for p, _ in result] == [p for p, _ in before]
+        assert np.allclose([s for _, s in result], [s for _, s in before])
+
+
+def test_near_duplicate_search_uses_stored_hashes(corpus):
+    paths, _, _ = corpus
+    assert search_pipeline.near_duplicate_search(paths[4]) == []  # nothing stored
+
+    loader.backfill_phashes()
+    results = search_pipeline.near_duplicate_search([paths[4]], max_distance=64)
+    assert results[0] == (paths[4], 0)
+    assert len(results) == 30
+    assert [d for _, d in results] == sorted(d for _, d in results)
+    assert len(search_pipeline.near_duplicate_search(paths[4], 64, top_k_result=3)) == 3
+
+
+def test_concurrent_searches_keep_their_own_search_k(corpus, monkeypatch):
+    paths, index_path, mapping_path = corpus
+    index, _ = search_pipeline._load_clip_index(index_path, mapping_path)
+    default = index.search_k
+    real = index.annoy
+    both_searching = threading.Barrier(2)
+    seen = {}
+
+    class RecordingAnnoy:
+        def get_nns_by_vector(self, vector, k, search_k, include_distances):
+            both_searching.wait(timeout=10)  # the two searches overlap
+            seen[threading.current_thread().name] = search_k
+            return real.get_nns_by_vector(
+                vector, k, search_k=search_k, include_distances=include_distances
+            )
+
+    monkeypatch.setattr(index, "annoy", RecordingAnnoy())
+
+    def run(search_k):
+        search_pipeline.combined_similarity_search(
+            paths[0], index_path, mapping_path, k_clip=5, search_k=search_k
+        )
+
+    threads = [
+        threading.Thread(target=run, args=(sk,), name=f"sk{sk}") for sk in (7, 500)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert seen == {"sk7": 7, "sk500": 500}
+    # the shared, cached index was not modified
+    assert search_pipeline._load_clip_index(index_path, mapping_path)[0] is index
+    assert index.search_k == default
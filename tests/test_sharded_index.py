@@ -0,0 +1,90 @@
+import json
+import threading
+
+import numpy as np
+
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.pipeline.build_embedding_index import build_index_from_store
+from image_recommender.similarity import sharded_index
+from image_recommender.similarity.sharded_index import ShardedVectorIndex, shard_ranges
+from image_recommender.similarity.vector_index import (
+    ExactVectorIndex,
+    load_vector_index,
+)
+
+
+def unit_vectors(n, dim=16, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_shard_ranges_cover_all_rows():
+    assert shard_ranges(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert shard_ranges(2, 8) == [(0, 1), (1, 2)]
+    assert shard_ranges(0, 4) == [(0, 0)]
+
+
+def test_parallel_shard_build_and_fan_out_merge(tmp_path):
+    vecs = unit_vectors(300)
+    ids = [f"{i:064x}" for i in range(300)]
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, 16) as w:
+        w.append(ids, vecs)
+
+    manifest_path = tmp_path / "out" / "clip_index.shards"
+    mapping_path = tmp_path / "out" / "index_to_id.json"
+    build_index_from_store(
+        store, str(manifest_path), str(mapping_path), n_trees=10, shards=3
+    )
+
+    manifest = json.loads(manifest_path.read_text())
+    assert [s["count"] for s in manifest["shards"]] == [100, 100, 100]
+    assert all((manifest_path.parent / s["path"]).exists() for s in manifest["shards"])
+
+    index = load_vector_index(str(manifest_path), search_k=100_000)
+    assert isinstance(index, ShardedVectorIndex) and len(index) == 300
+
+    queries = unit_vectors(8, seed=1)
+    got_ids, got_dists = index.batch_search(queries, 10)
+    exact_ids, exact_dists = ExactVectorIndex().build(vecs).batch_search(queries, 10)
+    assert got_ids == exact_ids  # global row ids, merged across shards
+    assert np.allclose(got_dists, exact_dists, atol=1e-4)
+
+    # single-query path and the item itself from the last shard
+    nearest, _ = index.search(vecs[250], 1)
+    assert nearest == [250]
+    assert json.loads(mapping_path.read_text())["250"] == ids[250]
+
+
+def test_concurrent_first_queries_share_one_pool_until_closed(monkeypatch):
+    created = []
+
+    class CountingPool(sharded_index.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(sharded_index, "ThreadPoolExecutor", CountingPool)
+    vecs = unit_vectors(60)
+    index = ShardedVectorIndex().build(vecs, n_shards=3, n_trees=5, seed=1)
+    queries = unit_vectors(4, seed=2)
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def query():
+        barrier.wait()
+        results.append(index.batch_search(queries, 5))
+
+    threads = [threading.Thread(target=query) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(r == results[0] for r in results)
+
+    index.close()
+    assert created[0]._shutdown
+    assert index.batch_search(queries, 5) == results[0]  # still searchable
+    assert len(created) == 1
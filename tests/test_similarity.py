@@ -2,12 +2,22 @@ import numpy as np
 import pytest
 from PIL import Image
 
+from image_recommender.similarity.features import (
+    FeatureBundle,
+    bundle_similarities,
+    compute_features,
+    compute_features_batch,
+)
 from image_recommender.similarity.hist_similarity import (
     compute_histogram,
+    compute_histograms_batch,
+    histogram_distances,
     image_color_similarity,
 )
 from image_recommender.similarity.similarity_phash import (
     compute_phash,
+    compute_phash_int,
+    hamming_distances,
     phash_similarity,
 )
 from image_recommender.similarity.similarity_embedding import (
@@ -35,6 +45,38 @@ def test_compute_histogram_and_color():
     assert image_color_similarity(img_black, img_white, bins=4) > 0
 
 
+@pytest.mark.parametrize("bins", [8, 5, 32])
+def test_batched_histograms_match_compute_histogram(bins):
+    rng = np.random.default_rng(bins)
+    stack = rng.integers(0, 256, (5, 12, 9, 3), dtype=np.uint8)
+    expected = np.stack([compute_histogram(img, bins) for img in stack])
+    assert np.array_equal(
+        compute_histograms_batch(stack, bins, chunk_images=2), expected
+    )
+
+    # mixed sizes and PIL images
+    imgs = [Image.fromarray(stack[0]), stack[1][:5], Image.fromarray(stack[2])]
+    expected = np.stack([compute_histogram(img, bins) for img in imgs])
+    assert np.array_equal(compute_histograms_batch(imgs, bins), expected)
+    assert compute_histograms_batch([], bins).shape == (0, 3 * bins)
+
+
+def test_histogram_distances_match_pairwise():
+    rng = np.random.default_rng(0)
+    imgs = [
+        Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8))
+        for _ in range(5)
+    ]
+    hists = np.stack([compute_histogram(img) for img in imgs])
+    dist = histogram_distances(hists[:2], hists)
+    assert dist.shape == (2, 5)
+    for q in range(2):
+        for j in range(5):
+            assert dist[q, j] == pytest.approx(
+                image_color_similarity(imgs[q], imgs[j]), rel=1e-5
+            )
+
+
 def test_phash_and_similarity():
     img1 = create_solid_image((128, 128, 128))
     img2 = create_solid_image((128, 128, 128))
@@ -47,6 +89,50 @@ def test_phash_and_similarity():
     assert phash_similarity(img1, img3) >= 0
 
 
+def test_packed_phash_hamming_matches_imagehash():
+    rng = np.random.default_rng(0)
+    imgs = [
+        Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+        for _ in range(6)
+    ]
+    packed = [compute_phash_int(img) for img in imgs]
+    assert all(-(2**63) <= h < 2**63 for h in packed)
+
+    dist = hamming_distances(packed[:2], packed)
+    assert dist.shape == (2, 6)
+    for q in range(2):
+        for j in range(6):
+            assert dist[q, j] == phash_similarity(imgs[q], imgs[j])
+    assert hamming_distances(packed[0], packed).tolist() == dist[0].tolist()
+    assert hamming_distances(-1, [0]).tolist() == [64]
+
+
+def test_feature_bundles_match_pairwise_similarities():
+    rng = np.random.default_rng(1)
+    imgs = [
+        Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+        for _ in range(5)
+    ]
+    embs = rng.normal(size=(5, 8)).astype(np.float32)
+    bundles = compute_features_batch(imgs, embs)
+    assert bundles[2].phash == compute_features(imgs[2]).phash
+
+    color, phash, clip = bundle_similarities(bundles[:2], bundles)
+    for j, img in enumerate(imgs):
+        expected_color = np.mean(
+            [1 / (1 + image_color_similarity(q, img)) for q in imgs[:2]]
+        )
+        expected_phash = np.mean([1 / (1 + phash_similarity(q, img)) for q in imgs[:2]])
+        assert color[j] == pytest.approx(expected_color, rel=1e-5)
+        assert phash[j] == pytest.approx(expected_phash)
+    # identical embeddings: angular distance 0, similarity 1
+    assert bundles[3].compare(bundles[3])["clip"] == pytest.approx(1.0)
+    assert -1e-6 <= clip.min() and clip.max() <= 1 + 1e-6
+
+    no_clip = FeatureBundle(bundles[0].histogram, bundles[0].phash)
+    assert no_clip.compare(bundles[1])["clip"] is None
+
+
 def test_build_and_load_annoy_index(tmp_path):
     # Create dummy zero embeddings
     embeddings = {i: [0.0] * EMBEDDING_DIM for i in range(5)}
@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+from PIL import Image
+
+import image_recommender.similarity.similarity_embedding as se
+from image_recommender.tools.export_torchscript import (
+    ImageEncoder,
+    export_image_encoder,
+)
+
+MEAN = [0.5, 0.4, 0.3]
+STD = [0.2, 0.25, 0.3]
+
+
+def tiny_visual():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 4, stride=4),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(8, 16),
+    ).eval()
+
+
+def test_export_and_load_torchscript_backend(tmp_path, monkeypatch):
+    visual = tiny_visual()
+    path = str(tmp_path / "encoder.ts")
+    meta = export_image_encoder(visual, path, 32, MEAN, STD, {"model": "tiny"})
+    assert meta["dim"] == 16 and meta["resolution"] == 32
+
+    monkeypatch.setattr(se, "TORCHSCRIPT_PATH", path)
+    # the artifact's dimension, not the table entry of MODEL_NAME (512)
+    assert se.get_embedding_dim(backend="torchscript") == 16
+    assert not se.is_clip_model_loaded(backend="torchscript")
+
+    model, preprocess = se.get_clip_model(backend="torchscript")
+    assert se.get_clip_model(backend="torchscript")[0] is model
+    assert model.output_dim == 16
+    monkeypatch.setattr(se, "_default_backend", "torchscript")
+    assert se.EMBEDDING_DIM == 16
+
+    imgs = [
+        Image.new("RGB", (48, 40), (200, 10, 10)),
+        Image.new("RGB", (32, 32), (10, 200, 10)),
+        Image.new("RGB", (64, 64), (10, 10, 200)),
+    ]
+    frozen = se.compute_clip_embeddings_batch(imgs, backend="torchscript").numpy()
+    assert frozen.shape == (3, 16)
+    assert np.allclose(np.linalg.norm(frozen, axis=1), 1.0, atol=1e-6)
+
+    # Same numbers as the eager wrapper; batch size differs from the trace example
+    eager = ImageEncoder(visual, MEAN, STD).eval()
+    with torch.no_grad():
+        expected = eager(torch.stack([preprocess(img) for img in imgs])).numpy()
+    assert np.allclose(frozen, expected, atol=1e-5)
+
+    single = se.compute_clip_embedding(imgs[0], backend="torchscript").numpy()
+    assert np.allclose(single, frozen[0], atol=1e-5)
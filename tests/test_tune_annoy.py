@@ -0,0 +1,38 @@
+import numpy as np
+
+from image_recommender.tools.tune_annoy import (
+    pareto_front,
+    recommend,
+    run_grid,
+    split_queries,
+)
+
+
+def test_grid_measures_recall_against_exact_search(tmp_path):
+    rng = np.random.default_rng(0)
+    v = rng.standard_normal((400, 16)).astype(np.float32)
+    corpus, queries = split_queries(v / np.linalg.norm(v, axis=1, keepdims=True), 20)
+    assert len(corpus) == 380 and len(queries) == 20
+
+    results = run_grid(
+        corpus, queries, [2, 20], [-1, 5000], k=10, workdir=str(tmp_path)
+    )
+    assert len(results) == 4
+    by_cfg = {(r["n_trees"], r["search_k"]): r for r in results}
+    # inspecting (almost) every node is exact
+    assert by_cfg[(20, 5000)]["recall"] >= 0.99
+    assert by_cfg[(2, -1)]["recall"] <= by_cfg[(20, 5000)]["recall"]
+    assert all(r["p99_ms"] >= r["p50_ms"] and r["file_mb"] > 0 for r in results)
+
+
+def test_pareto_and_recommendation():
+    rows = [
+        {"recall": 0.80, "p99_ms": 1.0, "file_mb": 10},
+        {"recall": 0.96, "p99_ms": 2.0, "file_mb": 10},
+        {"recall": 0.99, "p99_ms": 5.0, "file_mb": 10},
+        {"recall": 0.95, "p99_ms": 3.0, "file_mb": 20},  # dominated
+    ]
+    front = pareto_front(rows)
+    assert rows[3] not in front and len(front) == 3
+    assert recommend(rows, 0.95) is rows[1]
+    assert recommend(rows, 0.999) is rows[2]
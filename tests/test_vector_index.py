@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from image_recommender.data.embedding_store import EmbeddingStoreWriter
+from image_recommender.similarity.vector_index import (
+    AnnoyVectorIndex,
+    ExactVectorIndex,
+    VectorIndex,
+    build_vector_index,
+    load_vector_index,
+)
+
+
+def unit_vectors(n, dim=32, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_exact_index_matches_brute_force(tmp_path):
+    vecs = unit_vectors(200)
+    path = str(tmp_path / "idx.npy")
+    build_vector_index(vecs, path, "exact")
+
+    index = load_vector_index(path, block_rows=64)  # several blocks
+    assert isinstance(index, ExactVectorIndex) and len(index) == 200
+    assert isinstance(index.vectors, np.memmap)
+
+    queries = unit_vectors(5, seed=1)
+    ids, dists = index.batch_search(queries, 10)
+    sims = queries @ vecs.T
+    for q in range(5):
+        expected = np.argsort(-sims[q])[:10]
+        assert ids[q] == expected.tolist()
+        # distances are Annoy angular: sqrt(2 - 2 cos)
+        assert np.allclose(dists[q], np.sqrt(2 - 2 * sims[q][expected]), atol=1e-5)
+
+
+def test_exact_and_annoy_agree_on_distances(tmp_path):
+    vecs = unit_vectors(50)
+    exact = build_vector_index(vecs, str(tmp_path / "i.npy"), "exact")
+    build_vector_index(vecs, str(tmp_path / "i.ann"), "annoy", n_trees=20)
+    annoy = load_vector_index(str(tmp_path / "i.ann"), dim=32, search_k=10_000)
+    assert isinstance(annoy, AnnoyVectorIndex)
+
+    e_ids, e_dists = exact.search(vecs[3], 5)
+    a_ids, a_dists = annoy.search(vecs[3], 5)
+    assert e_ids[0] == a_ids[0] == 3
+    assert np.allclose(e_dists, a_dists, atol=1e-4)
+
+
+def test_exact_index_over_embedding_store(tmp_path):
+    vecs = unit_vectors(10, dim=8)
+    store = str(tmp_path / "emb")
+    with EmbeddingStoreWriter(store, 8, dtype="float16") as w:
+        w.append([f"{i:064x}" for i in range(10)], vecs)
+
+    index = load_vector_index(store)
+    ids, _ = index.search(vecs[4], 3)
+    assert ids[0] == 4
+    with pytest.raises(ValueError):
+        load_vector_index(str(tmp_path / "nothing.bin"))
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class SearchOnly(VectorIndex):
+        def search(self, vector, k):
+            return [], []
+
+    with pytest.raises(TypeError):
+        SearchOnly()